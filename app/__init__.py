@@ -5,9 +5,15 @@ import logging
 import os
 
 from .config import Config
-from .models import db, User
+from .models import db
 from .utils.logging_config import setup_logging
 from .utils.error_handlers import register_error_handlers
+from .utils.database import retry_on_disconnect
+from .utils.metrics import init_metrics
+from .utils.business_days import init_business_calendar
+from .utils.fragment_cache import init_fragment_cache
+from .utils.query_monitor import init_query_monitor
+from .cli import register_cli_commands
 
 
 def create_app(config_class=Config):
@@ -25,27 +31,61 @@ def create_app(config_class=Config):
     # 設置日誌
     setup_logging(app)
     
+    # 請求延遲指標
+    init_metrics(app)
+    
     # 初始化擴展
     db.init_app(app)
     migrate = Migrate(app, db)
     
+    # SQL 查詢統計
+    with app.app_context():
+        init_query_monitor(app, db.engine)
+    
     # 設置 LoginManager
     login_manager = LoginManager()
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     
+    # 登入用戶身分快取
+    from .services.user_cache import get_user_cache, init_user_cache
+    init_user_cache(app)
+    
     @login_manager.user_loader
+    @retry_on_disconnect()
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return get_user_cache().load(int(user_id))
+    
+    # 工作日曆（請假天數排除週末與國定假日）
+    init_business_calendar(app)
+    
+    # 模板片段快取
+    init_fragment_cache(app)
+    
+    # 團隊請假狀況索引（首次查詢時載入）
+    from .services.availability_index import init_availability_index
+    init_availability_index(app)
     
     # 註冊錯誤處理器
     register_error_handlers(app)
     
+    # 註冊 CLI 指令
+    register_cli_commands(app)
+    
+    # 設置 Google Calendar 背景同步
+    from .services.calendar_sync_service import calendar_sync_worker
+    calendar_sync_worker.init_app(app)
+    
+    # 設置詳細健康檢查快照
+    from .services.health_service import health_snapshot_cache
+    health_snapshot_cache.init_app(app)
+    
     # 註冊藍圖
     from .routes.auth import auth_bp
     from .routes.admin import admin_bp
     from .routes.leave import leave_bp
     from .routes.main import main_bp
+    from .routes.api import api_bp
     from .routes.health import health_bp
     
     app.register_blueprint(auth_bp)
@@ -53,5 +93,6 @@ def create_app(config_class=Config):
     app.register_blueprint(leave_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(health_bp)
+    app.register_blueprint(api_bp)
     
     return app
\ No newline at end of file
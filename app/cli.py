@@ -0,0 +1,110 @@
+"""Flask CLI 指令"""
+import time
+import click
+
+
+def register_cli_commands(app):
+    """註冊自定義 CLI 指令"""
+    
+    @app.cli.command('rebuild-usage-summary')
+    @click.option('--user-id', type=int, default=None, help='只重建指定用戶')
+    def rebuild_usage_summary(user_id):
+        """由 leave_record 重建 leave_usage_summary 彙總表"""
+        from .services.leave_service import LeaveService
+        
+        rows = LeaveService.rebuild_usage_summary(user_id)
+        click.echo(f"已重建 {rows} 筆請假使用量彙總")
+    
+    @app.cli.command('rebuild-row-counters')
+    def rebuild_row_counters():
+        """以 COUNT(*) 重設監控用的資料表列數計數器"""
+        from .services.counter_service import CounterService
+        
+        for name, count in CounterService.rebuild().items():
+            click.echo(f"{name}: {count}")
+    
+    @app.cli.command('import-users')
+    @click.argument('csv_file', type=click.File('rb'))
+    @click.option('--dry-run', is_flag=True, help='只檢查不寫入')
+    def import_users(csv_file, dry_run):
+        """由 CSV 批次匯入用戶（標題需包含 username 與 password）"""
+        from .services.user_service import UserService
+        
+        start = time.monotonic()
+        report = UserService.import_users_csv(csv_file, dry_run=dry_run)
+        for error in report['errors']:
+            click.echo(f"第 {error['row']} 列 {error['username']}: {error['error']}", err=True)
+        action = '可新增' if dry_run else '已新增'
+        click.echo(f"共 {report['total']} 列，{action} {report['created']} 位用戶，"
+                   f"{len(report['errors'])} 列錯誤（{time.monotonic() - start:.1f} 秒）")
+    
+    @app.cli.command('leave-rollover')
+    @click.option('--year', type=int, default=None, help='結轉的新年度（預設今年）')
+    @click.option('--dry-run', is_flag=True, help='只顯示試算差異不寫入')
+    def leave_rollover(year, dry_run):
+        """依 DEFAULT_LEAVE_DAYS 與 LEAVE_CARRY_OVER_CAPS 結轉所有用戶的請假餘額"""
+        from .exceptions import BusinessLogicError
+        from .services.rollover_service import RolloverService
+        
+        start = time.monotonic()
+        try:
+            report = RolloverService.rollover(year, dry_run=dry_run)
+        except BusinessLogicError as e:
+            raise click.ClickException(e.message)
+        if dry_run:
+            diff = report['diff']
+            click.echo(f"{report['year']} 年度試算：{diff['users']} 位用戶")
+            for field, change in diff['fields'].items():
+                click.echo(f"  {field}: {change['users_changed']} 人變動，"
+                           f"總天數 {change['total_before']:g} -> {change['total_after']:g}")
+            for sample in diff['samples']:
+                changes = ', '.join(f"{field} {c['before']:g}->{c['after']:g}" for field, c in sample['changes'].items())
+                click.echo(f"  #{sample['user_id']} {sample['username']}: {changes or '無變動'}")
+        else:
+            click.echo(f"{report['year']} 年度結轉完成：{report['users_updated']} 位用戶"
+                       f"（{time.monotonic() - start:.1f} 秒）")
+    
+    @app.cli.command('calendar-sync-worker')
+    @click.option('--once', is_flag=True, help='只處理一批後結束')
+    @click.option('--batch-size', type=int, default=None, help='每批處理數量')
+    def calendar_sync_worker(once, batch_size):
+        """以獨立行程處理 Google Calendar 同步 outbox"""
+        from .services.calendar_sync_service import CalendarSyncService
+        
+        interval = app.config['CALENDAR_SYNC_POLL_INTERVAL']
+        while True:
+            results = CalendarSyncService.process_batch(batch_size)
+            if any(results.values()):
+                click.echo(f"同步 {results['synced']} 筆、重試 {results['retried']} 筆、失敗 {results['failed']} 筆、"
+                           f"略過 {results['skipped']} 筆")
+            if once:
+                break
+            time.sleep(interval)
+    
+    @app.cli.command('calendar-backfill')
+    @click.option('--start-date', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='請假開始日期下限')
+    @click.option('--end-date', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='請假開始日期上限（含）')
+    @click.option('--user-id', 'user_ids', type=int, multiple=True, help='只回補指定用戶，可重複指定')
+    @click.option('--batch-size', type=click.IntRange(1, 50), default=50, help='每個 batch 請求的事件數（最多 50）')
+    @click.option('--rate', type=float, default=None, help='每秒 API 呼叫上限')
+    @click.option('--dry-run', is_flag=True, help='只統計需要回補的記錄數')
+    def calendar_backfill(start_date, end_date, user_ids, batch_size, rate, dry_run):
+        """將尚未同步的請假記錄以 batch 請求回補到 Google Calendar"""
+        from .services.calendar_sync_service import CalendarSyncService
+        
+        start_date = start_date.date() if start_date else None
+        end_date = end_date.date() if end_date else None
+        
+        if dry_run:
+            count = CalendarSyncService.count_unsynced(start_date, end_date, user_ids)
+            click.echo(f"共有 {count} 筆請假記錄需要回補")
+            return
+        
+        queued = CalendarSyncService.enqueue_unsynced(start_date, end_date, user_ids)
+        click.echo(f"已排入 {queued} 筆請假記錄")
+        
+        def report(processed, results):
+            click.echo(f"已處理 {processed} 筆：同步 {results['synced']}、重試 {results['retried']}、失敗 {results['failed']}")
+        
+        results = CalendarSyncService.drain_with_batches(batch_size, rate, progress=report)
+        click.echo(f"回補完成：同步 {results['synced']} 筆、待重試 {results['retried']} 筆、失敗 {results['failed']} 筆")
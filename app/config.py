@@ -1,5 +1,6 @@
 import os
 from datetime import timedelta
+from .utils.database import engine_options
 
 
 class Config:
@@ -18,15 +19,35 @@ class Config:
         f"mysql+pymysql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}?charset=utf8mb4"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(pool_size=5, max_overflow=10)
     
     # Google API 配置
     GOOGLE_CREDENTIALS_FILE = os.environ.get('GOOGLE_CREDENTIALS_FILE') or 'credentials.json'
     GOOGLE_CALENDAR_ID = os.environ.get('GOOGLE_CALENDAR_ID') or 'c_5a0402820b477847c2ada72002977033714ea8385aed41bbc6962789ab53783f@group.calendar.google.com'
+    GOOGLE_CALENDAR_API_ENDPOINT = os.environ.get('GOOGLE_CALENDAR_API_ENDPOINT')  # 例如本機假端點
+    GOOGLE_API_TIMEOUT = int(os.environ.get('GOOGLE_API_TIMEOUT', 30))
+    GOOGLE_CLIENT_POOL_SIZE = int(os.environ.get('GOOGLE_CLIENT_POOL_SIZE', 4))
+    GOOGLE_CLIENT_POOL_TIMEOUT = float(os.environ.get('GOOGLE_CLIENT_POOL_TIMEOUT', 30))
+    
+    # Google Calendar 背景同步配置
+    CALENDAR_SYNC_WORKER_ENABLED = os.environ.get('CALENDAR_SYNC_WORKER_ENABLED', 'true').lower() == 'true'
+    CALENDAR_SYNC_POLL_INTERVAL = float(os.environ.get('CALENDAR_SYNC_POLL_INTERVAL', 5))
+    CALENDAR_SYNC_BATCH_SIZE = int(os.environ.get('CALENDAR_SYNC_BATCH_SIZE', 20))
+    CALENDAR_SYNC_MAX_ATTEMPTS = int(os.environ.get('CALENDAR_SYNC_MAX_ATTEMPTS', 8))
+    CALENDAR_SYNC_BACKOFF_BASE = float(os.environ.get('CALENDAR_SYNC_BACKOFF_BASE', 30))
+    CALENDAR_SYNC_BACKOFF_MAX = float(os.environ.get('CALENDAR_SYNC_BACKOFF_MAX', 3600))
+    CALENDAR_SYNC_LEASE_SECONDS = int(os.environ.get('CALENDAR_SYNC_LEASE_SECONDS', 300))
+    CALENDAR_BACKFILL_RATE = float(os.environ.get('CALENDAR_BACKFILL_RATE', 10))  # 每秒 API 呼叫數
+    CALENDAR_EVENT_ID_NAMESPACE = os.environ.get('CALENDAR_EVENT_ID_NAMESPACE')  # 預設由資料庫主機與名稱雜湊
     
     # 請假業務配置
     MAX_LEAVE_DAYS = int(os.environ.get('MAX_LEAVE_DAYS', 5))
     MAX_FUTURE_DAYS = int(os.environ.get('MAX_FUTURE_DAYS', 60))
     
+    # 請假記錄分頁配置
+    LEAVE_RECORDS_PER_PAGE = int(os.environ.get('LEAVE_RECORDS_PER_PAGE', 20))
+    LEAVE_RECORDS_MAX_PER_PAGE = int(os.environ.get('LEAVE_RECORDS_MAX_PER_PAGE', 100))
+    
     # 預設請假天數配置
     DEFAULT_LEAVE_DAYS = {
         'annual_leave': int(os.environ.get('DEFAULT_ANNUAL_LEAVE', 10)),
@@ -37,6 +58,16 @@ class Config:
         'compassionate_leave': int(os.environ.get('DEFAULT_COMPASSIONATE_LEAVE', 3))
     }
     
+    # 年度結轉時可保留的剩餘天數上限（0 表示直接重設為預設天數）
+    LEAVE_CARRY_OVER_CAPS = {
+        'annual_leave': float(os.environ.get('CARRY_OVER_ANNUAL_LEAVE', 0)),
+        'sick_leave': float(os.environ.get('CARRY_OVER_SICK_LEAVE', 0)),
+        'personal_leave': float(os.environ.get('CARRY_OVER_PERSONAL_LEAVE', 0)),
+        'menstrual_leave': float(os.environ.get('CARRY_OVER_MENSTRUAL_LEAVE', 0)),
+        'family_care_leave': float(os.environ.get('CARRY_OVER_FAMILY_CARE_LEAVE', 0)),
+        'compassionate_leave': float(os.environ.get('CARRY_OVER_COMPASSIONATE_LEAVE', 0))
+    }
+    
     # 請假類型映射
     LEAVE_TYPE_MAPPING = {
         '特休': 'vacation_days',
@@ -47,9 +78,35 @@ class Config:
         '同情假': 'compassionate_days',
     }
     
+    # 假日檔（國定假日與補行上班日），請假天數以工作日計算；每年依人事行政總處公告更新
+    HOLIDAY_FILE = os.environ.get('HOLIDAY_FILE') or os.path.join(os.path.dirname(__file__), 'data', 'holidays.json')
+    
     # 檔案上傳配置
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or '/tmp'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+    GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE = int(os.environ.get('GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE', 1024 * 1024))  # 需為 256KB 的倍數
+    
+    # 登入用戶身分快取配置（各 worker 獨立，變更最晚於 TTL 後生效）
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 5))
+    USER_CACHE_MAXSIZE = int(os.environ.get('USER_CACHE_MAXSIZE', 10000))
+    
+    # 模板片段快取（管理頁用戶列），0 表示停用
+    FRAGMENT_CACHE_MAXSIZE = int(os.environ.get('FRAGMENT_CACHE_MAXSIZE', 5000))
+    
+    # 團隊請假狀況索引配置（各 worker 獨立，其他 worker 的寫入最晚於檢查間隔後反映）
+    AVAILABILITY_VERSION_CHECK_INTERVAL = float(os.environ.get('AVAILABILITY_VERSION_CHECK_INTERVAL', 1))
+    AVAILABILITY_MAX_RANGE_DAYS = int(os.environ.get('AVAILABILITY_MAX_RANGE_DAYS', 366))
+    AVAILABILITY_HISTORY_DAYS = int(os.environ.get('AVAILABILITY_HISTORY_DAYS', 90))  # 索引保留已結束多少天內的請假
+    
+    # 健康檢查配置
+    HEALTH_CHECK_BACKGROUND_ENABLED = os.environ.get('HEALTH_CHECK_BACKGROUND_ENABLED', 'true').lower() == 'true'
+    HEALTH_CHECK_INTERVAL = float(os.environ.get('HEALTH_CHECK_INTERVAL', 30))  # 背景刷新間隔（秒）
+    HEALTH_CHECK_TTL = float(os.environ.get('HEALTH_CHECK_TTL', 60))  # 快照過期後於請求中重新檢查
+    
+    # SQL 查詢監控配置
+    SQL_SLOW_QUERY_MS = float(os.environ.get('SQL_SLOW_QUERY_MS', 200))
+    SQL_REPEATED_STATEMENT_THRESHOLD = int(os.environ.get('SQL_REPEATED_STATEMENT_THRESHOLD', 10))  # 同一請求內相同語句的上限
+    SQL_QUERY_STATS_HEADER = None  # None 表示僅在 debug 模式輸出 Server-Timing 標頭
     
     # 日誌配置
     LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
@@ -60,18 +117,24 @@ class DevelopmentConfig(Config):
     """開發環境配置"""
     DEBUG = True
     LOG_LEVEL = 'DEBUG'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(pool_size=2, max_overflow=3)
 
 
 class ProductionConfig(Config):
     """生產環境配置"""
     DEBUG = False
     LOG_LEVEL = 'WARNING'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(pool_size=10, max_overflow=20)
 
 
 class TestingConfig(Config):
     """測試環境配置"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # 記憶體 SQLite 使用 StaticPool
+    CALENDAR_SYNC_WORKER_ENABLED = False
+    HEALTH_CHECK_BACKGROUND_ENABLED = False
+    HOLIDAY_FILE = None  # 測試只排除週末，結果不受假日檔年度影響
     WTF_CSRF_ENABLED = False
 
 
@@ -4,5 +4,10 @@ db = SQLAlchemy()
 
 from .user import User
 from .leave_record import LeaveRecord
+from .leave_usage_summary import LeaveUsageSummary
+from .calendar_outbox import CalendarOutbox
+from .row_counter import RowCounter
+from .leave_rollover import LeaveRollover
+from .leave_occupancy import LeaveOccupancy
 
-__all__ = ['db', 'User', 'LeaveRecord']
\ No newline at end of file
+__all__ = ['db', 'User', 'LeaveRecord', 'LeaveUsageSummary', 'CalendarOutbox', 'RowCounter', 'LeaveRollover', 'LeaveOccupancy']
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""Google Calendar 同步待辦（交易式 outbox）模型"""
+from sqlalchemy import Index
+from . import db
+
+
+class CalendarOutbox(db.Model):
+    """待同步至 Google Calendar 的請假事件，與請假記錄在同一交易寫入"""
+    __tablename__ = 'calendar_outbox'
+    __table_args__ = (
+        Index('idx_calendar_outbox_status_next', 'status', 'next_attempt_at'),
+        {'mysql_charset': 'utf8mb4', 'mysql_collate': 'utf8mb4_unicode_ci'}
+    )
+    
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    leave_record_id = db.Column(db.Integer, db.ForeignKey('leave_record.id', ondelete='CASCADE'), nullable=False)
+    calendar_id = db.Column(db.String(255))
+    summary = db.Column(db.String(255), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), default=STATUS_PENDING, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, nullable=False)
+    last_error = db.Column(db.String(500))
+    event_link = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    
+    def __repr__(self):
+        return f'<CalendarOutbox {self.id}: leave {self.leave_record_id} {self.status}>'
+    
+    def to_dict(self):
+        """轉換為字典格式"""
+        return {
+            'id': self.id,
+            'leave_record_id': self.leave_record_id,
+            'calendar_id': self.calendar_id,
+            'summary': self.summary,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'event_link': self.event_link,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    @classmethod
+    def due_ids(cls, now, limit):
+        """獲取到期可處理的待辦 ID（含租約逾時的處理中項目）"""
+        rows = db.session.query(cls.id).filter(
+            cls.status.in_((cls.STATUS_PENDING, cls.STATUS_PROCESSING)),
+            cls.next_attempt_at <= now
+        ).order_by(cls.next_attempt_at).limit(limit).all()
+        return [row.id for row in rows]
+    
+    @classmethod
+    def claim(cls, outbox_id, now, lease_until):
+        """以條件式 UPDATE 取得處理權，多個 worker 同時搶同一筆時只有一個成功"""
+        result = db.session.execute(
+            db.update(cls)
+              .where(cls.id == outbox_id,
+                     cls.status.in_((cls.STATUS_PENDING, cls.STATUS_PROCESSING)),
+                     cls.next_attempt_at <= now)
+              .values(status=cls.STATUS_PROCESSING, next_attempt_at=lease_until)
+              .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+    
+    @classmethod
+    def count_by_status(cls):
+        """統計各狀態的待辦數量"""
+        rows = db.session.query(cls.status, db.func.count(cls.id)).group_by(cls.status).all()
+        return {status: count for status, count in rows}
@@ -0,0 +1,81 @@
+"""請假佔用位元圖模型"""
+from datetime import date
+from . import db
+from ..utils.occupancy import (
+    BITMAP_BYTES, bitmap_to_int, int_to_bitmap, leave_bit_ranges, range_mask
+)
+
+
+class LeaveOccupancy(db.Model):
+    """每位用戶每年度的請假佔用位元圖（由 leave_record 建立，新增/刪除請假時維護）"""
+    __tablename__ = 'leave_occupancy'
+    __table_args__ = (
+        {'mysql_charset': 'utf8mb4', 'mysql_collate': 'utf8mb4_unicode_ci'},
+    )
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    bitmap = db.Column(db.LargeBinary(BITMAP_BYTES), nullable=False)
+    
+    def __repr__(self):
+        return f'<LeaveOccupancy {self.user_id} {self.year}>'
+    
+    @property
+    def bits(self):
+        return bitmap_to_int(self.bitmap)
+    
+    @bits.setter
+    def bits(self, value):
+        self.bitmap = int_to_bitmap(value)
+    
+    @classmethod
+    def build_bits(cls, user_id, year):
+        """由該年度的請假記錄計算位元圖"""
+        from .leave_record import LeaveRecord
+        
+        records = db.session.query(
+            LeaveRecord.start_date, LeaveRecord.end_date, LeaveRecord.half_day, LeaveRecord.half_day_period
+        ).filter(
+            LeaveRecord.user_id == user_id,
+            LeaveRecord.start_date <= date(year, 12, 31),
+            LeaveRecord.end_date >= date(year, 1, 1)
+        )
+        bits = 0
+        for start_date, end_date, half_day, half_day_period in records:
+            first_bit, last_bit = leave_bit_ranges(start_date, end_date, half_day, half_day_period)[year]
+            bits |= range_mask(first_bit, last_bit)
+        return bits
+    
+    @classmethod
+    def _load_for_update(cls, user_id, year):
+        """以鎖定讀取取得位元圖列，尚未建立時由請假記錄建立"""
+        occupancy = cls.query.filter_by(user_id=user_id, year=year)\
+                             .with_for_update()\
+                             .populate_existing()\
+                             .first()
+        if occupancy is None:
+            occupancy = cls(user_id=user_id, year=year)
+            occupancy.bits = cls.build_bits(user_id, year)
+            db.session.add(occupancy)
+        return occupancy
+    
+    @classmethod
+    def reserve(cls, user_id, start_date, end_date, half_day=False, half_day_period=None):
+        """
+        鎖定並標記請假期間，不另外提交
+        
+        須在加入新的請假記錄之前呼叫；期間已被佔用時不做任何變更並回傳 False。
+        """
+        ranges = leave_bit_ranges(start_date, end_date, half_day, half_day_period)
+        occupancies = {year: cls._load_for_update(user_id, year) for year in ranges}
+        if any(occupancies[year].bits & range_mask(*ranges[year]) for year in ranges):
+            return False
+        for year, (first_bit, last_bit) in ranges.items():
+            occupancies[year].bits = occupancies[year].bits | range_mask(first_bit, last_bit)
+        return True
+    
+    @classmethod
+    def rebuild(cls, user_id, years):
+        """由請假記錄重建指定年度的位元圖，不另外提交"""
+        for year in years:
+            cls._load_for_update(user_id, year).bits = cls.build_bits(user_id, year)
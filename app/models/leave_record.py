@@ -1,6 +1,9 @@
 """請假記錄模型"""
+import sqlite3
 from sqlalchemy import Index
+from sqlalchemy.orm import aliased
 from . import db
+from ..utils.date_utils import year_filter, month_filter, year_bounds, date_range_filter
 
 
 class LeaveRecord(db.Model):
@@ -18,12 +21,16 @@ class LeaveRecord(db.Model):
     start_date = db.Column(db.Date, nullable=False)
     end_date = db.Column(db.Date, nullable=False)
     half_day = db.Column(db.Boolean, default=False, nullable=False)
+    half_day_period = db.Column(db.String(2))  # 半天假時段 AM/PM，舊資料為 NULL（視為上午）
     reason = db.Column(db.String(255))
     receipt_url = db.Column(db.String(500))
     days = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
     
+    # 尚未同步的日曆事件隨請假記錄一併刪除
+    calendar_outbox = db.relationship('CalendarOutbox', backref='leave_record', lazy='dynamic', cascade='all, delete-orphan')
+    
     def __repr__(self):
         return f'<LeaveRecord {self.user_id}: {self.leave_type} {self.days} days>'
     
@@ -36,6 +43,7 @@ class LeaveRecord(db.Model):
             'start_date': self.start_date.isoformat() if self.start_date else None,
             'end_date': self.end_date.isoformat() if self.end_date else None,
             'half_day': self.half_day,
+            'half_day_period': self.half_day_period,
             'reason': self.reason,
             'receipt_url': self.receipt_url,
             'days': self.days,
@@ -48,13 +56,129 @@ class LeaveRecord(db.Model):
         """獲取指定用戶和年份的請假記錄"""
         return cls.query.filter(
             cls.user_id == user_id,
-            db.extract('year', cls.start_date) == year
+            year_filter(cls.start_date, year)
+        ).all()
+    
+    @classmethod
+    def get_by_user_and_month(cls, user_id, year, month):
+        """獲取指定用戶和月份的請假記錄"""
+        return cls.query.filter(
+            cls.user_id == user_id,
+            month_filter(cls.start_date, year, month)
         ).all()
     
     @classmethod
     def get_recent_by_user(cls, user_id, limit=5):
         """獲取用戶最近的請假記錄"""
         return cls.query.filter_by(user_id=user_id)\
-                      .order_by(cls.start_date.desc())\
+                      .order_by(cls.start_date.desc(), cls.id.desc())\
                       .limit(limit)\
-                      .all()
\ No newline at end of file
+                      .all()
+    
+    @classmethod
+    def get_page_by_user(cls, user_id, limit, after=None):
+        """
+        以鍵集（keyset）分頁獲取用戶請假記錄，依 (start_date DESC, id DESC) 排序
+        
+        after 為上一頁最後一筆的 (start_date, id)；每頁成本與歷史深度無關。
+        """
+        query = cls.query.filter(cls.user_id == user_id)
+        if after is not None:
+            after_date, after_id = after
+            query = query.filter(db.or_(
+                cls.start_date < after_date,
+                db.and_(cls.start_date == after_date, cls.id < after_id)
+            ))
+        return query.order_by(cls.start_date.desc(), cls.id.desc())\
+                    .limit(limit)\
+                    .all()
+    
+    # 單次 IN 查詢的最大用戶數，避免超過資料庫綁定參數上限
+    USER_BATCH_SIZE = 1000
+    
+    @classmethod
+    def get_recent_by_users(cls, user_ids, limit=5):
+        """
+        批次獲取多個用戶最近的請假記錄
+        
+        每批用戶只發送一次查詢；回傳 {user_id: [LeaveRecord, ...]}，
+        沒有記錄的用戶對應空列表。
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        records = {user_id: [] for user_id in user_ids}
+        if not user_ids or limit <= 0:
+            return records
+        
+        if cls._supports_window_functions():
+            loader = cls._recent_by_users_window
+        else:
+            loader = cls._recent_by_users_correlated
+        
+        for i in range(0, len(user_ids), cls.USER_BATCH_SIZE):
+            chunk = user_ids[i:i + cls.USER_BATCH_SIZE]
+            for record in loader(chunk, limit):
+                records[record.user_id].append(record)
+        return records
+    
+    @classmethod
+    def _recent_by_users_window(cls, user_ids, limit):
+        """使用 ROW_NUMBER() 視窗函數取每位用戶的前 N 筆（MySQL 8 / SQLite 3.25+）"""
+        row_number = db.func.row_number().over(
+            partition_by=cls.user_id,
+            order_by=(cls.start_date.desc(), cls.id.desc())
+        ).label('row_number')
+        ranked = db.select(cls, row_number).where(cls.user_id.in_(user_ids)).subquery()
+        ranked_record = aliased(cls, ranked)
+        
+        return db.session.query(ranked_record)\
+                         .filter(ranked.c.row_number <= limit)\
+                         .order_by(ranked.c.user_id, ranked.c.row_number)\
+                         .all()
+    
+    @classmethod
+    def _recent_by_users_correlated(cls, user_ids, limit):
+        """不支援視窗函數時的相容查詢：以相關子查詢計算較新的記錄數"""
+        newer = aliased(cls)
+        newer_count = db.select(db.func.count(newer.id)).where(
+            newer.user_id == cls.user_id,
+            db.or_(
+                newer.start_date > cls.start_date,
+                db.and_(newer.start_date == cls.start_date, newer.id > cls.id)
+            )
+        ).correlate(cls).scalar_subquery()
+        
+        return cls.query.filter(cls.user_id.in_(user_ids), newer_count < limit)\
+                        .order_by(cls.user_id, cls.start_date.desc(), cls.id.desc())\
+                        .all()
+    
+    @classmethod
+    def sum_days_by_type(cls, user_ids, year):
+        """
+        以 GROUP BY 彙總多位用戶在指定年度各假別的天數
+        
+        回傳 (user_id, leave_type, total_days) 列；篩選使用半開日期區間以命中 idx_leave_user_date。
+        """
+        start, end = year_bounds(year)
+        user_ids = list(dict.fromkeys(user_ids))
+        rows = []
+        for i in range(0, len(user_ids), cls.USER_BATCH_SIZE):
+            chunk = user_ids[i:i + cls.USER_BATCH_SIZE]
+            rows.extend(db.session.execute(
+                db.select(cls.user_id, cls.leave_type, db.func.sum(cls.days))
+                  .where(cls.user_id.in_(chunk), date_range_filter(cls.start_date, start, end))
+                  .group_by(cls.user_id, cls.leave_type)
+            ).all())
+        return rows
+    
+    @staticmethod
+    def _supports_window_functions():
+        """檢查目前資料庫是否支援視窗函數"""
+        dialect = db.session.connection().dialect
+        if dialect.name == 'sqlite':
+            return sqlite3.sqlite_version_info >= (3, 25, 0)
+        if dialect.name == 'mysql':
+            version = dialect.server_version_info or (0,)
+            if getattr(dialect, 'is_mariadb', False):
+                return version >= (10, 2)
+            return version >= (8, 0)
+        return True
\ No newline at end of file
@@ -0,0 +1,27 @@
+"""年度請假天數結轉記錄模型"""
+from . import db
+
+
+class LeaveRollover(db.Model):
+    """每個年度只能執行一次的結轉標記，與餘額更新在同一交易寫入"""
+    __tablename__ = 'leave_rollover'
+    __table_args__ = (
+        {'mysql_charset': 'utf8mb4', 'mysql_collate': 'utf8mb4_unicode_ci'},
+    )
+    
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    users_updated = db.Column(db.Integer, default=0, nullable=False)
+    settings = db.Column(db.JSON)  # 執行時的預設天數與結轉上限
+    executed_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    
+    def __repr__(self):
+        return f'<LeaveRollover {self.year}: {self.users_updated} users>'
+    
+    def to_dict(self):
+        """轉換為字典格式"""
+        return {
+            'year': self.year,
+            'users_updated': self.users_updated,
+            'settings': self.settings,
+            'executed_at': self.executed_at.isoformat() if self.executed_at else None
+        }
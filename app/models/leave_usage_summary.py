@@ -0,0 +1,96 @@
+"""請假使用量彙總模型"""
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from . import db
+
+
+class LeaveUsageSummary(db.Model):
+    """每位用戶每年度各假別的已使用天數（由 leave_record 彙總而來）"""
+    __tablename__ = 'leave_usage_summary'
+    __table_args__ = (
+        {'mysql_charset': 'utf8mb4', 'mysql_collate': 'utf8mb4_unicode_ci'},
+    )
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    leave_type = db.Column(db.String(50), primary_key=True)
+    days = db.Column(db.Float, default=0.0, nullable=False)
+    
+    def __repr__(self):
+        return f'<LeaveUsageSummary {self.user_id} {self.year}: {self.leave_type} {self.days} days>'
+    
+    def to_dict(self):
+        """轉換為字典格式"""
+        return {
+            'user_id': self.user_id,
+            'year': self.year,
+            'leave_type': self.leave_type,
+            'days': self.days
+        }
+    
+    @classmethod
+    def apply_usage(cls, user_id, year, leave_type, days):
+        """
+        累加（或以負數扣回）已使用天數
+        
+        以單一 upsert 陳述式完成，不另外提交，讓呼叫端與請假記錄在同一交易內寫入。
+        """
+        table = cls.__table__
+        values = {'user_id': user_id, 'year': year, 'leave_type': leave_type, 'days': days}
+        dialect = db.session.get_bind().dialect.name
+        
+        if dialect == 'mysql':
+            stmt = mysql.insert(table).values(**values)
+            stmt = stmt.on_duplicate_key_update(days=table.c.days + stmt.inserted.days)
+        elif dialect in ('sqlite', 'postgresql'):
+            insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+            stmt = insert(table).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.user_id, table.c.year, table.c.leave_type],
+                set_={'days': table.c.days + stmt.excluded.days}
+            )
+        else:
+            result = db.session.execute(
+                table.update()
+                     .where(table.c.user_id == user_id,
+                            table.c.year == year,
+                            table.c.leave_type == leave_type)
+                     .values(days=table.c.days + days)
+            )
+            if result.rowcount:
+                return
+            stmt = table.insert().values(**values)
+        
+        db.session.execute(stmt)
+    
+    @classmethod
+    def get_by_user_and_year(cls, user_id, year):
+        """獲取指定用戶和年份的各假別使用量"""
+        return cls.query.filter_by(user_id=user_id, year=year).all()
+    
+    @classmethod
+    def rebuild(cls, user_id=None):
+        """
+        由 leave_record 重新計算彙總資料
+        
+        只刪除並重建指定用戶（或全部）的資料，不提交交易。回傳寫入的列數。
+        """
+        from .leave_record import LeaveRecord
+        
+        delete = db.delete(cls)
+        year = db.extract('year', LeaveRecord.start_date)
+        source = db.select(
+            LeaveRecord.user_id,
+            year,
+            LeaveRecord.leave_type,
+            db.func.sum(LeaveRecord.days)
+        ).group_by(LeaveRecord.user_id, year, LeaveRecord.leave_type)
+        
+        if user_id is not None:
+            delete = delete.where(cls.user_id == user_id)
+            source = source.where(LeaveRecord.user_id == user_id)
+        
+        db.session.execute(delete)
+        result = db.session.execute(
+            cls.__table__.insert().from_select(['user_id', 'year', 'leave_type', 'days'], source)
+        )
+        return result.rowcount
@@ -0,0 +1,95 @@
+"""資料表列數計數器模型"""
+import random
+from . import db
+
+
+class RowCounter(db.Model):
+    """
+    由服務層寫入時增減維護的資料表列數，避免監控端點執行 COUNT(*)
+    
+    每個計數器分散為 SHARDS 列：第 0 片沿用計數器名稱，其餘為「名稱#編號」。
+    寫入隨機更新其中一片，讀取時加總，避免所有請假交易等待同一列的鎖。
+    """
+    __tablename__ = 'row_counter'
+    __table_args__ = (
+        {'mysql_charset': 'utf8mb4', 'mysql_collate': 'utf8mb4_unicode_ci'},
+    )
+    
+    SHARDS = 8
+    
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    
+    def __repr__(self):
+        return f'<RowCounter {self.name}: {self.value}>'
+    
+    @classmethod
+    def shard_names(cls, name):
+        """計數器所有分片的列名稱"""
+        return [name] + [f'{name}#{shard}' for shard in range(1, cls.SHARDS)]
+    
+    @classmethod
+    def _add_to_shard(cls, name, delta):
+        """以單一 UPDATE 將 delta 加到隨機一片，回傳是否有更新到列"""
+        result = db.session.execute(
+            db.update(cls)
+              .where(cls.name == random.choice(cls.shard_names(name)))
+              .values(value=cls.value + delta)
+              .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+    
+    @classmethod
+    def ensure_shards(cls, name):
+        """建立計數器缺少的分片（值為 0，加總不變），不另外提交"""
+        names = cls.shard_names(name)
+        existing = set(db.session.execute(db.select(cls.name).where(cls.name.in_(names))).scalars())
+        missing = [shard_name for shard_name in names if shard_name not in existing]
+        if missing:
+            db.session.execute(db.insert(cls), [{'name': shard_name, 'value': 0} for shard_name in missing])
+    
+    @classmethod
+    def increment(cls, name, delta=1):
+        """
+        以單一 UPDATE 原子地增減其中一片，不另外提交
+        
+        各分片由 migration 或 rebuild 預先建立，寫入時不檢查是否存在；計數器尚未
+        建立時不做任何事，讀取端會改用估計值，待重建後再開始累計。
+        """
+        if not delta:
+            return
+        cls._add_to_shard(name, delta)
+    
+    @classmethod
+    def bump(cls, name):
+        """
+        將計數器當作版本戳記遞增其中一片並回傳加總後的新值，不另外提交
+        
+        回傳值為本交易所見的加總；其他交易同時遞增其他分片時可能相同，
+        使用端需在值不連續時重新讀取。計數器尚未建立時先建立全部分片
+        （只會發生一次，正式環境由 migration 預先建立）。
+        """
+        if not cls._add_to_shard(name, 1):
+            cls.ensure_shards(name)
+            cls._add_to_shard(name, 1)
+        return cls.get_value(name)
+    
+    @classmethod
+    def get_value(cls, name):
+        """讀取各分片加總的計數值（尚未建立時為 None）"""
+        total, shards = db.session.execute(
+            db.select(db.func.sum(cls.value), db.func.count()).where(cls.name.in_(cls.shard_names(name)))
+        ).one()
+        return int(total) if shards else None
+    
+    @classmethod
+    def rebuild(cls, name, model):
+        """以 COUNT(*) 重設指定計數器的所有分片，不提交交易。回傳計數值。"""
+        count = db.session.execute(db.select(db.func.count()).select_from(model)).scalar()
+        db.session.execute(db.delete(cls).where(cls.name.in_(cls.shard_names(name))))
+        db.session.execute(db.insert(cls), [
+            {'name': shard_name, 'value': count if shard_name == name else 0}
+            for shard_name in cls.shard_names(name)
+        ])
+        return count
@@ -21,8 +21,13 @@ class User(db.Model, UserMixin):
     family_care_days = db.Column(db.Float, default=0.0, nullable=False)
     compassionate_days = db.Column(db.Float, default=0.0, nullable=False)
     
+    # 版本戳記：用戶資料或請假餘額變動時遞增
+    version = db.Column(db.Integer, default=1, nullable=False)
+    
     # 建立與請假記錄的關聯
     leave_records = db.relationship('LeaveRecord', backref='user', lazy='dynamic', cascade='all, delete-orphan')
+    leave_usage_summaries = db.relationship('LeaveUsageSummary', lazy='dynamic', cascade='all, delete-orphan')
+    leave_occupancies = db.relationship('LeaveOccupancy', lazy='dynamic', cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -41,6 +46,56 @@ class User(db.Model, UserMixin):
         current_days = getattr(self, leave_type_field, 0.0)
         setattr(self, leave_type_field, current_days + days)
     
+    @classmethod
+    def bump_version(cls, user_id):
+        """以單一 UPDATE 遞增版本戳記並回傳新版本，不另外提交"""
+        db.session.execute(
+            db.update(cls).where(cls.id == user_id).values(version=cls.version + 1)
+        )
+        return db.session.execute(db.select(cls.version).where(cls.id == user_id)).scalar()
+    
+    @classmethod
+    def get_version(cls, user_id):
+        """只讀取版本戳記（以主鍵查詢單一欄位），用戶不存在時為 None"""
+        return db.session.execute(db.select(cls.version).where(cls.id == user_id)).scalar()
+    
+    @classmethod
+    def try_deduct_leave_days(cls, user_id, leave_type_field, days):
+        """
+        以條件式 UPDATE 原子地扣除請假天數並遞增版本戳記，不另外提交
+        
+        餘額不足時不更新任何列並回傳 None；成功時回傳新版本。並行的申請由資料庫
+        逐一判斷餘額，不會超扣，也不需要先 SELECT ... FOR UPDATE 鎖定。
+        """
+        column = getattr(cls, leave_type_field)
+        return cls._update_returning_version(
+            user_id,
+            db.update(cls)
+              .where(cls.id == user_id, column >= days)
+              .values({column: column - days, cls.version: cls.version + 1})
+        )
+    
+    @classmethod
+    def add_leave_days(cls, user_id, leave_type_field, days):
+        """以單一 UPDATE 原子地加回請假天數並遞增版本戳記，回傳新版本，不另外提交"""
+        column = getattr(cls, leave_type_field)
+        return cls._update_returning_version(
+            user_id,
+            db.update(cls)
+              .where(cls.id == user_id)
+              .values({column: column + days, cls.version: cls.version + 1})
+        )
+    
+    @classmethod
+    def _update_returning_version(cls, user_id, stmt):
+        """執行更新並取得新版本（支援 RETURNING 時省去額外查詢）"""
+        stmt = stmt.execution_options(synchronize_session=False)
+        if db.session.get_bind().dialect.update_returning:
+            return db.session.execute(stmt.returning(cls.version)).scalar()
+        if db.session.execute(stmt).rowcount != 1:
+            return None
+        return db.session.execute(db.select(cls.version).where(cls.id == user_id)).scalar()
+    
     def to_dict(self):
         """轉換為字典格式"""
         return {
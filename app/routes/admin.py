@@ -1,12 +1,20 @@
 """管理員路由"""
-from flask import Blueprint, render_template, redirect, url_for, request, flash
+from datetime import date, datetime, timedelta
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
 from flask_login import login_required, current_user
 from ..services.user_service import UserService
 from ..services.leave_service import LeaveService
+from ..services.rollover_service import RolloverService
 from ..exceptions import ValidationError, BusinessLogicError, DatabaseError
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
+# 匯入結果頁面最多顯示的錯誤列數
+IMPORT_ERRORS_SHOWN = 20
+
+# 請假狀況查詢未指定期間時的預設天數（含今天）
+AVAILABILITY_DEFAULT_DAYS = 7
+
 
 def admin_required(f):
     """管理員權限裝飾器"""
@@ -28,8 +36,11 @@ def admin():
         users = UserService.get_all_non_admin_users()
         user_ids = [user.id for user in users]
         leave_records = LeaveService.get_recent_leave_records_by_users(user_ids, 5)
+        current_year = date.today().year
+        annual_stats = LeaveService.aggregate_annual_leave_stats_by_users(user_ids, current_year)
         
-        return render_template('admin.html', users=users, leave_records=leave_records)
+        return render_template('admin.html', users=users, leave_records=leave_records,
+                               annual_stats=annual_stats, current_year=current_year)
     except Exception as e:
         flash('載入管理頁面時發生錯誤', 'danger')
         return redirect(url_for('main.index'))
@@ -56,6 +67,104 @@ def add_user():
     return redirect(url_for('admin.admin'))
 
 
+@admin_bp.route('/import_users', methods=['POST'])
+@login_required
+@admin_required
+def import_users():
+    """以 CSV 批次匯入用戶"""
+    csv_file = request.files.get('csv_file')
+    if not csv_file or not csv_file.filename:
+        flash('請選擇要匯入的 CSV 檔案', 'danger')
+        return redirect(url_for('admin.admin'))
+    
+    try:
+        report = UserService.import_users_csv(csv_file.stream)
+        flash(f"匯入完成：新增 {report['created']} 位用戶，{len(report['errors'])} 列未匯入", 'success')
+        for error in report['errors'][:IMPORT_ERRORS_SHOWN]:
+            flash(f"第 {error['row']} 列 {error['username']}：{error['error']}", 'danger')
+        if len(report['errors']) > IMPORT_ERRORS_SHOWN:
+            flash(f"其餘 {len(report['errors']) - IMPORT_ERRORS_SHOWN} 列錯誤未顯示", 'warning')
+    except (ValidationError, BusinessLogicError) as e:
+        flash(str(e), 'danger')
+    except DatabaseError as e:
+        flash(str(e), 'danger')
+    except UnicodeDecodeError:
+        flash('CSV 檔案需為 UTF-8 編碼', 'danger')
+    except Exception as e:
+        flash('匯入用戶時發生未知錯誤', 'danger')
+    
+    return redirect(url_for('admin.admin'))
+
+
+@admin_bp.route('/rollover', methods=['POST'])
+@login_required
+@admin_required
+def rollover():
+    """年度請假天數結轉（可先試算）"""
+    year = request.form.get('year', type=int)
+    dry_run = 'dry_run' in request.form
+    
+    try:
+        report = RolloverService.rollover(year, dry_run=dry_run)
+        if dry_run:
+            diff = report['diff']
+            flash(f"{report['year']} 年度結轉試算：共 {diff['users']} 位用戶", 'info')
+            for field, change in diff['fields'].items():
+                flash(f"{field}：{change['users_changed']} 人變動，"
+                      f"總天數 {change['total_before']:g} → {change['total_after']:g}", 'info')
+        else:
+            flash(f"{report['year']} 年度結轉完成，已更新 {report['users_updated']} 位用戶", 'success')
+    except (ValidationError, BusinessLogicError) as e:
+        flash(str(e), 'danger')
+    except DatabaseError as e:
+        flash(str(e), 'danger')
+    except Exception as e:
+        flash('年度結轉時發生未知錯誤', 'danger')
+    
+    return redirect(url_for('admin.admin'))
+
+
+def parse_availability_range():
+    """由查詢參數 start/end（YYYY-MM-DD）取得期間，未指定時為今天起一週"""
+    try:
+        start_date = datetime.strptime(request.args['start'], '%Y-%m-%d').date() \
+            if request.args.get('start') else date.today()
+        end_date = datetime.strptime(request.args['end'], '%Y-%m-%d').date() \
+            if request.args.get('end') else start_date + timedelta(days=AVAILABILITY_DEFAULT_DAYS - 1)
+    except ValueError:
+        raise ValidationError('日期格式錯誤，請使用 YYYY-MM-DD')
+    return start_date, end_date
+
+
+@admin_bp.route('/availability')
+@login_required
+@admin_required
+def availability():
+    """團隊請假狀況頁面"""
+    try:
+        start_date, end_date = parse_availability_range()
+        result = LeaveService.get_team_availability(start_date, end_date)
+    except ValidationError as e:
+        flash(str(e), 'danger')
+        start_date = date.today()
+        end_date = start_date + timedelta(days=AVAILABILITY_DEFAULT_DAYS - 1)
+        result = LeaveService.get_team_availability(start_date, end_date)
+    
+    return render_template('availability.html', **result)
+
+
+@admin_bp.route('/api/availability')
+@login_required
+@admin_required
+def availability_api():
+    """團隊請假狀況 API：GET /admin/api/availability?start=YYYY-MM-DD&end=YYYY-MM-DD"""
+    try:
+        start_date, end_date = parse_availability_range()
+        return jsonify(LeaveService.get_team_availability(start_date, end_date))
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+
+
 @admin_bp.route('/update_user/<int:user_id>', methods=['POST'])
 @login_required
 @admin_required
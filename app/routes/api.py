@@ -0,0 +1,151 @@
+"""JSON API（v1）
+
+提供餘額、請假記錄與申請/刪除，讀取端點以用戶版本戳記產生強 ETag：
+If-None-Match 相符時只讀取 user.version 即回應 304，不載入記錄也不序列化。
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import Blueprint, abort, jsonify, make_response, request
+from flask_login import current_user
+from ..models import LeaveRecord, User, db
+from ..services.leave_service import LeaveService
+from ..services.user_service import UserService
+from ..services.calendar_sync_service import calendar_sync_worker
+from ..exceptions import AuthenticationError, AuthorizationError, ValidationError
+
+API_VERSION = 'v1'
+
+api_bp = Blueprint('api', __name__, url_prefix=f'/api/{API_VERSION}')
+
+
+def api_login_required(f):
+    """API 登入檢查：未登入回應 401 JSON 而非重定向到登入頁"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            raise AuthenticationError('請先登入')
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def ensure_user_access(user_id):
+    """只有本人或管理員可以存取用戶資料"""
+    if current_user.id != user_id and not current_user.is_admin:
+        raise AuthorizationError('權限不足')
+
+
+def user_etag(resource, user_id, version, *parts):
+    """由資源名稱、用戶版本戳記與查詢參數產生強 ETag"""
+    key = '|'.join(str(part) for part in (API_VERSION, resource, user_id, version) + parts)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def conditional_user_resource(resource, query_args=(), extra=None):
+    """
+    以用戶版本戳記處理條件式 GET
+    
+    query_args 為會影響回應內容的查詢參數名稱，extra 回傳其他影響內容的值
+    （例如年度）；If-None-Match 相符時直接回應 304。
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(user_id, *args, **kwargs):
+            ensure_user_access(user_id)
+            version = User.get_version(user_id)
+            if version is None:
+                abort(404)
+            
+            parts = [request.args.get(name, '') for name in query_args]
+            if extra is not None:
+                parts.append(extra())
+            etag = user_etag(resource, user_id, version, *parts)
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(user_id, *args, **kwargs))
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
+
+
+@api_bp.route('/users/<int:user_id>/balances')
+@api_login_required
+@conditional_user_resource('balances', extra=lambda: datetime.now().year)
+def balances(user_id):
+    """剩餘天數與本年度各假別使用天數"""
+    user = UserService.get_user_by_id(user_id)
+    year = datetime.now().year
+    return jsonify({
+        'user': {**user.to_dict(), 'version': user.version},
+        'year': year,
+        'usage': LeaveService.get_annual_leave_stats(user_id, year)
+    })
+
+
+@api_bp.route('/users/<int:user_id>/leaves')
+@api_login_required
+@conditional_user_resource('leaves', query_args=('cursor', 'per_page'))
+def leaves(user_id):
+    """請假記錄（鍵集分頁，參數同儀表板的 cursor / per_page）"""
+    records, next_cursor = LeaveService.get_user_leave_records_page(
+        user_id,
+        request.args.get('per_page', type=int),
+        request.args.get('cursor')
+    )
+    return jsonify({
+        'records': [record.to_dict() for record in records],
+        'next_cursor': next_cursor
+    })
+
+
+@api_bp.route('/users/<int:user_id>/leaves', methods=['POST'])
+@api_login_required
+def apply_leave(user_id):
+    """申請請假（JSON：leave_type、start_date、end_date，可選 half_day、half_day_period、reason）"""
+    if current_user.id != user_id:
+        raise AuthorizationError('只能替自己申請請假')
+    
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        raise ValidationError('請求內容須為 JSON 物件')
+    missing = [field for field in ('leave_type', 'start_date', 'end_date') if not data.get(field)]
+    if missing:
+        raise ValidationError(f"缺少欄位: {', '.join(missing)}")
+    not_strings = [
+        field for field in ('leave_type', 'start_date', 'end_date', 'half_day_period', 'reason')
+        if data.get(field) is not None and not isinstance(data[field], str)
+    ]
+    if not_strings:
+        raise ValidationError(f"欄位須為字串: {', '.join(not_strings)}")
+    if 'half_day' in data and not isinstance(data['half_day'], bool):
+        raise ValidationError('half_day 須為 true 或 false')
+    
+    try:
+        record = LeaveService.create_leave_request(current_user, {
+            'leave_type': data['leave_type'],
+            'start_date': data['start_date'],
+            'end_date': data['end_date'],
+            'half_day': data.get('half_day', False),
+            'half_day_period': data.get('half_day_period'),
+            'reason': data.get('reason') or ''
+        })
+    except ValueError:
+        raise ValidationError('日期格式錯誤，請使用 YYYY-MM-DD')
+    calendar_sync_worker.wake()
+    return jsonify(record.to_dict()), 201
+
+
+@api_bp.route('/leaves/<int:leave_id>', methods=['DELETE'])
+@api_login_required
+def delete_leave(leave_id):
+    """刪除請假記錄並恢復天數"""
+    record = db.session.get(LeaveRecord, leave_id)
+    if record is None:
+        abort(404)
+    ensure_user_access(record.user_id)
+    
+    LeaveService.delete_leave_record(leave_id, restore_days=True)
+    return '', 204
@@ -4,148 +4,106 @@
 用於監控系統狀態和服務可用性
 """
 
-import os
-import time
 import json
 from datetime import datetime
-from flask import Blueprint, jsonify, current_app
-from ..models import db, User
-from sqlalchemy import text
+from flask import Blueprint, Response, jsonify, current_app, request
+from ..models import db
+from ..utils.database import pool_stats
+from ..utils.metrics import render_latest
+from ..services.health_service import HealthService, health_snapshot_cache
+from ..services.counter_service import CounterService
+from ..services.user_cache import get_user_cache
+from ..services.availability_index import get_availability_index
+from ..services.google_integration import loaded_google_service
 
 # 建立 Blueprint
 health_bp = Blueprint('health', __name__)
 
 @health_bp.route('/health')
 def health_check():
-    """基本健康檢查端點"""
+    """存活檢查端點（不存取資料庫，供重啟判斷使用）"""
+    return jsonify({
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        'version': '1.0.2-deploy-test',
+        'checks': {
+            'application': 'ok'
+        }
+    }), 200
+
+@health_bp.route('/health/ready')
+def readiness_check():
+    """就緒檢查端點（資料庫可連線才接收流量）"""
     try:
-        # 檢查資料庫連線
-        db.session.execute(text('SELECT 1'))
+        db_time_ms = HealthService.check_database()
         
-        # 檢查應用程式基本狀態
-        health_status = {
-            'status': 'healthy',
+        return jsonify({
+            'status': 'ready',
             'timestamp': datetime.now().isoformat(),
-            'version': '1.0.2-deploy-test',
             'checks': {
                 'database': 'ok',
-                'application': 'ok'
+                'database_response_time_ms': db_time_ms
             }
-        }
-        
-        return jsonify(health_status), 200
+        }), 200
         
     except Exception as e:
-        error_status = {
-            'status': 'unhealthy',
+        db.session.rollback()
+        current_app.logger.error(f"就緒檢查失敗: {e}")
+        
+        return jsonify({
+            'status': 'not_ready',
             'timestamp': datetime.now().isoformat(),
             'error': str(e),
             'checks': {
-                'database': 'error',
-                'application': 'ok'
+                'database': 'error'
             }
-        }
-        
-        current_app.logger.error(f"健康檢查失敗: {e}")
-        return jsonify(error_status), 503
+        }), 503
 
 @health_bp.route('/health/detailed')
 def detailed_health_check():
-    """詳細健康檢查端點"""
-    try:
-        start_time = time.time()
-        
-        # 檢查資料庫連線和查詢效能
-        db_start = time.time()
-        db.session.execute(text('SELECT 1'))
-        db_time = time.time() - db_start
-        
-        # 檢查用戶表是否正常
-        user_count = User.query.count()
-        
-        # 檢查 Google Calendar API 連線
-        google_api_status = 'ok'
-        try:
-            if os.path.exists('credentials.json'):
-                from google.oauth2.service_account import Credentials
-                creds = Credentials.from_service_account_file('credentials.json')
-                google_api_status = 'ok'
-            else:
-                google_api_status = 'warning - credentials file missing'
-        except Exception:
-            google_api_status = 'error'
-        
-        # 檢查檔案系統權限
-        logs_writable = 'ok'
-        try:
-            if not os.path.exists('logs'):
-                os.makedirs('logs')
-            test_file = 'logs/health_check_test.tmp'
-            with open(test_file, 'w') as f:
-                f.write('test')
-            os.remove(test_file)
-        except Exception:
-            logs_writable = 'error'
-        
-        # 檢查請假記錄表
-        leave_records_status = 'ok'
-        try:
-            from ..models import LeaveRecord
-            leave_count = LeaveRecord.query.count()
-        except Exception:
-            leave_records_status = 'error'
-            leave_count = 0
-        
-        total_time = time.time() - start_time
-        
-        detailed_status = {
-            'status': 'healthy',
-            'timestamp': datetime.now().isoformat(),
-            'response_time_ms': round(total_time * 1000, 2),
-            'checks': {
-                'database': {
-                    'status': 'ok',
-                    'response_time_ms': round(db_time * 1000, 2),
-                    'user_count': user_count
-                },
-                'application': {
-                    'status': 'ok',
-                    'uptime': 'unknown'
-                },
-                'google_api': {
-                    'status': google_api_status
-                },
-                'file_system': {
-                    'logs_writable': logs_writable
-                },
-                'leave_records': {
-                    'status': leave_records_status,
-                    'total_count': leave_count
-                }
-            }
-        }
-        
-        return jsonify(detailed_status), 200
-        
-    except Exception as e:
-        current_app.logger.error(f"詳細健康檢查失敗: {e}")
-        
-        error_status = {
-            'status': 'unhealthy',
-            'timestamp': datetime.now().isoformat(),
-            'error': str(e),
-            'checks': {
-                'database': 'error',
-                'application': 'unknown'
-            }
-        }
-        
-        return jsonify(error_status), 503
+    """詳細健康檢查端點（回傳背景快取的檢查快照與其秒數）"""
+    snapshot, age = health_snapshot_cache.get()
+    
+    detailed_status = dict(snapshot)
+    detailed_status['snapshot_age_seconds'] = round(age, 1)
+    
+    status_code = 200 if snapshot['status'] == 'healthy' else 503
+    return jsonify(detailed_status), status_code
+
+def google_client_pool_stats():
+    """Google API 連線池統計（服務尚未初始化時為 None）"""
+    service = loaded_google_service()
+    if service is None or service.client_pool is None:
+        return None
+    return service.client_pool.stats()
+
+def wants_prometheus_format():
+    """Prometheus 抓取（Accept 偏好 text/plain）或 ?format=prometheus 時輸出文字格式"""
+    if request.args.get('format') == 'prometheus':
+        return True
+    accept = request.accept_mimetypes
+    # Prometheus 的 Accept 帶有 version 參數，只比對主類型
+    text_quality = max(
+        (quality for value, quality in accept
+         if value.split(';')[0].strip() in ('text/plain', 'application/openmetrics-text')),
+        default=0
+    )
+    return text_quality > accept['application/json']
 
 @health_bp.route('/metrics')
 def basic_metrics():
     """基本監控指標端點"""
+    if wants_prometheus_format():
+        body, content_type = render_latest()
+        return Response(body, content_type=content_type)
+    
     try:
+        # 預設讀取計數器，?exact=1 時才執行 COUNT(*)
+        exact = request.args.get('exact') == '1'
+        total_users, user_count_source = CounterService.get_count('user', exact=exact)
+        total_leave_records, leave_count_source = CounterService.get_count('leave_record', exact=exact)
+        fragment_cache = current_app.extensions.get('fragment_cache')
+        
         metrics = {
             'timestamp': datetime.now().isoformat(),
             'application': {
@@ -153,9 +111,19 @@ def basic_metrics():
                 'version': '1.0.0'
             },
             'database': {
-                'total_users': User.query.count(),
+                'total_users': total_users,
+                'total_leave_records': total_leave_records,
+                'count_source': {
+                    'user': user_count_source,
+                    'leave_record': leave_count_source
+                },
                 'active_sessions': 'unknown'  # TODO: 實作 session 計數
-            }
+            },
+            'database_pool': pool_stats(db.engine),
+            'google_client_pool': google_client_pool_stats(),
+            'user_cache': get_user_cache().stats(),
+            'availability_index': get_availability_index().stats(),
+            'fragment_cache': fragment_cache.stats() if fragment_cache is not None else None
         }
         
         return jsonify(metrics), 200
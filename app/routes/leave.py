@@ -4,7 +4,8 @@ from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_required, current_user
 from ..services.leave_service import LeaveService
 from ..services.user_service import UserService
-from ..services.google_service import get_google_service
+from ..services.google_integration import get_google_service
+from ..services.calendar_sync_service import calendar_sync_worker
 from ..exceptions import ValidationError, BusinessLogicError, DatabaseError, ExternalServiceError
 
 leave_bp = Blueprint('leave', __name__, url_prefix='/leave')
@@ -15,12 +16,17 @@ leave_bp = Blueprint('leave', __name__, url_prefix='/leave')
 def dashboard():
     """用戶儀表板（原 base 頁面）"""
     try:
-        # 取得當前使用者請假紀錄
-        leave_records = LeaveService.get_user_leave_records(current_user.id)
+        # 取得當前使用者請假紀錄（分頁）
+        cursor = request.args.get('cursor')
+        leave_records, next_cursor = LeaveService.get_user_leave_records_page(
+            current_user.id,
+            request.args.get('per_page', type=int),
+            cursor
+        )
         
         # 計算年度請假統計
         current_year = datetime.now().year
-        stats = LeaveService.calculate_annual_leave_stats(leave_records, current_year)
+        stats = LeaveService.get_annual_leave_stats(current_user.id, current_year)
         
         return render_template(
             'base.html',
@@ -32,6 +38,8 @@ def dashboard():
             family_care_days=current_user.family_care_days,
             compassionate_days=current_user.compassionate_days,
             leave_records=leave_records,
+            cursor=cursor,
+            next_cursor=next_cursor,
             current_year=current_year,
             **stats
         )
@@ -50,6 +58,7 @@ def apply():
             'start_date': request.form.get('start_date'),
             'end_date': request.form.get('end_date'),
             'half_day': 'half_day' in request.form,
+            'half_day_period': request.form.get('half_day_period'),
             'reason': request.form.get('reason', '').strip()
         }
         
@@ -61,25 +70,10 @@ def apply():
                 receipt_url = google_service.process_receipt_upload(receipt)
                 leave_data['receipt_url'] = receipt_url
             
-            # 創建請假申請
-            leave_record = LeaveService.create_leave_request(current_user, leave_data)
-            flash('請假申請成功', 'success')
-            
-            # 嘗試同步到 Google Calendar
-            try:
-                google_service = get_google_service()
-                event_summary = f"{current_user.username} - {leave_data['leave_type']}"
-                calendar_event = google_service.create_calendar_event(
-                    event_summary, 
-                    leave_record.start_date, 
-                    leave_record.end_date
-                )
-                if calendar_event:
-                    flash('請假已同步至 Google 日曆', 'success')
-                else:
-                    flash('請假同步 Google 日曆失敗', 'warning')
-            except ExternalServiceError:
-                flash('請假同步 Google 日曆失敗', 'warning')
+            # 創建請假申請（Google 日曆同步已在同一交易排入 outbox）
+            LeaveService.create_leave_request(current_user, leave_data)
+            calendar_sync_worker.wake()
+            flash('請假申請成功，將於背景同步至 Google 日曆', 'success')
             
             return redirect(url_for('leave.apply'))
             
@@ -110,16 +104,23 @@ def user_records(user_id):
             flash('找不到該用戶', 'danger')
             return redirect(url_for('admin.admin') if current_user.is_admin else url_for('leave.dashboard'))
         
-        leave_records = LeaveService.get_user_leave_records(user_id)
+        cursor = request.args.get('cursor')
+        leave_records, next_cursor = LeaveService.get_user_leave_records_page(
+            user_id,
+            request.args.get('per_page', type=int),
+            cursor
+        )
         
         # 計算年度請假統計
         current_year = datetime.now().year
-        stats = LeaveService.calculate_annual_leave_stats(leave_records, current_year)
+        stats = LeaveService.get_annual_leave_stats(user_id, current_year)
         
         return render_template(
             'user_records.html',
             user=user,
             leave_records=leave_records,
+            cursor=cursor,
+            next_cursor=next_cursor,
             current_year=current_year,
             **stats
         )
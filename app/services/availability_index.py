@@ -0,0 +1,228 @@
+"""團隊請假狀況索引"""
+import threading
+import time
+from datetime import date
+from bisect import bisect_left, bisect_right, insort
+from flask import current_app
+from ..models import LeaveRecord, RowCounter, User, db
+
+# 請假記錄版本計數器：每次新增/刪除請假記錄時遞增，各 worker 以此判斷索引是否過期
+VERSION_COUNTER = 'leave_record_version'
+
+
+class AvailabilityIndex:
+    """
+    以開始日排序的請假區間索引（每個 worker 一份）
+    
+    _keys 依 (開始日序數, 記錄 id, 結束日序數) 排序，並記錄最長請假跨度；
+    與 [start, end] 重疊的請假開始日必落在 [start - 最長跨度, end]，
+    以兩次二分搜尋取得候選範圍，再過濾結束日即可。
+    首次查詢時載入，本 worker 的寫入增量更新，其他 worker 的寫入使版本
+    計數器前進，下次檢查版本時整份重建。
+    
+    只索引結束日在 history_days 天內（或未來）的請假，記憶體與重建時間不隨
+    歷史記錄成長；查詢期間早於此範圍時直接查詢資料庫。
+    """
+    
+    def __init__(self, check_interval=1.0, history_days=90):
+        self.check_interval = check_interval
+        self.history_days = history_days
+        self.version = None
+        self._horizon = 0
+        self._loaded_on = None
+        self._keys = []
+        self._entries = {}
+        self._max_span = 0
+        self._loaded = False
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self.rebuilds = 0
+    
+    def _insert(self, record_id, entry):
+        start_ordinal = entry['start_date'].toordinal()
+        end_ordinal = entry['end_date'].toordinal()
+        insort(self._keys, (start_ordinal, record_id, end_ordinal))
+        self._entries[record_id] = entry
+        self._max_span = max(self._max_span, end_ordinal - start_ordinal)
+    
+    def _remove(self, record_id):
+        entry = self._entries.pop(record_id, None)
+        if entry is None:
+            return
+        start_ordinal = entry['start_date'].toordinal()
+        index = bisect_left(self._keys, (start_ordinal, record_id))
+        if index < len(self._keys) and self._keys[index][1] == record_id:
+            del self._keys[index]
+        # 移除的是最長跨度的請假時重新計算，避免候選範圍只增不減
+        if entry['end_date'].toordinal() - start_ordinal == self._max_span:
+            self._max_span = max((end - start for start, _, end in self._keys), default=0)
+    
+    def horizon(self):
+        """今日所需的索引起點（日期序數）：結束日不早於此的請假都在索引中"""
+        return date.today().toordinal() - self.history_days
+    
+    @staticmethod
+    def _select():
+        return db.select(
+            LeaveRecord.id, LeaveRecord.user_id, User.username, LeaveRecord.leave_type,
+            LeaveRecord.start_date, LeaveRecord.end_date, LeaveRecord.half_day,
+            LeaveRecord.half_day_period, LeaveRecord.days
+        ).join(User, User.id == LeaveRecord.user_id)
+    
+    def load(self):
+        """由資料庫重建索引（先讀版本，讀取期間的寫入會在下次檢查時重建）"""
+        with self._lock:
+            version = self._current_version()
+            horizon = self.horizon()
+            rows = db.session.execute(
+                self._select().where(LeaveRecord.end_date >= date.fromordinal(horizon))
+            )
+            self._keys = []
+            self._entries = {}
+            self._max_span = 0
+            for row in rows:
+                self._entries[row.id] = self.entry(row, row.username)
+                start_ordinal, end_ordinal = row.start_date.toordinal(), row.end_date.toordinal()
+                self._keys.append((start_ordinal, row.id, end_ordinal))
+                self._max_span = max(self._max_span, end_ordinal - start_ordinal)
+            self._keys.sort()
+            self.version = version
+            self._horizon = horizon
+            self._loaded_on = date.today()
+            self._loaded = True
+            self._checked_at = time.monotonic()
+            self.rebuilds += 1
+    
+    @staticmethod
+    def entry(record, username):
+        """索引項目（record 須已有 id）"""
+        return {
+            'id': record.id,
+            'user_id': record.user_id,
+            'username': username,
+            'leave_type': record.leave_type,
+            'start_date': record.start_date,
+            'end_date': record.end_date,
+            'half_day': record.half_day,
+            'half_day_period': record.half_day_period,
+            'days': record.days
+        }
+    
+    @staticmethod
+    def _current_version():
+        """資料庫中的版本計數（尚未建立時視為 0，首次遞增即建立為 1）"""
+        return RowCounter.get_value(VERSION_COUNTER) or 0
+    
+    def _ensure_current(self):
+        """
+        未載入或版本過期時重建；版本最多每 check_interval 秒查詢一次
+        
+        跨日後也重建一次，讓已超出保留範圍的請假離開索引。
+        """
+        if self._loaded and time.monotonic() - self._checked_at < self.check_interval:
+            return
+        if self._loaded and self._loaded_on == date.today() and self._current_version() == self.version:
+            self._checked_at = time.monotonic()
+            return
+        self.load()
+    
+    def query(self, start_date, end_date):
+        """回傳與 [start_date, end_date] 重疊的請假（依開始日排序）"""
+        if start_date.toordinal() < self.horizon():
+            # 早於索引保留範圍的期間直接查詢資料庫
+            rows = db.session.execute(
+                self._select()
+                  .where(LeaveRecord.start_date <= end_date, LeaveRecord.end_date >= start_date)
+                  .order_by(LeaveRecord.start_date, LeaveRecord.id)
+            )
+            return [self.entry(row, row.username) for row in rows]
+        
+        with self._lock:
+            self._ensure_current()
+            start_ordinal, end_ordinal = start_date.toordinal(), end_date.toordinal()
+            low = bisect_left(self._keys, (start_ordinal - self._max_span,))
+            high = bisect_right(self._keys, (end_ordinal + 1,))
+            return [
+                self._entries[record_id]
+                for _, record_id, record_end in self._keys[low:high]
+                if record_end >= start_ordinal
+            ]
+    
+    def apply(self, version, added=None, removed_id=None):
+        """
+        套用本 worker 已提交的寫入
+        
+        version 為該次寫入後的版本計數；若中間有其他 worker 的寫入則標記為
+        過期，下次查詢時重建。
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+            if version != self.version + 1:
+                self._loaded = False
+                return
+            if removed_id is not None:
+                self._remove(removed_id)
+            if added is not None and added['end_date'].toordinal() >= self._horizon:
+                self._insert(added['id'], added)
+            self.version = version
+    
+    def invalidate(self):
+        """標記為過期，下次查詢時重建"""
+        with self._lock:
+            self._loaded = False
+    
+    def stats(self):
+        """索引大小與重建次數"""
+        with self._lock:
+            return {
+                'loaded': self._loaded,
+                'records': len(self._keys),
+                'version': self.version,
+                'max_span_days': self._max_span + 1 if self._keys else 0,
+                'horizon': date.fromordinal(self._horizon).isoformat() if self._loaded else None,
+                'rebuilds': self.rebuilds
+            }
+
+
+def init_availability_index(app):
+    """建立此應用程式的請假狀況索引（首次查詢時才載入）"""
+    app.extensions['availability_index'] = AvailabilityIndex(
+        check_interval=app.config['AVAILABILITY_VERSION_CHECK_INTERVAL'],
+        history_days=app.config['AVAILABILITY_HISTORY_DAYS']
+    )
+
+
+def get_availability_index():
+    """目前應用程式的請假狀況索引"""
+    return current_app.extensions['availability_index']
+
+
+def bump_leave_version():
+    """
+    在寫入請假記錄的交易中遞增版本計數，回傳新版本，不另外提交
+    
+    計數器分片儲存（見 RowCounter），並行的請假寫入不會等待同一列的鎖。
+    """
+    return RowCounter.bump(VERSION_COUNTER)
+
+
+def invalidate_availability():
+    """批次變更請假記錄（例如刪除用戶）提交後讓本 worker 的索引重建"""
+    index = current_app.extensions.get('availability_index')
+    if index is not None:
+        index.invalidate()
+
+
+def leave_created(entry, version):
+    """新增請假提交後更新索引；entry 須於提交前建立，避免提交後重新載入記錄"""
+    index = current_app.extensions.get('availability_index')
+    if index is not None:
+        index.apply(version, added=entry)
+
+
+def leave_deleted(record_id, version):
+    """刪除請假提交後更新索引"""
+    index = current_app.extensions.get('availability_index')
+    if index is not None:
+        index.apply(version, removed_id=record_id)
@@ -0,0 +1,354 @@
+"""Google Calendar 背景同步服務"""
+import base64
+import hashlib
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.engine import make_url
+from ..models import CalendarOutbox, LeaveRecord, User, db
+from .google_integration import get_google_service
+
+
+class CalendarSyncService:
+    """Calendar outbox 寫入與處理"""
+    
+    @staticmethod
+    def enqueue(leave_record, summary, calendar_id=None):
+        """
+        將請假記錄加入同步佇列
+        
+        只加入 session 不提交，呼叫端須與請假記錄在同一交易中提交。
+        """
+        outbox = CalendarOutbox(
+            leave_record=leave_record,
+            calendar_id=calendar_id,
+            summary=summary,
+            start_date=leave_record.start_date,
+            end_date=leave_record.end_date,
+            status=CalendarOutbox.STATUS_PENDING,
+            attempts=0,
+            next_attempt_at=datetime.now()
+        )
+        db.session.add(outbox)
+        return outbox
+    
+    @staticmethod
+    def event_namespace():
+        """
+        此安裝的事件 ID 命名空間（8 個 base32hex 字元）
+        
+        預設由資料庫主機與名稱雜湊而來（不含密碼，輪替密碼不影響），讓共用同一
+        日曆的不同環境或重建後的資料庫不會因相同的請假記錄 ID 而互相略過事件；
+        可由 CALENDAR_EVENT_ID_NAMESPACE 指定。
+        """
+        namespace = current_app.config['CALENDAR_EVENT_ID_NAMESPACE']
+        if not namespace:
+            url = make_url(current_app.config['SQLALCHEMY_DATABASE_URI'])
+            namespace = f"{url.drivername}://{url.host or ''}:{url.port or ''}/{url.database or ''}"
+        digest = hashlib.sha1(namespace.encode('utf-8')).digest()
+        return base64.b32hexencode(digest).decode('ascii')[:8].lower()
+    
+    @staticmethod
+    def event_id_for(leave_record_id):
+        """
+        由命名空間與請假記錄 ID 產生固定的 Calendar 事件 ID（base32hex 字元）
+        
+        重試或回補時重複送出同一事件會得到 409，而不是產生重複事件。
+        """
+        return f"leave{CalendarSyncService.event_namespace()}{leave_record_id}"
+    
+    @staticmethod
+    def retry_delay(attempts):
+        """計算第 N 次失敗後的重試間隔（指數退避加抖動）"""
+        config = current_app.config
+        delay = min(
+            config['CALENDAR_SYNC_BACKOFF_BASE'] * (2 ** (attempts - 1)),
+            config['CALENDAR_SYNC_BACKOFF_MAX']
+        )
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+    
+    @staticmethod
+    def process_batch(batch_size=None, calendar_client=None):
+        """
+        處理一批到期的同步待辦
+        
+        calendar_client 需提供 create_calendar_event()，預設使用 Google 服務。
+        回傳 {'synced': n, 'retried': n, 'failed': n, 'skipped': n}；skipped 為認領後
+        連同請假記錄被刪除的項目。
+        """
+        config = current_app.config
+        batch_size = batch_size or config['CALENDAR_SYNC_BATCH_SIZE']
+        now = datetime.now()
+        lease_until = now + timedelta(seconds=config['CALENDAR_SYNC_LEASE_SECONDS'])
+        
+        claimed = [
+            outbox_id for outbox_id in CalendarOutbox.due_ids(now, batch_size)
+            if CalendarOutbox.claim(outbox_id, now, lease_until)
+        ]
+        db.session.commit()
+        
+        results = {'synced': 0, 'retried': 0, 'failed': 0, 'skipped': 0}
+        for outbox_id in claimed:
+            results[CalendarSyncService._process_one(outbox_id, calendar_client)] += 1
+        return results
+    
+    @staticmethod
+    def _process_one(outbox_id, calendar_client):
+        """同步單筆待辦並記錄結果狀態"""
+        outbox = db.session.get(CalendarOutbox, outbox_id)
+        if outbox is None:
+            # 認領後請假記錄被刪除，outbox 已隨之刪除
+            return 'skipped'
+        
+        try:
+            if calendar_client is None:
+                calendar_client = get_google_service()
+            
+            outbox.event_link = calendar_client.create_calendar_event(
+                outbox.summary,
+                outbox.start_date,
+                outbox.end_date,
+                calendar_id=outbox.calendar_id,
+                raise_errors=True,
+                event_id=CalendarSyncService.event_id_for(outbox.leave_record_id)
+            )
+            outbox.attempts += 1
+            outbox.status = CalendarOutbox.STATUS_DONE
+            outbox.last_error = None
+            result = 'synced'
+        except Exception as e:
+            result = CalendarSyncService._record_failure(outbox, e)
+        
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error saving calendar outbox {outbox_id}: {e}")
+        return result
+
+
+    @staticmethod
+    def _record_failure(outbox, error):
+        """記錄同步失敗：排定重試或在超過次數後標記失敗"""
+        outbox.attempts += 1
+        outbox.last_error = str(error)[:500]
+        if outbox.attempts >= current_app.config['CALENDAR_SYNC_MAX_ATTEMPTS']:
+            outbox.status = CalendarOutbox.STATUS_FAILED
+            current_app.logger.error(f"Calendar sync for outbox {outbox.id} gave up: {error}")
+            return 'failed'
+        outbox.status = CalendarOutbox.STATUS_PENDING
+        outbox.next_attempt_at = datetime.now() + CalendarSyncService.retry_delay(outbox.attempts)
+        current_app.logger.warning(f"Calendar sync for outbox {outbox.id} failed, will retry: {error}")
+        return 'retried'
+    
+    @staticmethod
+    def _unsynced_records_query(start_date=None, end_date=None, user_ids=None):
+        """尚未排入或完成同步的請假記錄（start_date 介於起迄日，含迄日）"""
+        queued = db.session.query(CalendarOutbox.id).filter(
+            CalendarOutbox.leave_record_id == LeaveRecord.id,
+            CalendarOutbox.status != CalendarOutbox.STATUS_FAILED
+        )
+        query = db.session.query(LeaveRecord, User.username)\
+                          .join(User, User.id == LeaveRecord.user_id)\
+                          .filter(~queued.exists())
+        if start_date:
+            query = query.filter(LeaveRecord.start_date >= start_date)
+        if end_date:
+            query = query.filter(LeaveRecord.start_date <= end_date)
+        if user_ids:
+            query = query.filter(LeaveRecord.user_id.in_(user_ids))
+        return query
+    
+    @staticmethod
+    def count_unsynced(start_date=None, end_date=None, user_ids=None):
+        """統計需要回補的請假記錄數"""
+        return CalendarSyncService._unsynced_records_query(start_date, end_date, user_ids).count()
+    
+    @staticmethod
+    def enqueue_unsynced(start_date=None, end_date=None, user_ids=None):
+        """
+        將尚未同步的請假記錄排入 outbox，回傳排入數量
+        
+        已失敗的項目重設為待處理；已排入或已完成的記錄不重複加入。
+        """
+        now = datetime.now()
+        calendar_id = current_app.config['GOOGLE_CALENDAR_ID']
+        rows = CalendarSyncService._unsynced_records_query(start_date, end_date, user_ids).all()
+        
+        try:
+            # 一次載入這批記錄中已失敗的 outbox，避免逐筆查詢
+            record_ids = [record.id for record, _ in rows]
+            failed_outboxes = {
+                outbox.leave_record_id: outbox
+                for outbox in CalendarOutbox.query.filter(
+                    CalendarOutbox.leave_record_id.in_(record_ids),
+                    CalendarOutbox.status == CalendarOutbox.STATUS_FAILED
+                )
+            } if record_ids else {}
+            
+            for record, username in rows:
+                failed = failed_outboxes.get(record.id)
+                if failed:
+                    failed.status = CalendarOutbox.STATUS_PENDING
+                    failed.attempts = 0
+                    failed.next_attempt_at = now
+                else:
+                    CalendarSyncService.enqueue(record, f"{username} - {record.leave_type}", calendar_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error enqueuing calendar backfill: {e}")
+            raise
+        return len(rows)
+    
+    @staticmethod
+    def drain_with_batches(batch_size=50, requests_per_second=None, calendar_client=None, progress=None):
+        """
+        以 Calendar batch HTTP 端點清空到期的 outbox 項目
+        
+        每批最多 50 個事件，依 outbox 的 calendar_id 分組各送一個 batch 請求；
+        依 requests_per_second 控制送出速率，遇到速率限制時指數退避後重送。
+        progress(processed, results) 於每批完成後呼叫。
+        """
+        config = current_app.config
+        requests_per_second = requests_per_second or config['CALENDAR_BACKFILL_RATE']
+        if calendar_client is None:
+            calendar_client = get_google_service()
+        
+        results = {'synced': 0, 'retried': 0, 'failed': 0}
+        processed = 0
+        rate_limit_backoff = 0
+        
+        while True:
+            batch_started = time.monotonic()
+            now = datetime.now()
+            lease_until = now + timedelta(seconds=config['CALENDAR_SYNC_LEASE_SECONDS'])
+            claimed = [
+                outbox_id for outbox_id in CalendarOutbox.due_ids(now, batch_size)
+                if CalendarOutbox.claim(outbox_id, now, lease_until)
+            ]
+            db.session.commit()
+            if not claimed:
+                break
+            
+            outboxes = CalendarOutbox.query.filter(CalendarOutbox.id.in_(claimed))\
+                                           .order_by(CalendarOutbox.id).all()
+            by_calendar = {}
+            for outbox in outboxes:
+                calendar_id = outbox.calendar_id or config['GOOGLE_CALENDAR_ID']
+                by_calendar.setdefault(calendar_id, []).append(outbox)
+            
+            responses = {}
+            for calendar_id, group in by_calendar.items():
+                events = {
+                    outbox.id: calendar_client.build_calendar_event(
+                        outbox.summary, outbox.start_date, outbox.end_date,
+                        CalendarSyncService.event_id_for(outbox.leave_record_id)
+                    )
+                    for outbox in group
+                }
+                try:
+                    responses.update(calendar_client.create_calendar_events_batch(events, calendar_id=calendar_id))
+                except Exception as e:
+                    responses.update({outbox.id: (None, e) for outbox in group})
+            
+            rate_limited = False
+            for outbox in outboxes:
+                link, error = responses.get(outbox.id, (None, RuntimeError('batch 回應缺少此項目')))
+                if error is None or calendar_client.is_duplicate_event_error(error):
+                    outbox.status = CalendarOutbox.STATUS_DONE
+                    outbox.attempts += 1
+                    outbox.event_link = link
+                    outbox.last_error = None
+                    results['synced'] += 1
+                elif calendar_client.is_rate_limit_error(error):
+                    # 速率限制不計入失敗次數，退避後重送
+                    rate_limited = True
+                    outbox.status = CalendarOutbox.STATUS_PENDING
+                    outbox.next_attempt_at = now
+                    outbox.last_error = str(error)[:500]
+                else:
+                    results[CalendarSyncService._record_failure(outbox, error)] += 1
+            db.session.commit()
+            
+            processed += len(outboxes)
+            if progress:
+                progress(processed, results)
+            
+            if rate_limited:
+                rate_limit_backoff = min(max(rate_limit_backoff * 2, 1), config['CALENDAR_SYNC_BACKOFF_MAX'])
+                current_app.logger.warning(f"Calendar backfill rate limited, backing off {rate_limit_backoff}s")
+                time.sleep(rate_limit_backoff)
+            else:
+                rate_limit_backoff = 0
+                # 依事件數控制每秒呼叫次數
+                remaining = len(outboxes) / requests_per_second - (time.monotonic() - batch_started)
+                if remaining > 0:
+                    time.sleep(remaining)
+        
+        return results
+
+
+class CalendarSyncWorker:
+    """在應用程式內執行的背景同步執行緒"""
+    
+    def __init__(self):
+        self.app = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+    
+    def init_app(self, app):
+        """綁定應用程式；實際執行緒於首次請求時才啟動（避免 fork 前建立執行緒）"""
+        self.app = app
+        if not app.config['CALENDAR_SYNC_WORKER_ENABLED']:
+            return
+        
+        @app.before_request
+        def _ensure_calendar_sync_worker():
+            self.start()
+    
+    def start(self):
+        """啟動背景執行緒（已啟動則略過）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='calendar-sync', daemon=True)
+            self._thread.start()
+    
+    def wake(self):
+        """有新待辦時立即喚醒執行緒"""
+        self._wake_event.set()
+    
+    def stop(self, timeout=None):
+        """停止背景執行緒"""
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def _run(self):
+        interval = self.app.config['CALENDAR_SYNC_POLL_INTERVAL']
+        while not self._stop_event.is_set():
+            with self.app.app_context():
+                try:
+                    results = CalendarSyncService.process_batch()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Calendar sync worker error: {e}")
+                    results = {}
+            
+            # 本批處理滿時直接繼續，否則等待喚醒或輪詢間隔
+            if sum(results.values()) < self.app.config['CALENDAR_SYNC_BATCH_SIZE']:
+                self._wake_event.wait(interval)
+                self._wake_event.clear()
+
+
+# 全域背景同步實例
+calendar_sync_worker = CalendarSyncWorker()
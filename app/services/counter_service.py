@@ -0,0 +1,70 @@
+"""資料表列數計數服務"""
+from flask import current_app
+from sqlalchemy import text
+from ..models import LeaveRecord, RowCounter, User, db
+from ..exceptions import DatabaseError
+
+# 計數器名稱與對應的資料表模型
+COUNTED_TABLES = {
+    'user': User,
+    'leave_record': LeaveRecord,
+}
+
+
+class CounterService:
+    """
+    由寫入端增減維護的列數計數
+    
+    計數分散在多個分片列（見 RowCounter），並行的請假寫入不會因同一列的鎖而
+    依序執行；讀取成本固定，不隨資料表成長；計數器尚未建立時於 MySQL 改用
+    information_schema 的估計值，其他資料庫才退回 COUNT(*)。
+    """
+    
+    @staticmethod
+    def increment(name, delta=1):
+        """增減計數，與呼叫端的寫入在同一交易中提交"""
+        RowCounter.increment(name, delta)
+    
+    @staticmethod
+    def get_count(name, exact=False):
+        """
+        取得資料表列數，回傳 (count, source)
+        
+        source 為 'counter'、'estimate' 或 'exact'；exact=True 時一律執行 COUNT(*)。
+        """
+        model = COUNTED_TABLES[name]
+        if not exact:
+            count = RowCounter.get_value(name)
+            if count is not None:
+                return count, 'counter'
+            
+            count = CounterService.estimate_count(model.__tablename__)
+            if count is not None:
+                return count, 'estimate'
+        
+        return db.session.execute(db.select(db.func.count()).select_from(model)).scalar(), 'exact'
+    
+    @staticmethod
+    def estimate_count(table_name):
+        """MySQL 的 InnoDB 統計列數估計（其他資料庫回傳 None）"""
+        if db.session.get_bind().dialect.name != 'mysql':
+            return None
+        return db.session.execute(
+            text("SELECT TABLE_ROWS FROM information_schema.TABLES "
+                 "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name"),
+            {'table_name': table_name}
+        ).scalar()
+    
+    @staticmethod
+    def rebuild(names=None):
+        """以 COUNT(*) 重設計數器，回傳 {名稱: 計數}"""
+        names = names or list(COUNTED_TABLES)
+        try:
+            counts = {name: RowCounter.rebuild(name, COUNTED_TABLES[name]) for name in names}
+            db.session.commit()
+            current_app.logger.info(f"Row counters rebuilt: {counts}")
+            return counts
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error rebuilding row counters: {e}")
+            raise DatabaseError("重建列數計數器時發生錯誤")
@@ -0,0 +1,174 @@
+"""Google API 客戶端連線池
+
+httplib2.Http 不是執行緒安全的，因此每個借出的客戶端組都擁有自己的
+授權 HTTP 傳輸層；池子在 fork 之後會自動丟棄繼承自父行程的連線。
+"""
+import os
+import threading
+import time
+import weakref
+from collections import namedtuple
+from contextlib import contextmanager
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from ..exceptions import ExternalServiceError
+from ..utils.metrics import (
+    GOOGLE_POOL_ACQUIRED, GOOGLE_POOL_IN_USE, GOOGLE_POOL_SIZE, GOOGLE_POOL_TIMEOUTS, GOOGLE_POOL_WAIT,
+    GOOGLE_POOL_WAITS
+)
+
+# 同一組授權傳輸層上建立的 Calendar 與 Drive 客戶端
+GoogleClients = namedtuple('GoogleClients', ['calendar', 'drive'])
+
+# 每個行程只讀取一次隨套件附帶的靜態 discovery 文件
+_discovery_documents = {}
+_discovery_lock = threading.Lock()
+
+# 所有連線池，用於 fork 後重置
+_pools = weakref.WeakSet()
+
+
+def get_discovery_document(service_name, version):
+    """取得套件內建的 discovery 文件（不發出網路請求）"""
+    key = (service_name, version)
+    document = _discovery_documents.get(key)
+    if document is None:
+        with _discovery_lock:
+            document = _discovery_documents.get(key)
+            if document is None:
+                document = get_static_doc(service_name, version)
+                if document is None:
+                    raise ExternalServiceError(f"找不到 {service_name} {version} 的靜態 discovery 文件")
+                _discovery_documents[key] = document
+    return document
+
+
+def build_static_client(service_name, version, http, client_options=None):
+    """以靜態 discovery 文件建立 API 客戶端"""
+    return build_from_document(
+        get_discovery_document(service_name, version),
+        http=http,
+        client_options=client_options
+    )
+
+
+class GoogleClientPool:
+    """有上限的 Google API 客戶端池"""
+    
+    def __init__(self, factory, max_size=4, acquire_timeout=30):
+        self.factory = factory
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self._reset()
+        _pools.add(self)
+    
+    def _reset(self):
+        """重置池狀態（初始化及 fork 後使用）"""
+        self._pid = os.getpid()
+        self._condition = threading.Condition()
+        self._idle = []
+        self._size = 0
+        self._in_use = 0
+        self._created = 0
+        self._acquired = 0
+        self._wait_count = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._update_gauges()
+    
+    def _update_gauges(self):
+        """同步 Prometheus 的池大小與借出數（呼叫端持有鎖或在初始化中）"""
+        GOOGLE_POOL_SIZE.set(self._size)
+        GOOGLE_POOL_IN_USE.set(self._in_use)
+    
+    @contextmanager
+    def acquire(self):
+        """借出一組客戶端，離開區塊時歸還"""
+        if self._pid != os.getpid():
+            self._reset()
+        clients = self._checkout()
+        try:
+            yield clients
+        finally:
+            self._checkin(clients)
+    
+    def _checkout(self):
+        start = time.monotonic()
+        deadline = start + self.acquire_timeout
+        waited = False
+        
+        with self._condition:
+            while True:
+                if self._idle:
+                    clients = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    clients = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    GOOGLE_POOL_TIMEOUTS.inc()
+                    raise ExternalServiceError("Google API 連線池已滿，請稍後再試")
+                waited = True
+                self._condition.wait(remaining)
+            
+            self._in_use += 1
+            self._acquired += 1
+            GOOGLE_POOL_ACQUIRED.inc()
+            if waited:
+                wait_time = time.monotonic() - start
+                self._wait_count += 1
+                self._wait_time_total += wait_time
+                self._wait_time_max = max(self._wait_time_max, wait_time)
+                GOOGLE_POOL_WAITS.inc()
+                GOOGLE_POOL_WAIT.inc(wait_time)
+            self._update_gauges()
+        
+        if clients is None:
+            try:
+                clients = self.factory()
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                    self._in_use -= 1
+                    self._update_gauges()
+                    self._condition.notify()
+                raise
+            with self._condition:
+                self._created += 1
+        return clients
+    
+    def _checkin(self, clients):
+        with self._condition:
+            self._in_use -= 1
+            self._idle.append(clients)
+            self._update_gauges()
+            self._condition.notify()
+    
+    def stats(self):
+        """連線池使用統計"""
+        with self._condition:
+            return {
+                'size': self._size,
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created': self._created,
+                'acquired': self._acquired,
+                'wait_count': self._wait_count,
+                'wait_time_total_ms': round(self._wait_time_total * 1000, 2),
+                'wait_time_max_ms': round(self._wait_time_max * 1000, 2),
+                'timeouts': self._timeouts
+            }
+
+
+def _reset_pools_after_fork():
+    for pool in list(_pools):
+        pool._reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
@@ -0,0 +1,28 @@
+"""Google 整合的延遲載入入口
+
+googleapiclient、google.oauth2 與 httplib2 的匯入成本高，路由、背景 worker 與
+監控端點一律經由此模組取得服務，第一次實際使用時才匯入 google_service，
+讓 create_app() 與每個 worker 啟動時不必載入 Google 相關套件。
+"""
+import sys
+
+_GOOGLE_SERVICE_MODULE = __name__.rsplit('.', 1)[0] + '.google_service'
+
+
+def get_google_service():
+    """獲取 Google 服務實例（首次呼叫時匯入並初始化）"""
+    from .google_service import get_google_service as load_google_service
+    return load_google_service()
+
+
+def loaded_google_service():
+    """已初始化的 Google 服務實例；尚未匯入或初始化時為 None，不會觸發匯入"""
+    module = sys.modules.get(_GOOGLE_SERVICE_MODULE)
+    return module.google_service if module is not None else None
+
+
+def reset_google_service():
+    """fork 後丟棄繼承自父行程的服務實例；尚未匯入時不需處理"""
+    module = sys.modules.get(_GOOGLE_SERVICE_MODULE)
+    if module is not None:
+        module.reset_google_service()
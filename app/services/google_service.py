@@ -1,41 +1,60 @@
 """Google 服務整合"""
 import os
 import mimetypes
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
+import httplib2
 from flask import current_app
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
 from google.oauth2.service_account import Credentials
 from werkzeug.utils import secure_filename
 from ..exceptions import ExternalServiceError, FileUploadError
+from .google_client_pool import GoogleClientPool, GoogleClients, build_static_client
+
+# Calendar batch HTTP 端點單次請求的上限
+CALENDAR_BATCH_LIMIT = 50
 
 
 class GoogleService:
     """Google 服務類"""
     
-    def __init__(self):
+    def __init__(self, credentials=None, http_factory=None):
         self.scopes = [
             'https://www.googleapis.com/auth/drive.file',
             'https://www.googleapis.com/auth/calendar'
         ]
-        self.credentials = None
-        self.calendar_service = None
-        self.drive_service = None
+        self.credentials = credentials
+        self.http_factory = http_factory
+        self.client_pool = None
         self._initialize_services()
     
     def _initialize_services(self):
         """初始化 Google 服務"""
         try:
-            credentials_file = current_app.config['GOOGLE_CREDENTIALS_FILE']
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            service_account_file = os.path.join(base_dir, '../../', credentials_file)
+            if self.credentials is None and self.http_factory is None:
+                credentials_file = current_app.config['GOOGLE_CREDENTIALS_FILE']
+                base_dir = os.path.dirname(os.path.abspath(__file__))
+                service_account_file = os.path.join(base_dir, '../../', credentials_file)
+                
+                self.credentials = Credentials.from_service_account_file(
+                    service_account_file, 
+                    scopes=self.scopes
+                )
+            
+            config = current_app.config
+            self.http_timeout = config['GOOGLE_API_TIMEOUT']
+            
+            # 可指向本機假 Calendar 端點以便測試
+            calendar_endpoint = config.get('GOOGLE_CALENDAR_API_ENDPOINT')
+            self.calendar_client_options = {'api_endpoint': calendar_endpoint} if calendar_endpoint else None
             
-            self.credentials = Credentials.from_service_account_file(
-                service_account_file, 
-                scopes=self.scopes
+            self.client_pool = GoogleClientPool(
+                self._build_clients,
+                max_size=config['GOOGLE_CLIENT_POOL_SIZE'],
+                acquire_timeout=config['GOOGLE_CLIENT_POOL_TIMEOUT']
             )
-            self.calendar_service = build('calendar', 'v3', credentials=self.credentials)
-            self.drive_service = build('drive', 'v3', credentials=self.credentials)
             
             current_app.logger.info("Google services initialized successfully")
             
@@ -43,113 +62,223 @@ class GoogleService:
             current_app.logger.error(f"Failed to initialize Google services: {e}")
             raise ExternalServiceError(f"Google API 初始化失敗: {e}")
     
-    def create_calendar_event(self, summary, start_date, end_date, calendar_id=None):
-        """創建 Google Calendar 事件"""
+    def _build_clients(self):
+        """建立一組擁有獨立 HTTP 傳輸層的 Calendar/Drive 客戶端"""
+        if self.http_factory is not None:
+            http = self.http_factory()
+        else:
+            http = AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=self.http_timeout))
+        
+        return GoogleClients(
+            calendar=build_static_client('calendar', 'v3', http, self.calendar_client_options),
+            drive=build_static_client('drive', 'v3', http)
+        )
+    
+    @staticmethod
+    def build_calendar_event(summary, start_date, end_date, event_id=None):
+        """組成全天請假事件內容"""
+        # 處理日期格式 - 使用全天事件格式
+        if isinstance(start_date, str):
+            start_date_str = start_date
+        else:
+            start_date_str = start_date.strftime('%Y-%m-%d')
+        
+        if isinstance(end_date, str):
+            end_date_str = end_date
+        else:
+            end_date_str = end_date.strftime('%Y-%m-%d')
+        
+        # 如果是請假，通常是全天事件，使用 date 而不是 dateTime
+        # 結束日期需要加一天（Google Calendar 全天事件的結束日期是不包含的）
+        end_date_obj = datetime.strptime(end_date_str, '%Y-%m-%d')
+        end_date_obj += timedelta(days=1)
+        end_date_str = end_date_obj.strftime('%Y-%m-%d')
+        
+        event = {
+            'summary': summary,
+            'start': {'date': start_date_str},
+            'end': {'date': end_date_str},
+            'description': f'請假申請 - {summary}'
+        }
+        if event_id:
+            event['id'] = event_id
+        return event
+    
+    @staticmethod
+    def is_duplicate_event_error(error):
+        """指定的事件 ID 已存在（先前已同步過）"""
+        return isinstance(error, HttpError) and error.resp.status == 409
+    
+    @staticmethod
+    def is_rate_limit_error(error):
+        """Google API 配額或速率限制錯誤"""
+        if not isinstance(error, HttpError):
+            return False
+        if error.resp.status == 429:
+            return True
+        return error.resp.status == 403 and any(
+            reason in str(error) for reason in ('rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded')
+        )
+    
+    def create_calendar_event(self, summary, start_date, end_date, calendar_id=None, raise_errors=False,
+                              event_id=None):
+        """
+        創建 Google Calendar 事件
+        
+        預設失敗時回傳 None；raise_errors=True 時改拋出 ExternalServiceError 供重試使用。
+        指定 event_id 時重複建立視為成功（回傳 None），讓重試不會產生重複事件。
+        """
         if not calendar_id:
             calendar_id = current_app.config['GOOGLE_CALENDAR_ID']
         
         try:
-            # 處理日期格式 - 使用全天事件格式
-            if isinstance(start_date, str):
-                start_date_str = start_date
-            else:
-                start_date_str = start_date.strftime('%Y-%m-%d')
-            
-            if isinstance(end_date, str):
-                end_date_str = end_date
-            else:
-                end_date_str = end_date.strftime('%Y-%m-%d')
-            
-            # 如果是請假，通常是全天事件，使用 date 而不是 dateTime
-            # 結束日期需要加一天（Google Calendar 全天事件的結束日期是不包含的）
-            from datetime import datetime, timedelta
-            end_date_obj = datetime.strptime(end_date_str, '%Y-%m-%d')
-            end_date_obj += timedelta(days=1)
-            end_date_str = end_date_obj.strftime('%Y-%m-%d')
-            
-            event = {
-                'summary': summary,
-                'start': {'date': start_date_str},
-                'end': {'date': end_date_str},
-                'description': f'請假申請 - {summary}'
-            }
+            event = self.build_calendar_event(summary, start_date, end_date, event_id)
             
             current_app.logger.debug(f"Creating calendar event: {event}")
             
-            created_event = self.calendar_service.events().insert(
-                calendarId=calendar_id, 
-                body=event
-            ).execute()
+            with self.client_pool.acquire() as clients:
+                created_event = clients.calendar.events().insert(
+                    calendarId=calendar_id, 
+                    body=event
+                ).execute()
             
             current_app.logger.info(f"Calendar event created: {created_event.get('htmlLink')}")
             return created_event.get('htmlLink')
             
         except Exception as e:
+            if event_id and self.is_duplicate_event_error(e):
+                current_app.logger.info(f"Calendar event {event_id} already exists")
+                return None
             current_app.logger.error(f"Error creating calendar event: {e}")
+            if raise_errors:
+                raise ExternalServiceError(f"Google Calendar 事件建立失敗: {e}")
             # 不拋出異常，讓主要業務流程繼續
             return None
     
+    def create_calendar_events_batch(self, events, calendar_id=None):
+        """
+        以 Calendar batch HTTP 端點一次送出多個事件（單次最多 50 個）
+        
+        events 為 {request_id: event_body}；回傳 {request_id: (htmlLink, exception)}。
+        整批失敗的 HttpError（例如 429）原樣拋出，讓呼叫端判斷是否為速率限制。
+        """
+        if not calendar_id:
+            calendar_id = current_app.config['GOOGLE_CALENDAR_ID']
+        if len(events) > CALENDAR_BATCH_LIMIT:
+            raise ValueError(f"Calendar batch 請求最多 {CALENDAR_BATCH_LIMIT} 個事件")
+        
+        results = {}
+        keys = {str(request_id): request_id for request_id in events}
+        
+        def callback(request_id, response, exception):
+            results[keys[request_id]] = ((response or {}).get('htmlLink'), exception)
+        
+        try:
+            with self.client_pool.acquire() as clients:
+                batch = clients.calendar.new_batch_http_request(callback=callback)
+                for request_id, event in events.items():
+                    batch.add(
+                        clients.calendar.events().insert(calendarId=calendar_id, body=event),
+                        request_id=str(request_id)
+                    )
+                batch.execute()
+        except HttpError as e:
+            current_app.logger.error(f"Calendar batch request failed: {e}")
+            raise
+        except Exception as e:
+            current_app.logger.error(f"Error executing calendar batch: {e}")
+            raise ExternalServiceError(f"Google Calendar 批次請求失敗: {e}")
+        
+        return results
+    
     def upload_to_drive(self, file_path, file_name, parent_folder_id=None):
         """上傳檔案到 Google Drive"""
         try:
             # 猜測檔案類型
             mimetype, _ = mimetypes.guess_type(file_path)
             
-            # 設定檔案元數據
-            file_metadata = {'name': file_name}
-            if parent_folder_id:
-                file_metadata['parents'] = [parent_folder_id]
-            
             # 上傳檔案
             media = MediaFileUpload(
                 file_path, 
                 mimetype=mimetype or 'application/octet-stream'
             )
-            uploaded_file = self.drive_service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id'
-            ).execute()
-            
-            # 設置檔案為公開可見
-            self.drive_service.permissions().create(
-                fileId=uploaded_file['id'],
-                body={'role': 'reader', 'type': 'anyone'}
-            ).execute()
+            with self.client_pool.acquire() as clients:
+                uploaded_file = clients.drive.files().create(
+                    body=self._drive_file_metadata(file_name, parent_folder_id),
+                    media_body=media,
+                    fields='id'
+                ).execute()
+                
+                return self._share_drive_file(clients.drive, uploaded_file['id'])
             
-            # 返回公開分享連結
-            share_url = f"https://drive.google.com/uc?export=view&id={uploaded_file['id']}"
-            current_app.logger.info(f"File uploaded to Google Drive: {share_url}")
-            return share_url
+        except Exception as e:
+            current_app.logger.error(f"Error uploading to Google Drive: {e}")
+            raise ExternalServiceError(f"Google Drive 上傳失敗: {e}")
+    
+    def upload_stream_to_drive(self, stream, file_name, mimetype=None, parent_folder_id=None):
+        """
+        以可續傳分塊方式將資料流上傳到 Google Drive
+        
+        每次只讀取 GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE 大小的資料，不落地成暫存檔。
+        """
+        try:
+            media = MediaIoBaseUpload(
+                stream,
+                mimetype=mimetype or 'application/octet-stream',
+                chunksize=current_app.config['GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE'],
+                resumable=True
+            )
+            with self.client_pool.acquire() as clients:
+                request = clients.drive.files().create(
+                    body=self._drive_file_metadata(file_name, parent_folder_id),
+                    media_body=media,
+                    fields='id'
+                )
+                
+                uploaded_file = None
+                while uploaded_file is None:
+                    _, uploaded_file = request.next_chunk()
+                
+                return self._share_drive_file(clients.drive, uploaded_file['id'])
             
         except Exception as e:
             current_app.logger.error(f"Error uploading to Google Drive: {e}")
             raise ExternalServiceError(f"Google Drive 上傳失敗: {e}")
     
+    @staticmethod
+    def _drive_file_metadata(file_name, parent_folder_id=None):
+        """設定檔案元數據"""
+        file_metadata = {'name': file_name}
+        if parent_folder_id:
+            file_metadata['parents'] = [parent_folder_id]
+        return file_metadata
+    
+    @staticmethod
+    def _share_drive_file(drive, file_id):
+        """設置檔案為公開可見並返回分享連結"""
+        drive.permissions().create(
+            fileId=file_id,
+            body={'role': 'reader', 'type': 'anyone'}
+        ).execute()
+        
+        share_url = f"https://drive.google.com/uc?export=view&id={file_id}"
+        current_app.logger.info(f"File uploaded to Google Drive: {share_url}")
+        return share_url
+    
     def process_receipt_upload(self, receipt_file):
-        """處理收據上傳"""
+        """處理收據上傳（直接由請求資料流分塊上傳，不寫入 UPLOAD_FOLDER）"""
         if not receipt_file or not receipt_file.filename:
             return None
         
         try:
             filename = secure_filename(receipt_file.filename)
-            upload_folder = current_app.config.get('UPLOAD_FOLDER', '/tmp')
+            mimetype = receipt_file.mimetype
+            if not mimetype or mimetype == 'application/octet-stream':
+                mimetype, _ = mimetypes.guess_type(filename)
             
-            # 確保上傳資料夾存在
-            if not os.path.exists(upload_folder):
-                os.makedirs(upload_folder)
-            
-            file_path = os.path.join(upload_folder, filename)
-            receipt_file.save(file_path)
-            
-            # 上傳到 Google Drive
-            receipt_url = self.upload_to_drive(file_path, filename)
-            
-            # 清理臨時檔案
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            
-            return receipt_url
+            # Werkzeug 的上傳資料流超過 500KB 時會溢寫到匿名暫存檔，記憶體用量有上限
+            receipt_file.stream.seek(0)
+            return self.upload_stream_to_drive(receipt_file.stream, filename, mimetype)
             
         except Exception as e:
             current_app.logger.error(f"Receipt upload error: {e}")
@@ -158,10 +287,19 @@ class GoogleService:
 
 # 全域 Google 服務實例
 google_service = None
+_google_service_lock = threading.Lock()
 
 def get_google_service():
     """獲取 Google 服務實例"""
     global google_service
     if google_service is None:
-        google_service = GoogleService()
-    return google_service
\ No newline at end of file
+        with _google_service_lock:
+            if google_service is None:
+                google_service = GoogleService()
+    return google_service
+
+def reset_google_service():
+    """丟棄服務實例（gunicorn fork 後呼叫，子行程於首次使用時重新建立）"""
+    global google_service, _google_service_lock
+    google_service = None
+    _google_service_lock = threading.Lock()
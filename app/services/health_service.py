@@ -0,0 +1,194 @@
+"""健康檢查服務：昂貴的檢查於背景定期執行並快取結果"""
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import text
+from ..models import db
+from .counter_service import CounterService
+
+# 行程啟動時間，用於計算 uptime
+_process_started_at = time.time()
+
+
+class HealthService:
+    """健康檢查項目"""
+    
+    @staticmethod
+    def check_database():
+        """資料庫連線檢查，回傳耗時（毫秒）"""
+        start = time.perf_counter()
+        db.session.execute(text('SELECT 1'))
+        return round((time.perf_counter() - start) * 1000, 2)
+    
+    @staticmethod
+    def check_google_credentials(credentials_file):
+        """檢查 Google 服務帳戶憑證是否可讀取"""
+        try:
+            if not os.path.exists(credentials_file):
+                return 'warning - credentials file missing'
+            from google.oauth2.service_account import Credentials
+            Credentials.from_service_account_file(credentials_file)
+            return 'ok'
+        except Exception:
+            return 'error'
+    
+    @staticmethod
+    def check_logs_writable():
+        """檢查日誌目錄是否可寫入"""
+        try:
+            if not os.path.exists('logs'):
+                os.makedirs('logs')
+            test_file = 'logs/health_check_test.tmp'
+            with open(test_file, 'w') as f:
+                f.write('test')
+            os.remove(test_file)
+            return 'ok'
+        except Exception:
+            return 'error'
+    
+    @staticmethod
+    def run_detailed_checks(config):
+        """執行所有詳細檢查並回傳快照內容"""
+        start_time = time.perf_counter()
+        try:
+            db_time_ms = HealthService.check_database()
+            user_count, count_source = CounterService.get_count('user')
+            
+            leave_records_status = 'ok'
+            try:
+                leave_count, _ = CounterService.get_count('leave_record')
+            except Exception:
+                leave_records_status = 'error'
+                leave_count = 0
+            
+            return {
+                'status': 'healthy',
+                'timestamp': datetime.now().isoformat(),
+                'response_time_ms': round((time.perf_counter() - start_time) * 1000, 2),
+                'checks': {
+                    'database': {
+                        'status': 'ok',
+                        'response_time_ms': db_time_ms,
+                        'user_count': user_count,
+                        'count_source': count_source
+                    },
+                    'application': {
+                        'status': 'ok',
+                        'uptime_seconds': round(time.time() - _process_started_at)
+                    },
+                    'google_api': {
+                        'status': HealthService.check_google_credentials(config['GOOGLE_CREDENTIALS_FILE'])
+                    },
+                    'file_system': {
+                        'logs_writable': HealthService.check_logs_writable()
+                    },
+                    'leave_records': {
+                        'status': leave_records_status,
+                        'total_count': leave_count
+                    }
+                }
+            }
+        except Exception as e:
+            db.session.rollback()
+            return {
+                'status': 'unhealthy',
+                'timestamp': datetime.now().isoformat(),
+                'error': str(e),
+                'checks': {
+                    'database': 'error',
+                    'application': 'unknown'
+                }
+            }
+
+
+class HealthSnapshotCache:
+    """詳細健康檢查快照：背景執行緒定期刷新，過期時於請求中補刷新"""
+    
+    def __init__(self):
+        self.app = None
+        self._snapshot = None
+        self._checked_at = None
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stop_event = threading.Event()
+    
+    def init_app(self, app):
+        """綁定應用程式；背景執行緒於首次請求時才啟動（避免 fork 前建立執行緒）"""
+        self.app = app
+        self._snapshot = None
+        self._checked_at = None
+        if not app.config['HEALTH_CHECK_BACKGROUND_ENABLED']:
+            return
+        
+        @app.before_request
+        def _ensure_health_check_thread():
+            self.start()
+    
+    def age(self):
+        """快照距今秒數（尚無快照時為 None）"""
+        if self._checked_at is None:
+            return None
+        return time.monotonic() - self._checked_at
+    
+    def get(self):
+        """
+        取得快照與其秒數
+        
+        快照過期時由一個請求負責刷新；其他同時到達的請求直接使用舊快照，
+        只有完全沒有快照時才等待第一次檢查完成。
+        """
+        age = self.age()
+        if age is None or age > self.app.config['HEALTH_CHECK_TTL']:
+            if self._refresh_lock.acquire(blocking=self._snapshot is None):
+                try:
+                    # 等待鎖期間可能已由其他執行緒刷新
+                    age = self.age()
+                    if age is None or age > self.app.config['HEALTH_CHECK_TTL']:
+                        self._refresh()
+                finally:
+                    self._refresh_lock.release()
+        return self._snapshot, self.age()
+    
+    def refresh(self):
+        """立即重新執行檢查"""
+        with self._refresh_lock:
+            self._refresh()
+    
+    def _refresh(self):
+        with self.app.app_context():
+            snapshot = HealthService.run_detailed_checks(self.app.config)
+        self._snapshot = snapshot
+        self._checked_at = time.monotonic()
+        if snapshot['status'] != 'healthy':
+            self.app.logger.error(f"詳細健康檢查失敗: {snapshot.get('error')}")
+    
+    def start(self):
+        """啟動背景刷新執行緒（已啟動則略過）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='health-check', daemon=True)
+            self._thread.start()
+    
+    def stop(self, timeout=None):
+        """停止背景執行緒"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                self.app.logger.error(f"Health check thread error: {e}")
+            self._stop_event.wait(self.app.config['HEALTH_CHECK_INTERVAL'])
+
+
+# 全域健康檢查快照實例
+health_snapshot_cache = HealthSnapshotCache()
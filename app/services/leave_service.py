@@ -1,34 +1,60 @@
 """請假管理服務"""
 from datetime import datetime, timedelta
 from flask import current_app
-from ..models import LeaveRecord, User, db
+from ..models import LeaveOccupancy, LeaveRecord, LeaveUsageSummary, User, db
 from ..exceptions import ValidationError, BusinessLogicError, DatabaseError
+from ..utils.database import retry_on_disconnect
+from ..utils.occupancy import HALF_DAY_AM, HALF_DAY_PERIODS, HALF_DAY_PM
+from ..utils.business_days import get_business_calendar
+from .calendar_sync_service import CalendarSyncService
+from .counter_service import CounterService
+from .user_cache import invalidate_user
+from .availability_index import (
+    AvailabilityIndex, bump_leave_version, get_availability_index, leave_created, leave_deleted
+)
+
+
+# 請假類型對應的年度統計欄位
+LEAVE_STATS_KEYS = {
+    '特休': 'annual_leave_days',
+    '病假': 'sick_leave_days',
+    '事假': 'personal_leave_days',
+    '生理假': 'menstrual_leave_days',
+    '家庭照顧假': 'family_care_leave_days',
+    '同情假': 'compassionate_leave_days',
+}
 
 
 class LeaveService:
     """請假管理服務類"""
     
     @staticmethod
-    def calculate_leave_days(start_date, end_date, is_half_day=False):
-        """計算請假天數"""
+    def calculate_leave_days(start_date, end_date, is_half_day=False, half_day_period=None):
+        """
+        計算請假天數（工作日，排除週末與國定假日）
+        
+        半天假扣 0.5 天：選下午時為第一天下午，否則為最後一天上午，該日須為工作日。
+        """
         if end_date < start_date:
             raise ValidationError("結束日期必須大於或等於開始日期")
         
-        total_days = (end_date - start_date).days + 1
+        calendar = get_business_calendar()
+        leave_days = float(calendar.count(start_date, end_date))
         
-        # 單日範圍且勾選半天
-        if total_days == 1:
-            return 0.5 if is_half_day else 1.0
-        
-        # 多日範圍，若勾選半天，就扣 0.5
-        leave_days = total_days
         if is_half_day:
+            half_day_date = start_date if half_day_period == HALF_DAY_PM else end_date
+            if not calendar.is_workday(half_day_date):
+                raise ValidationError("半天假的日期必須為工作日")
             leave_days -= 0.5
         return leave_days
     
     @staticmethod
     def validate_leave_request(start_date, end_date, days, leave_type, user):
-        """驗證請假申請"""
+        """
+        驗證請假申請
+        
+        與既有請假的重疊由 LeaveOccupancy.reserve 在鎖定佔用列後檢查，不在此重複讀取。
+        """
         config = current_app.config
         
         # 檢查開始日期不能比結束日期晚
@@ -40,7 +66,11 @@ class LeaveService:
         if start_date > max_allowed_date or end_date > max_allowed_date:
             raise ValidationError(f'請假日期不可超過 {config["MAX_FUTURE_DAYS"]} 天')
         
-        # 檢查單次請假天數限制
+        # 檢查期間內是否有工作日（天數已排除週末與國定假日）
+        if days <= 0:
+            raise ValidationError('請假期間皆為非工作日')
+        
+        # 檢查單次請假天數限制（以工作日計）
         if days > config['MAX_LEAVE_DAYS']:
             raise ValidationError(f'單次請假天數不可超過 {config["MAX_LEAVE_DAYS"]} 天')
         
@@ -61,9 +91,13 @@ class LeaveService:
         end_date = datetime.strptime(leave_data['end_date'], '%Y-%m-%d').date()
         leave_type = leave_data['leave_type']
         half_day = leave_data.get('half_day', False)
+        half_day_period = (leave_data.get('half_day_period') or HALF_DAY_AM) if half_day else None
         reason = leave_data.get('reason', '').strip()
         receipt_url = leave_data.get('receipt_url')
         
+        if half_day_period is not None and half_day_period not in HALF_DAY_PERIODS:
+            raise ValidationError('半天假時段無效')
+        
         # 處理半天假備註
         if half_day:
             if not reason:
@@ -72,35 +106,62 @@ class LeaveService:
                 reason = f"半天 - {reason}"
         
         # 計算請假天數
-        days = LeaveService.calculate_leave_days(start_date, end_date, half_day)
+        days = LeaveService.calculate_leave_days(start_date, end_date, half_day, half_day_period)
         
         # 驗證請假申請
         LeaveService.validate_leave_request(start_date, end_date, days, leave_type, user)
+        # 提交後 user 會過期，先取出後續需要的欄位，避免再次查詢用戶
+        user_id, username = user.id, user.username
         
         try:
-            # 扣除用戶請假天數
+            # 以條件式 UPDATE 扣除請假天數，並行申請時由資料庫判斷餘額
             leave_type_mapping = current_app.config['LEAVE_TYPE_MAPPING']
             field_name = leave_type_mapping[leave_type]
-            user.deduct_leave_days(field_name, days)
+            version = User.try_deduct_leave_days(user_id, field_name, days)
+            if version is None:
+                raise ValidationError(f'{leave_type} 剩餘天數不足')
+            
+            # 扣除天數的 UPDATE 已鎖定用戶列，同一用戶的申請在此依序檢查重疊並標記佔用
+            # （以佔用位元圖比對，半天假只佔用該時段）
+            if not LeaveOccupancy.reserve(user_id, start_date, end_date, half_day, half_day_period):
+                raise ValidationError('請假期間與既有請假重疊')
             
             # 創建請假記錄
             leave_record = LeaveRecord(
-                user_id=user.id,
+                user_id=user_id,
                 leave_type=leave_type,
                 start_date=start_date,
                 end_date=end_date,
                 half_day=half_day,
+                half_day_period=half_day_period,
                 reason=reason,
                 receipt_url=receipt_url,
                 days=days
             )
             
             db.session.add(leave_record)
+            LeaveUsageSummary.apply_usage(user_id, start_date.year, leave_type, days)
+            CounterService.increment('leave_record')
+            index_version = bump_leave_version()
+            
+            # 日曆同步寫入 outbox，由背景 worker 處理
+            CalendarSyncService.enqueue(
+                leave_record,
+                f"{username} - {leave_type}",
+                current_app.config['GOOGLE_CALENDAR_ID']
+            )
+            db.session.flush()
+            index_entry = AvailabilityIndex.entry(leave_record, username)
             db.session.commit()
+            invalidate_user(user_id, version)
+            leave_created(index_entry, index_version)
             
-            current_app.logger.info(f"Leave request created for user {user.username}: {leave_type} {days} days")
+            current_app.logger.info(f"Leave request created for user {username}: {leave_type} {days} days")
             return leave_record
             
+        except ValidationError:
+            db.session.rollback()
+            raise
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Error creating leave request: {e}")
@@ -114,16 +175,27 @@ class LeaveService:
             raise BusinessLogicError("找不到該請假記錄")
         
         try:
-            # 如果需要恢復天數
+            user_id = leave_record.user_id
+            
+            # 如果需要恢復天數（以單一 UPDATE 加回，避免覆蓋並行的扣除）
             if restore_days:
-                user = leave_record.user
                 leave_type_mapping = current_app.config['LEAVE_TYPE_MAPPING']
                 field_name = leave_type_mapping[leave_record.leave_type]
-                user.restore_leave_days(field_name, leave_record.days)
+                version = User.add_leave_days(user_id, field_name, leave_record.days)
+            else:
+                version = User.bump_version(user_id)
             
-            user_id = leave_record.user_id
+            LeaveUsageSummary.apply_usage(
+                user_id, leave_record.start_date.year, leave_record.leave_type, -leave_record.days
+            )
+            CounterService.increment('leave_record', -1)
+            index_version = bump_leave_version()
             db.session.delete(leave_record)
+            db.session.flush()
+            LeaveOccupancy.rebuild(user_id, range(leave_record.start_date.year, leave_record.end_date.year + 1))
             db.session.commit()
+            invalidate_user(user_id, version)
+            leave_deleted(leave_id, index_version)
             
             current_app.logger.info(f"Leave record {leave_id} deleted")
             return user_id
@@ -136,41 +208,138 @@ class LeaveService:
     @staticmethod
     def calculate_annual_leave_stats(leave_records, current_year):
         """計算年度請假統計"""
-        stats = {
-            'annual_leave_days': 0,
-            'sick_leave_days': 0,
-            'personal_leave_days': 0,
-            'menstrual_leave_days': 0,
-            'family_care_leave_days': 0,
-            'compassionate_leave_days': 0
-        }
+        stats = {key: 0 for key in LEAVE_STATS_KEYS.values()}
         
         for record in leave_records:
             if record.start_date.year == current_year:
-                if record.leave_type == '特休':
-                    stats['annual_leave_days'] += record.days
-                elif record.leave_type == '病假':
-                    stats['sick_leave_days'] += record.days
-                elif record.leave_type == '事假':
-                    stats['personal_leave_days'] += record.days
-                elif record.leave_type == '生理假':
-                    stats['menstrual_leave_days'] += record.days
-                elif record.leave_type == '家庭照顧假':
-                    stats['family_care_leave_days'] += record.days
-                elif record.leave_type == '同情假':
-                    stats['compassionate_leave_days'] += record.days
+                key = LEAVE_STATS_KEYS.get(record.leave_type)
+                if key:
+                    stats[key] += record.days
         
         return stats
     
     @staticmethod
+    def aggregate_annual_leave_stats(user_id, year):
+        """在資料庫端以 GROUP BY 計算年度請假統計，格式同 calculate_annual_leave_stats"""
+        return LeaveService.aggregate_annual_leave_stats_by_users([user_id], year)[user_id]
+    
+    @staticmethod
+    @retry_on_disconnect()
+    def aggregate_annual_leave_stats_by_users(user_ids, year):
+        """以單一 GROUP BY 查詢計算多位用戶的年度請假統計，回傳 {user_id: stats}"""
+        results = {user_id: {key: 0 for key in LEAVE_STATS_KEYS.values()} for user_id in user_ids}
+        for user_id, leave_type, total_days in LeaveRecord.sum_days_by_type(user_ids, year):
+            key = LEAVE_STATS_KEYS.get(leave_type)
+            if key:
+                results[user_id][key] += total_days
+        return results
+    
+    @staticmethod
+    @retry_on_disconnect()
+    def get_annual_leave_stats(user_id, year):
+        """從彙總表讀取年度請假統計，格式同 calculate_annual_leave_stats"""
+        stats = {key: 0 for key in LEAVE_STATS_KEYS.values()}
+        for summary in LeaveUsageSummary.get_by_user_and_year(user_id, year):
+            key = LEAVE_STATS_KEYS.get(summary.leave_type)
+            if key:
+                stats[key] += summary.days
+        return stats
+    
+    @staticmethod
+    def rebuild_usage_summary(user_id=None):
+        """由請假記錄重建使用量彙總表"""
+        try:
+            rows = LeaveUsageSummary.rebuild(user_id)
+            db.session.commit()
+            current_app.logger.info(f"Leave usage summary rebuilt: {rows} rows")
+            return rows
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error rebuilding leave usage summary: {e}")
+            raise DatabaseError("重建請假彙總資料時發生錯誤")
+    
+    @staticmethod
+    def get_team_availability(start_date, end_date):
+        """
+        查詢期間內請假的用戶（由記憶體中的區間索引回答，不逐一查詢用戶）
+        
+        回傳 {'start_date', 'end_date', 'users': [{'user_id', 'username', 'leaves': [...]}]}，
+        用戶依名稱排序，各自的請假依開始日排序。
+        """
+        if end_date < start_date:
+            raise ValidationError('結束日期必須大於或等於開始日期')
+        max_range = current_app.config['AVAILABILITY_MAX_RANGE_DAYS']
+        if (end_date - start_date).days + 1 > max_range:
+            raise ValidationError(f'查詢期間不可超過 {max_range} 天')
+        
+        users = {}
+        for entry in get_availability_index().query(start_date, end_date):
+            user = users.setdefault(entry['user_id'], {
+                'user_id': entry['user_id'], 'username': entry['username'], 'leaves': []
+            })
+            user['leaves'].append({
+                'id': entry['id'],
+                'leave_type': entry['leave_type'],
+                'start_date': entry['start_date'].isoformat(),
+                'end_date': entry['end_date'].isoformat(),
+                'half_day': entry['half_day'],
+                'half_day_period': entry['half_day_period'],
+                'days': entry['days']
+            })
+        
+        return {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'users': sorted(users.values(), key=lambda user: user['username'])
+        }
+    
+    @staticmethod
+    @retry_on_disconnect()
     def get_user_leave_records(user_id):
         """獲取用戶所有請假記錄"""
         return LeaveRecord.query.filter_by(user_id=user_id).order_by(LeaveRecord.start_date.desc()).all()
     
     @staticmethod
+    def encode_records_cursor(record):
+        """將請假記錄編碼為分頁游標"""
+        return f"{record.start_date.isoformat()}_{record.id}"
+    
+    @staticmethod
+    def decode_records_cursor(cursor):
+        """解析分頁游標，格式錯誤時回傳 None（視為第一頁）"""
+        if not cursor:
+            return None
+        try:
+            start_date, record_id = cursor.split('_', 1)
+            return datetime.strptime(start_date, '%Y-%m-%d').date(), int(record_id)
+        except ValueError:
+            return None
+    
+    @staticmethod
+    @retry_on_disconnect()
+    def get_user_leave_records_page(user_id, per_page=None, cursor=None):
+        """
+        分頁獲取用戶請假記錄
+        
+        回傳 (records, next_cursor)；next_cursor 為 None 表示已無下一頁。
+        """
+        config = current_app.config
+        if not per_page or per_page < 1:
+            per_page = config['LEAVE_RECORDS_PER_PAGE']
+        per_page = min(per_page, config['LEAVE_RECORDS_MAX_PER_PAGE'])
+        
+        # 多取一筆用來判斷是否還有下一頁
+        records = LeaveRecord.get_page_by_user(
+            user_id, per_page + 1, LeaveService.decode_records_cursor(cursor)
+        )
+        next_cursor = None
+        if len(records) > per_page:
+            records = records[:per_page]
+            next_cursor = LeaveService.encode_records_cursor(records[-1])
+        return records, next_cursor
+    
+    @staticmethod
+    @retry_on_disconnect()
     def get_recent_leave_records_by_users(user_ids, limit=5):
         """獲取多個用戶的最近請假記錄"""
-        records = {}
-        for user_id in user_ids:
-            records[user_id] = LeaveRecord.get_recent_by_user(user_id, limit)
-        return records
\ No newline at end of file
+        return LeaveRecord.get_recent_by_users(user_ids, limit)
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""年度請假天數結轉服務"""
+from datetime import date
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from ..models import LeaveRollover, User, db
+from ..exceptions import BusinessLogicError, DatabaseError
+from .user_service import LEAVE_DAYS_FIELDS
+from .user_cache import clear_user_cache
+
+# 試算時列出的用戶範例數
+PREVIEW_SAMPLE_SIZE = 20
+
+
+class RolloverService:
+    """以集合式 UPDATE 一次結轉所有非管理員的請假餘額"""
+    
+    @staticmethod
+    def settings(defaults=None, caps=None):
+        """合併設定檔與呼叫端指定的預設天數及結轉上限"""
+        config = current_app.config
+        return {
+            'defaults': {**config['DEFAULT_LEAVE_DAYS'], **(defaults or {})},
+            'caps': {**config['LEAVE_CARRY_OVER_CAPS'], **(caps or {})}
+        }
+    
+    @staticmethod
+    def balance_expressions(settings):
+        """
+        各餘額欄位結轉後的 SQL 運算式
+        
+        新餘額 = 預設天數 + 剩餘天數（小於 0 以 0 計，超過上限以上限計）。
+        """
+        expressions = {}
+        for key, field in LEAVE_DAYS_FIELDS.items():
+            column = getattr(User, field)
+            cap = float(settings['caps'].get(key) or 0)
+            default_days = float(settings['defaults'][key])
+            if cap > 0:
+                carried = db.case((column <= 0, 0.0), (column >= cap, cap), else_=column)
+                expressions[field] = default_days + carried
+            else:
+                expressions[field] = db.literal(default_days, db.Float)
+        return expressions
+    
+    @staticmethod
+    def preview(settings):
+        """試算結轉結果：各欄位受影響人數、總天數變化與少量用戶範例"""
+        expressions = RolloverService.balance_expressions(settings)
+        non_admin = User.is_admin.is_(False)
+        
+        aggregates = [db.func.count()]
+        for field, expression in expressions.items():
+            column = getattr(User, field)
+            aggregates += [
+                db.func.count(db.case((column != expression, 1))),
+                db.func.coalesce(db.func.sum(column), 0),
+                db.func.coalesce(db.func.sum(expression), 0)
+            ]
+        row = db.session.execute(db.select(*aggregates).where(non_admin)).one()
+        
+        fields = {}
+        for index, field in enumerate(expressions):
+            changed, before, after = row[1 + index * 3:4 + index * 3]
+            fields[field] = {'users_changed': changed, 'total_before': before, 'total_after': after}
+        
+        sample_columns = [User.id, User.username]
+        for field, expression in expressions.items():
+            sample_columns += [getattr(User, field), expression]
+        samples = []
+        for sample in db.session.execute(
+            db.select(*sample_columns).where(non_admin).order_by(User.id).limit(PREVIEW_SAMPLE_SIZE)
+        ):
+            changes = {}
+            for index, field in enumerate(expressions):
+                before, after = sample[2 + index * 2], sample[3 + index * 2]
+                if before != after:
+                    changes[field] = {'before': before, 'after': after}
+            samples.append({'user_id': sample[0], 'username': sample[1], 'changes': changes})
+        
+        return {'users': row[0], 'fields': fields, 'samples': samples}
+    
+    @staticmethod
+    def rollover(year=None, defaults=None, caps=None, dry_run=False):
+        """
+        執行年度結轉
+        
+        每個年度只能執行一次：結轉標記與餘額 UPDATE 在同一交易中寫入，
+        同時執行時主鍵衝突的一方會回滾。dry_run 只回傳試算差異。
+        """
+        year = year or date.today().year
+        settings = RolloverService.settings(defaults, caps)
+        
+        if db.session.get(LeaveRollover, year):
+            raise BusinessLogicError(f"{year} 年度已完成結轉")
+        
+        if dry_run:
+            return {'year': year, 'dry_run': True, 'settings': settings, 'diff': RolloverService.preview(settings)}
+        
+        try:
+            marker = LeaveRollover(year=year, settings=settings, users_updated=0)
+            db.session.add(marker)
+            db.session.flush()
+            
+            result = db.session.execute(
+                db.update(User)
+                  .where(User.is_admin.is_(False))
+                  .values(version=User.version + 1, **RolloverService.balance_expressions(settings))
+                  .execution_options(synchronize_session=False)
+            )
+            users_updated = marker.users_updated = result.rowcount
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            raise BusinessLogicError(f"{year} 年度已完成結轉")
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error rolling over leave balances for {year}: {e}")
+            raise DatabaseError("年度結轉時發生錯誤")
+        
+        clear_user_cache()
+        current_app.logger.info(f"Leave balances rolled over for {year}: {users_updated} users")
+        return {'year': year, 'dry_run': False, 'settings': settings, 'users_updated': users_updated}
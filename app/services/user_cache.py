@@ -0,0 +1,116 @@
+"""登入用戶身分快取"""
+import threading
+from cachetools import TTLCache
+from flask import current_app
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import make_transient_to_detached
+from ..models import User, db
+
+
+class UserIdentityCache:
+    """
+    user_loader 前的短期快取
+    
+    每個 worker 各自快取用戶欄位值，TTL 到期後重新查詢，因此其他 worker 的變更
+    （例如撤銷管理員權限）最晚在 TTL 後生效。失效時記錄寫入後的版本戳記，
+    失效前讀到的舊版本不會再被寫回快取；整份清除時遞增世代，清除前開始的
+    載入也不會寫回。
+    """
+    
+    def __init__(self, ttl=5, maxsize=10000):
+        self._entries = TTLCache(maxsize, ttl)
+        self._min_versions = TTLCache(maxsize, ttl)
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, user_id):
+        """取得快取的欄位值（未命中為 None）"""
+        with self._lock:
+            values = self._entries.get(user_id)
+            if values is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return values
+    
+    def put(self, user_id, values, generation=None):
+        """
+        寫入欄位值；版本早於最近一次失效時忽略
+        
+        generation 為開始讀取資料庫前的世代，讀取期間曾整份清除時忽略。
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            min_version = self._min_versions.get(user_id)
+            if min_version is not None and values['version'] < min_version:
+                return
+            self._entries[user_id] = values
+    
+    def invalidate(self, user_id, version=None):
+        """移除快取；version 為寫入後的新版本，None 表示用戶已刪除"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._min_versions[user_id] = float('inf') if version is None else version
+    
+    def clear(self):
+        """清除所有快取並遞增世代（批次更新多位用戶後使用）"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+    
+    def load(self, user_id):
+        """載入用戶；命中時直接建立附加於 session 的實例，不查詢資料庫"""
+        values = self.get(user_id)
+        if values is not None:
+            user = User(**values)
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+        
+        generation = self.generation
+        user = db.session.get(User, user_id)
+        if user is not None:
+            self.put(
+                user_id,
+                {attr.key: getattr(user, attr.key) for attr in sa_inspect(User).column_attrs},
+                generation
+            )
+        return user
+    
+    def stats(self):
+        """快取命中統計"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+def init_user_cache(app):
+    """建立此應用程式的用戶身分快取"""
+    app.extensions['user_identity_cache'] = UserIdentityCache(
+        ttl=app.config['USER_CACHE_TTL'],
+        maxsize=app.config['USER_CACHE_MAXSIZE']
+    )
+
+
+def get_user_cache():
+    """目前應用程式的用戶身分快取"""
+    return current_app.extensions['user_identity_cache']
+
+
+def invalidate_user(user_id, version=None):
+    """寫入提交後讓用戶快取失效"""
+    cache = current_app.extensions.get('user_identity_cache')
+    if cache is not None:
+        cache.invalidate(user_id, version)
+
+
+def clear_user_cache():
+    """批次寫入提交後清除此 worker 的用戶快取"""
+    cache = current_app.extensions.get('user_identity_cache')
+    if cache is not None:
+        cache.clear()
@@ -1,20 +1,49 @@
 """用戶管理服務"""
+import csv
+import io
 from flask import current_app
 from sqlalchemy.exc import IntegrityError
 from ..models import User, LeaveRecord, db
 from ..exceptions import ValidationError, DatabaseError, BusinessLogicError
+from ..utils.database import retry_on_disconnect
+from .counter_service import CounterService
+from .user_cache import invalidate_user
+from .availability_index import bump_leave_version, invalidate_availability
+
+
+# 預設請假天數設定鍵與用戶欄位的對應
+LEAVE_DAYS_FIELDS = {
+    'annual_leave': 'vacation_days',
+    'sick_leave': 'sick_days',
+    'personal_leave': 'personal_days',
+    'menstrual_leave': 'menstrual_days',
+    'family_care_leave': 'family_care_days',
+    'compassionate_leave': 'compassionate_days',
+}
+
+# 批次匯入每次 INSERT 的列數
+IMPORT_CHUNK_SIZE = 1000
+
+# 用戶名與密碼欄位長度上限（超過時逐列回報，而非讓整批 INSERT 失敗）
+USERNAME_MAX_LENGTH = User.username.type.length
+PASSWORD_MAX_LENGTH = User.password.type.length
 
 
 class UserService:
     """用戶管理服務類"""
     
+    @staticmethod
+    def normalize_username(username):
+        """統一用戶名格式（首字母大寫）"""
+        return username.lower().strip().capitalize()
+    
     @staticmethod
     def create_user(username, password, leave_days_config=None):
         """創建新用戶"""
         if not username or not password:
             raise ValidationError("用戶名和密碼不能為空")
         
-        username = username.lower().strip().capitalize()
+        username = UserService.normalize_username(username)
         
         # 檢查用戶是否已存在
         existing_user = User.query.filter_by(username=username).first()
@@ -38,6 +67,7 @@ class UserService:
         
         try:
             db.session.add(new_user)
+            CounterService.increment('user')
             db.session.commit()
             current_app.logger.info(f"User {username} created successfully")
             return new_user
@@ -49,6 +79,99 @@ class UserService:
             current_app.logger.error(f"Error creating user {username}: {e}")
             raise DatabaseError("創建用戶時發生未知錯誤")
     
+    @staticmethod
+    def import_users(rows, start_row=1, dry_run=False):
+        """
+        批次匯入用戶
+        
+        rows 為 dict 序列，含 username、password 及選填的各假別天數（鍵名同
+        DEFAULT_LEAVE_DAYS）。所有用戶名以一次 IN 查詢檢查重複，通過驗證的列
+        在同一交易中分批寫入；任一批失敗則整批回滾。
+        回傳 {'total': n, 'created': n, 'errors': [{'row', 'username', 'error'}], 'dry_run': bool}。
+        """
+        defaults = current_app.config['DEFAULT_LEAVE_DAYS']
+        errors = []
+        candidates = {}  # 用戶名 -> (列號, 欄位值)
+        total = 0
+        
+        for row_no, row in enumerate(rows, start=start_row):
+            total += 1
+            username = UserService.normalize_username(row.get('username') or '')
+            password = (row.get('password') or '').strip()
+            if not username or not password:
+                errors.append({'row': row_no, 'username': username, 'error': '用戶名和密碼不能為空'})
+                continue
+            
+            if len(username) > USERNAME_MAX_LENGTH:
+                errors.append({'row': row_no, 'username': username[:USERNAME_MAX_LENGTH],
+                               'error': f'用戶名不能超過 {USERNAME_MAX_LENGTH} 個字元'})
+                continue
+            if len(password) > PASSWORD_MAX_LENGTH:
+                errors.append({'row': row_no, 'username': username,
+                               'error': f'密碼不能超過 {PASSWORD_MAX_LENGTH} 個字元'})
+                continue
+            
+            if username in candidates:
+                errors.append({'row': row_no, 'username': username,
+                               'error': f'與第 {candidates[username][0]} 列重複'})
+                continue
+            
+            try:
+                values = {
+                    field: float(row[key]) if (row.get(key) or '').strip() else defaults[key]
+                    for key, field in LEAVE_DAYS_FIELDS.items()
+                }
+            except ValueError:
+                errors.append({'row': row_no, 'username': username, 'error': '請假天數必須為有效數字'})
+                continue
+            
+            values.update(username=username, password=password)
+            candidates[username] = (row_no, values)
+        
+        if candidates:
+            existing = set(db.session.execute(
+                db.select(User.username).where(User.username.in_(list(candidates)))
+            ).scalars())
+            # MySQL 不分大小寫的定序會回傳資料庫中的原始拼寫，需先統一格式再比對
+            for username in {UserService.normalize_username(name) for name in existing}:
+                if username not in candidates:
+                    continue
+                row_no, _ = candidates.pop(username)
+                errors.append({'row': row_no, 'username': username, 'error': f'帳號 {username} 已存在'})
+        
+        errors.sort(key=lambda error: error['row'])
+        report = {'total': total, 'created': len(candidates), 'errors': errors, 'dry_run': dry_run}
+        if dry_run or not candidates:
+            return report
+        
+        values = [row_values for _, row_values in candidates.values()]
+        try:
+            for start in range(0, len(values), IMPORT_CHUNK_SIZE):
+                db.session.execute(db.insert(User), values[start:start + IMPORT_CHUNK_SIZE])
+            CounterService.increment('user', len(values))
+            db.session.commit()
+            current_app.logger.info(f"Imported {len(values)} users ({len(errors)} rows rejected)")
+            return report
+        except IntegrityError:
+            db.session.rollback()
+            raise DatabaseError("匯入期間有重複的用戶名被建立，請重新匯入")
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error importing users: {e}")
+            raise DatabaseError("匯入用戶時發生錯誤")
+    
+    @staticmethod
+    def import_users_csv(stream, dry_run=False):
+        """
+        由 CSV 匯入用戶（第一列為標題，至少包含 username 與 password）
+        
+        stream 為二進位檔案物件；錯誤報告中的列號對應 CSV 檔案行號。
+        """
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        if not reader.fieldnames or not {'username', 'password'} <= set(reader.fieldnames):
+            raise ValidationError("CSV 標題需包含 username 與 password 欄位")
+        return UserService.import_users(reader, start_row=2, dry_run=dry_run)
+    
     @staticmethod
     def update_user_leave_days(user_id, leave_days_data):
         """更新用戶請假天數"""
@@ -64,7 +187,9 @@ class UserService:
             user.family_care_days = float(leave_days_data.get('family_care_leave', 0))
             user.compassionate_days = float(leave_days_data.get('compassionate_leave', 0))
             
+            version = User.bump_version(user.id)
             db.session.commit()
+            invalidate_user(user_id, version)
             current_app.logger.info(f"Updated leave days for user {user.username}")
             return user
         except ValueError:
@@ -86,7 +211,9 @@ class UserService:
         
         try:
             user.password = new_password
+            version = User.bump_version(user.id)
             db.session.commit()
+            invalidate_user(user_id, version)
             current_app.logger.info(f"Password updated for user {user.username}")
             return user
         except Exception as e:
@@ -106,8 +233,13 @@ class UserService:
         
         try:
             username = user.username
+            CounterService.increment('leave_record', -user.leave_records.count())
+            CounterService.increment('user', -1)
+            bump_leave_version()
             db.session.delete(user)
             db.session.commit()
+            invalidate_user(user_id)
+            invalidate_availability()
             current_app.logger.info(f"User {username} deleted successfully")
             return True
         except Exception as e:
@@ -116,11 +248,13 @@ class UserService:
             raise DatabaseError("刪除用戶時發生錯誤")
     
     @staticmethod
+    @retry_on_disconnect()
     def get_all_non_admin_users():
         """獲取所有非管理員用戶"""
         return User.query.filter_by(is_admin=False).all()
     
     @staticmethod
+    @retry_on_disconnect()
     def get_user_by_id(user_id):
         """根據ID獲取用戶"""
         return User.query.get(user_id)
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""工作日計算
+
+工作日 = 週一至週五，扣除國定假日，加上補行上班日。假日資料來自 JSON 檔：
+
+    {
+        "holidays": {"2026-01-01": "開國紀念日", ...},
+        "workdays": {"2025-02-08": "補行上班", ...}
+    }
+
+每個年度首次使用時預先計算工作日前綴和，任意期間的工作日數只需查表相減。
+已載入假日資料但某年度不在其中時，該年度只排除週末並記錄警告。
+"""
+import json
+import threading
+from array import array
+from datetime import date, datetime
+from flask import current_app, has_app_context
+
+
+class BusinessCalendar:
+    """以年度前綴和計算期間內工作日數"""
+    
+    def __init__(self, holidays=None, workdays=None):
+        self.holidays = dict(holidays or {})
+        self.workdays = dict(workdays or {})
+        self.years = {day.year for day in self.holidays}
+        self.missing_years = set()  # 已計算但無假日資料的年度
+        self._prefix_sums = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_file(cls, path):
+        """由 JSON 假日檔建立"""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        
+        def parse(entries):
+            return {datetime.strptime(day, '%Y-%m-%d').date(): name for day, name in (entries or {}).items()}
+        
+        return cls(parse(data.get('holidays')), parse(data.get('workdays')))
+    
+    def is_workday(self, day):
+        """是否為工作日（補行上班日優先於週末與假日）"""
+        if day in self.workdays:
+            return True
+        if day in self.holidays:
+            return False
+        return day.weekday() < 5
+    
+    def _year_prefix(self, year):
+        """年度前綴和：prefix[n] 為該年前 n 天的工作日數"""
+        prefix = self._prefix_sums.get(year)
+        if prefix is None:
+            with self._lock:
+                prefix = self._prefix_sums.get(year)
+                if prefix is None:
+                    first_day = date(year, 1, 1).toordinal()
+                    length = date(year, 12, 31).toordinal() - first_day + 1
+                    prefix = array('H', [0]) * (length + 1)
+                    for n in range(length):
+                        prefix[n + 1] = prefix[n] + self.is_workday(date.fromordinal(first_day + n))
+                    self._prefix_sums[year] = prefix
+                    if self.years and year not in self.years:
+                        self.missing_years.add(year)
+                        if has_app_context():
+                            current_app.logger.warning(f"No holiday data for {year}; only weekends are excluded")
+        return prefix
+    
+    def count(self, start_date, end_date):
+        """[start_date, end_date]（含兩端）內的工作日數；每個涉及的年度各查表一次"""
+        if end_date < start_date:
+            return 0
+        total = 0
+        for year in range(start_date.year, end_date.year + 1):
+            segment_start = max(start_date, date(year, 1, 1))
+            segment_end = min(end_date, date(year, 12, 31))
+            prefix = self._year_prefix(year)
+            total += prefix[segment_end.timetuple().tm_yday] - prefix[segment_start.timetuple().tm_yday - 1]
+        return total
+
+
+def init_business_calendar(app):
+    """載入假日檔建立此應用程式的工作日曆；未設定檔案時僅排除週末"""
+    path = app.config.get('HOLIDAY_FILE')
+    if path:
+        calendar = BusinessCalendar.from_file(path)
+        app.logger.info(f"Loaded {len(calendar.holidays)} holidays and {len(calendar.workdays)} workdays from {path}")
+    else:
+        calendar = BusinessCalendar()
+    app.extensions['business_calendar'] = calendar
+
+
+def get_business_calendar():
+    """目前應用程式的工作日曆"""
+    return current_app.extensions['business_calendar']
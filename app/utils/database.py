@@ -0,0 +1,126 @@
+"""資料庫連線池與重試工具"""
+import os
+import threading
+import time
+from functools import wraps
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.pool import QueuePool
+from .metrics import (
+    DB_POOL_CHECKED_OUT, DB_POOL_CHECKOUT_WAIT, DB_POOL_CHECKOUTS, DB_POOL_DISCONNECTS,
+    DB_POOL_OVERFLOW, DB_POOL_TIMEOUTS
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """記錄取出連線次數、等待時間、逾時與斷線次數的 QueuePool，並同步到 Prometheus 指標"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkout_count = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.checkout_timeouts = 0
+        self.disconnects = 0
+    
+    def _update_gauges(self):
+        DB_POOL_CHECKED_OUT.set(self.checkedout())
+        DB_POOL_OVERFLOW.set(max(self.overflow(), 0))
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sa_exc.TimeoutError:
+            with self._stats_lock:
+                self.checkout_timeouts += 1
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.checkout_count += 1
+            self.checkout_wait_total += elapsed
+            self.checkout_wait_max = max(self.checkout_wait_max, elapsed)
+        DB_POOL_CHECKOUTS.inc()
+        DB_POOL_CHECKOUT_WAIT.inc(elapsed)
+        self._update_gauges()
+        return connection
+    
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._update_gauges()
+    
+    def _invalidate(self, connection, exception=None, _checkin=True):
+        """偵測到斷線時 SQLAlchemy 會讓整個連線池失效"""
+        with self._stats_lock:
+            self.disconnects += 1
+        DB_POOL_DISCONNECTS.inc()
+        super()._invalidate(connection, exception, _checkin)
+
+
+def engine_options(pool_size, max_overflow):
+    """
+    建立 SQLAlchemy 引擎連線池設定，可由環境變數覆寫
+    
+    pool_recycle 需小於 MySQL 的 wait_timeout，避免取到已被伺服器關閉的連線。
+    """
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', pool_size)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', max_overflow)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+    }
+
+
+def pool_stats(engine):
+    """連線池狀態統計"""
+    pool = engine.pool
+    stats = {'pool_class': type(pool).__name__}
+    
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._stats_lock:
+            stats.update({
+                'checkouts': pool.checkout_count,
+                'checkout_wait_total_ms': round(pool.checkout_wait_total * 1000, 2),
+                'checkout_wait_max_ms': round(pool.checkout_wait_max * 1000, 2),
+                'checkout_timeouts': pool.checkout_timeouts,
+                'disconnects': pool.disconnects,
+            })
+    return stats
+
+
+def is_disconnect_error(error):
+    """判斷是否為連線中斷（例如 RDS 故障轉移）造成的錯誤"""
+    return isinstance(error, sa_exc.DBAPIError) and error.connection_invalidated
+
+
+def retry_on_disconnect(retries=1):
+    """
+    只讀查詢在連線中斷時回滾並重試
+    
+    僅可用於冪等的讀取函數；含寫入的流程不可使用，以免重送未提交的變更。
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            from ..models import db
+            
+            for attempt in range(retries + 1):
+                try:
+                    return f(*args, **kwargs)
+                except sa_exc.DBAPIError as e:
+                    if attempt >= retries or not is_disconnect_error(e):
+                        raise
+                    db.session.rollback()
+        return wrapper
+    return decorator
@@ -0,0 +1,34 @@
+"""日期範圍工具
+
+年度、月份篩選一律轉換為半開區間 `column >= 起日 AND column < 迄日`，
+不在欄位外包函數（如 EXTRACT/YEAR），讓 MySQL 能以複合索引做範圍掃描。
+"""
+from datetime import date
+from sqlalchemy import and_
+
+
+def year_bounds(year):
+    """取得年度的半開區間 [當年 1/1, 隔年 1/1)"""
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def month_bounds(year, month):
+    """取得月份的半開區間 [當月 1 日, 下月 1 日)"""
+    if month == 12:
+        return date(year, 12, 1), date(year + 1, 1, 1)
+    return date(year, month, 1), date(year, month + 1, 1)
+
+
+def date_range_filter(column, start, end):
+    """建立半開區間篩選條件 start <= column < end"""
+    return and_(column >= start, column < end)
+
+
+def year_filter(column, year):
+    """建立年度篩選條件"""
+    return date_range_filter(column, *year_bounds(year))
+
+
+def month_filter(column, year, month):
+    """建立月份篩選條件"""
+    return date_range_filter(column, *month_bounds(year, month))
@@ -0,0 +1,82 @@
+"""Jinja 片段快取
+
+模板中以 {% cache 'name', key... %} ... {% endcache %} 包住的片段會依鍵值快取
+渲染結果。鍵值需包含會影響內容的版本戳記（例如 user.version），寫入時遞增版本
+即讓舊片段不再被命中，由 LRU 自然淘汰，不需要主動失效。
+"""
+import threading
+from cachetools import LRUCache
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class FragmentCache:
+    """每個 worker 一份的渲染結果 LRU 快取"""
+    
+    def __init__(self, maxsize=5000):
+        self._entries = LRUCache(maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_or_render(self, key, render):
+        """命中時回傳快取內容，否則渲染後寫入"""
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self.hits += 1
+                return content
+            self.misses += 1
+        
+        content = render()
+        with self._lock:
+            self._entries[key] = content
+        return content
+    
+    def clear(self):
+        """清除所有片段"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """快取命中統計"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache key, ... %} 標籤；environment.fragment_cache 為 None 時直接渲染"""
+    tags = {'cache'}
+    
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+    
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key_parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.List(key_parts)]), [], [], body
+        ).set_lineno(lineno)
+    
+    def _render(self, key_parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        return cache.get_or_render(tuple(key_parts), caller)
+
+
+def init_fragment_cache(app):
+    """註冊 {% cache %} 標籤；FRAGMENT_CACHE_MAXSIZE 為 0 時停用快取"""
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    maxsize = app.config['FRAGMENT_CACHE_MAXSIZE']
+    cache = FragmentCache(maxsize) if maxsize > 0 else None
+    app.jinja_env.fragment_cache = cache
+    app.extensions['fragment_cache'] = cache
@@ -0,0 +1,158 @@
+"""請求延遲、狀態碼與連線池的 Prometheus 指標
+
+多個 gunicorn worker 時需在啟動前設定環境變數 PROMETHEUS_MULTIPROC_DIR
+指向一個共用的空目錄：各 worker 將數值寫入該目錄下的 mmap 檔，抓取時由
+MultiProcessCollector 彙總；worker 結束時應呼叫 mark_process_dead()。
+"""
+import os
+import time
+from flask import g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess
+)
+
+# 延遲分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_COUNT = Counter(
+    'leave_http_requests_total',
+    '依端點、方法與狀態碼統計的請求數',
+    ['endpoint', 'method', 'status']
+)
+
+REQUEST_LATENCY = Histogram(
+    'leave_http_request_duration_seconds',
+    '依端點與方法統計的請求處理時間',
+    ['endpoint', 'method'],
+    buckets=LATENCY_BUCKETS
+)
+
+DB_QUERY_COUNT = Counter(
+    'leave_db_queries_total',
+    '依端點統計的 SQL 執行次數',
+    ['endpoint']
+)
+
+DB_QUERY_TIME = Counter(
+    'leave_db_query_seconds_total',
+    '依端點統計的 SQL 執行總時間',
+    ['endpoint']
+)
+
+DB_SLOW_QUERIES = Counter(
+    'leave_db_slow_queries_total',
+    '超過門檻的慢查詢次數',
+    ['endpoint']
+)
+
+DB_REPEATED_STATEMENTS = Counter(
+    'leave_db_repeated_statement_requests_total',
+    '同一語句重複執行超過門檻（疑似 N+1）的請求數',
+    ['endpoint']
+)
+
+# 資料庫連線池指標：每個 worker 只更新自己的值，多 worker 時 Gauge 以存活行程加總
+DB_POOL_CHECKED_OUT = Gauge(
+    'leave_db_pool_checked_out',
+    '資料庫連線池借出中的連線數',
+    multiprocess_mode='livesum'
+)
+
+DB_POOL_OVERFLOW = Gauge(
+    'leave_db_pool_overflow',
+    '資料庫連線池超出 pool_size 的連線數',
+    multiprocess_mode='livesum'
+)
+
+DB_POOL_CHECKOUTS = Counter(
+    'leave_db_pool_checkouts_total',
+    '資料庫連線池取出連線次數'
+)
+
+DB_POOL_CHECKOUT_WAIT = Counter(
+    'leave_db_pool_checkout_wait_seconds_total',
+    '資料庫連線池取出連線的總等待時間'
+)
+
+DB_POOL_TIMEOUTS = Counter(
+    'leave_db_pool_checkout_timeouts_total',
+    '資料庫連線池取出連線逾時次數'
+)
+
+DB_POOL_DISCONNECTS = Counter(
+    'leave_db_pool_disconnects_total',
+    '偵測到資料庫斷線而失效的連線次數'
+)
+
+# Google API 客戶端池指標
+GOOGLE_POOL_SIZE = Gauge(
+    'leave_google_client_pool_size',
+    'Google API 客戶端池已建立的客戶端組數',
+    multiprocess_mode='livesum'
+)
+
+GOOGLE_POOL_IN_USE = Gauge(
+    'leave_google_client_pool_in_use',
+    'Google API 客戶端池借出中的客戶端組數',
+    multiprocess_mode='livesum'
+)
+
+GOOGLE_POOL_ACQUIRED = Counter(
+    'leave_google_client_pool_acquired_total',
+    'Google API 客戶端池借出次數'
+)
+
+GOOGLE_POOL_WAITS = Counter(
+    'leave_google_client_pool_waits_total',
+    'Google API 客戶端池需等待才借到的次數'
+)
+
+GOOGLE_POOL_WAIT = Counter(
+    'leave_google_client_pool_wait_seconds_total',
+    'Google API 客戶端池借出的總等待時間'
+)
+
+GOOGLE_POOL_TIMEOUTS = Counter(
+    'leave_google_client_pool_timeouts_total',
+    'Google API 客戶端池已滿而逾時的次數'
+)
+
+
+def is_multiprocess():
+    """是否以共用目錄彙總多個 worker 的指標"""
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def init_metrics(app):
+    """註冊請求計時鉤子"""
+    
+    @app.before_request
+    def _start_request_timer():
+        g._metrics_start = time.perf_counter()
+    
+    @app.after_request
+    def _record_request_metrics(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            # 未匹配路由的請求統一歸類，避免任意路徑造成標籤爆量
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - start)
+            REQUEST_COUNT.labels(endpoint, request.method, str(response.status_code)).inc()
+        return response
+
+
+def render_latest():
+    """輸出 Prometheus 文字格式的指標，回傳 (內容, Content-Type)"""
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """worker 結束時清除其即時量測檔（供 gunicorn child_exit 使用）"""
+    if is_multiprocess():
+        multiprocess.mark_process_dead(pid)
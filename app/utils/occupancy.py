@@ -0,0 +1,54 @@
+"""請假佔用位元圖
+
+每天兩個位元（上午、下午），第 n 天（由 0 起算）的上午為第 2n 位、下午為
+第 2n+1 位，一年最多 366 天共 732 位元（92 bytes）。連續的請假期間在位元圖中
+是一段連續位元，因此重疊檢查只需一次遮罩運算。
+"""
+from datetime import date
+
+BITMAP_BYTES = 92
+
+HALF_DAY_AM = 'AM'
+HALF_DAY_PM = 'PM'
+HALF_DAY_PERIODS = (HALF_DAY_AM, HALF_DAY_PM)
+
+
+def leave_bit_ranges(start_date, end_date, half_day=False, half_day_period=None):
+    """
+    請假期間在各年度位元圖中的位元區間 {year: (first_bit, last_bit)}（含兩端）
+
+    半天假選下午時從第一天下午開始，選上午（或未指定）時到最後一天上午結束；
+    單日半天假即只佔用該半天。
+    """
+    starts_afternoon = half_day and half_day_period == HALF_DAY_PM
+    ends_morning = half_day and half_day_period != HALF_DAY_PM
+
+    ranges = {}
+    for year in range(start_date.year, end_date.year + 1):
+        first_day = date(year, 1, 1)
+        segment_start = max(start_date, first_day)
+        segment_end = min(end_date, date(year, 12, 31))
+
+        first_bit = (segment_start - first_day).days * 2
+        if segment_start == start_date and starts_afternoon:
+            first_bit += 1
+        last_bit = (segment_end - first_day).days * 2 + 1
+        if segment_end == end_date and ends_morning:
+            last_bit -= 1
+        ranges[year] = (first_bit, last_bit)
+    return ranges
+
+
+def range_mask(first_bit, last_bit):
+    """第 first_bit 到 last_bit 位（含）為 1 的遮罩"""
+    return ((1 << (last_bit - first_bit + 1)) - 1) << first_bit
+
+
+def bitmap_to_int(bitmap):
+    """位元圖 bytes 轉為整數"""
+    return int.from_bytes(bitmap, 'little') if bitmap else 0
+
+
+def int_to_bitmap(bits):
+    """整數轉為固定長度的位元圖 bytes"""
+    return bits.to_bytes(BITMAP_BYTES, 'little')
@@ -0,0 +1,94 @@
+"""每個請求的 SQL 查詢統計、慢查詢記錄與 N+1 偵測"""
+import re
+import time
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from .metrics import DB_QUERY_COUNT, DB_QUERY_TIME, DB_REPEATED_STATEMENTS, DB_SLOW_QUERIES
+
+# IN (...) 的參數個數會隨資料變動，歸併成同一語句形狀
+_IN_LIST_PATTERN = re.compile(r'\(\s*(?:\?|%s|:\w+)(?:\s*,\s*(?:\?|%s|:\w+))+\s*\)')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    """去除參數個數與空白差異後的語句形狀"""
+    return _WHITESPACE_PATTERN.sub(' ', _IN_LIST_PATTERN.sub('(?)', statement)).strip()
+
+
+class RequestQueryStats:
+    """單一請求的查詢統計"""
+    
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slow_count = 0
+        self.shapes = Counter()
+    
+    def repeated_statements(self, threshold):
+        """執行次數超過門檻的語句形狀與次數"""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > threshold]
+
+
+def current_query_stats():
+    """目前請求的查詢統計（不在請求中則為 None）"""
+    if not has_request_context():
+        return None
+    return g.get('_query_stats')
+
+
+def init_query_monitor(app, engine):
+    """在引擎上掛載計時事件並註冊請求鉤子"""
+    
+    # 開始時間存在每次執行專屬的 context 上，語句失敗時隨 context 一併釋放
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start_time = time.perf_counter()
+    
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_start_time
+        stats = current_query_stats()
+        if stats is None:
+            return
+        
+        stats.count += 1
+        stats.total_time += elapsed
+        stats.shapes[statement_shape(statement)] += 1
+        if elapsed * 1000 >= current_app.config['SQL_SLOW_QUERY_MS']:
+            stats.slow_count += 1
+            current_app.logger.warning(
+                f"Slow query on {request.endpoint} ({elapsed * 1000:.1f} ms): {statement_shape(statement)[:500]}"
+            )
+    
+    @app.before_request
+    def _start_query_stats():
+        g._query_stats = RequestQueryStats()
+    
+    @app.after_request
+    def _record_query_stats(response):
+        stats = g.pop('_query_stats', None)
+        if stats is None:
+            return response
+        
+        endpoint = request.endpoint or 'unmatched'
+        if stats.count:
+            DB_QUERY_COUNT.labels(endpoint).inc(stats.count)
+            DB_QUERY_TIME.labels(endpoint).inc(stats.total_time)
+        if stats.slow_count:
+            DB_SLOW_QUERIES.labels(endpoint).inc(stats.slow_count)
+        
+        repeated = stats.repeated_statements(current_app.config['SQL_REPEATED_STATEMENT_THRESHOLD'])
+        if repeated:
+            DB_REPEATED_STATEMENTS.labels(endpoint).inc()
+            for shape, n in repeated:
+                current_app.logger.warning(f"Possible N+1 on {endpoint}: {n} executions of {shape[:500]}")
+        
+        show_header = current_app.config['SQL_QUERY_STATS_HEADER']
+        if show_header is None:
+            show_header = current_app.debug
+        if show_header:
+            response.headers.add(
+                'Server-Timing', f'db;desc="{stats.count} queries";dur={stats.total_time * 1000:.2f}'
+            )
+        return response
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+管理員頁面用戶列片段快取效能測試
+比較停用快取、快取冷啟動與快取命中時 /admin/ 的渲染耗時
+
+用法: python benchmarks/admin_fragment_cache.py [用戶數 ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ['FLASK_ENV'] = 'testing'
+
+from app import create_app
+from app.config import TestingConfig
+from app.models import db, User
+from app.services.user_service import UserService
+
+ROUNDS = 5
+
+
+def seed(user_count):
+    """建立管理員與測試用戶"""
+    db.create_all()
+    db.session.execute(db.insert(User), [
+        {'username': 'Admin', 'password': 'admin', 'is_admin': True}
+    ] + [
+        {'username': f'User{i}', 'password': 'pass'} for i in range(user_count)
+    ])
+    db.session.commit()
+
+
+def measure(client, rounds=ROUNDS):
+    """量測 /admin/ 的平均耗時（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        response = client.get('/admin/')
+        assert response.status_code == 200
+    return (time.perf_counter() - start) * 1000 / rounds
+
+
+def run(user_count, maxsize):
+    class BenchmarkConfig(TestingConfig):
+        FRAGMENT_CACHE_MAXSIZE = maxsize
+
+    app = create_app(BenchmarkConfig)
+    app.logger.disabled = True
+    client = app.test_client()
+
+    with app.app_context():
+        seed(user_count)
+        user_id = db.session.execute(db.select(User.id).where(User.is_admin.is_(False))).scalars().first()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'admin'})
+
+    cold_ms = measure(client, rounds=1)
+    warm_ms = measure(client)
+    with app.app_context():
+        UserService.update_user_leave_days(user_id, {'annual_leave': 3})
+    one_changed_ms = measure(client, rounds=1)
+    return cold_ms, warm_ms, one_changed_ms
+
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000]
+    print("🚀 管理員頁面片段快取效能測試 (SQLite 記憶體資料庫)\n")
+    for count in counts:
+        _, uncached_ms, _ = run(count, 0)
+        cold_ms, warm_ms, one_changed_ms = run(count, max(count * 2, 1))
+        print(f"👥 {count:>6} 用戶 | 停用快取 {uncached_ms:>8.1f} ms"
+              f" | 冷快取 {cold_ms:>8.1f} ms | 全部命中 {warm_ms:>8.1f} ms"
+              f" | 一位用戶變更後 {one_changed_ms:>8.1f} ms")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+管理員頁面最近請假記錄效能測試
+比較逐一查詢與批次查詢在不同用戶數下的查詢次數與延遲
+
+用法: python benchmarks/admin_recent_records.py [用戶數 ...]
+"""
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ['FLASK_ENV'] = 'testing'
+
+from sqlalchemy import event
+from app import create_app
+from app.config import TestingConfig
+from app.models import db, User, LeaveRecord
+
+RECORDS_PER_USER = 8
+
+
+class QueryCounter:
+    """統計引擎執行的 SQL 次數"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def seed(user_count):
+    """建立測試用戶與請假記錄"""
+    db.drop_all()
+    db.create_all()
+    db.session.execute(db.insert(User), [
+        {'username': 'Admin', 'password': 'admin', 'is_admin': True}
+    ] + [
+        {'username': f'User{i}', 'password': 'pass'} for i in range(user_count)
+    ])
+    user_ids = [row.id for row in db.session.execute(db.select(User.id).where(User.is_admin.is_(False)))]
+    base_date = date(date.today().year, 1, 1)
+    db.session.execute(db.insert(LeaveRecord), [
+        {
+            'user_id': user_id,
+            'leave_type': '特休',
+            'start_date': base_date + timedelta(days=n * 7),
+            'end_date': base_date + timedelta(days=n * 7),
+            'days': 1.0
+        }
+        for user_id in user_ids for n in range(RECORDS_PER_USER)
+    ])
+    db.session.commit()
+    return user_ids
+
+
+def per_user_loader(user_ids, limit=5):
+    """原本的逐一查詢實作"""
+    return {user_id: LeaveRecord.get_recent_by_user(user_id, limit) for user_id in user_ids}
+
+
+def measure(func, counter):
+    """量測函數的查詢次數與耗時（毫秒）"""
+    db.session.expunge_all()
+    with counter:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+    return counter.count, elapsed * 1000
+
+
+def run(user_count):
+    app = create_app(TestingConfig)
+    app.logger.disabled = True
+    client = app.test_client()
+
+    with app.app_context():
+        user_ids = seed(user_count)
+        counter = QueryCounter(db.engine)
+
+        old_queries, old_ms = measure(lambda: per_user_loader(user_ids), counter)
+        new_queries, new_ms = measure(lambda: LeaveRecord.get_recent_by_users(user_ids, 5), counter)
+
+        client.post('/auth/login', data={'username': 'admin', 'password': 'admin'})
+        route_queries, route_ms = measure(lambda: client.get('/admin/'), counter)
+
+    print(f"👥 {user_count:>6} 用戶 | 逐一查詢 {old_queries:>6} 次 {old_ms:>9.1f} ms"
+          f" | 批次查詢 {new_queries:>3} 次 {new_ms:>8.1f} ms"
+          f" | /admin/ 路由 {route_queries:>3} 次 {route_ms:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000]
+    print("🚀 管理員頁面最近請假記錄效能測試 (SQLite 記憶體資料庫)\n")
+    for count in counts:
+        run(count)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Gunicorn 配置負載測試
+比較原本的 `gunicorn run:app`（單一 sync worker）與 gunicorn.conf.py
+（多 worker、gthread、preload）在混合負載下的吞吐量與延遲：
+多數請求打 /health，一部分打模擬緩慢 Google API 呼叫的端點。
+
+用法: python benchmarks/gunicorn_load.py [--duration 秒] [--concurrency N]
+                                        [--slow-ratio 比例] [--google-latency 秒]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+APP_FACTORY = 'benchmarks.gunicorn_load:create_load_test_app()'
+
+
+def create_load_test_app():
+    """供 gunicorn 載入的測試應用：增加一個以 sleep 模擬 Google API 延遲的端點"""
+    sys.path.insert(0, ROOT)
+    from app import create_app
+    from app.config import TestingConfig
+
+    app = create_app(TestingConfig)
+    latency = float(os.environ.get('LOAD_TEST_GOOGLE_LATENCY', 0.5))
+
+    @app.route('/benchmark/google')
+    def emulated_google_call():
+        time.sleep(latency)
+        return 'ok'
+
+    return app
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'{base_url}/health', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn 未在時限內啟動')
+
+
+def generate_load(base_url, duration, concurrency, slow_ratio):
+    """固定並行數持續送出請求，回傳 (總請求數, 錯誤數, /health 延遲毫秒列表)"""
+    slow_every = max(1, round(1 / slow_ratio)) if slow_ratio > 0 else 0
+    deadline = time.monotonic() + duration
+    lock = threading.Lock()
+    fast_latencies = []
+    counts = {'requests': 0, 'errors': 0}
+
+    def client():
+        sent = 0
+        while time.monotonic() < deadline:
+            sent += 1
+            slow = slow_every and sent % slow_every == 0
+            path = '/benchmark/google' if slow else '/health'
+            start = time.perf_counter()
+            try:
+                urllib.request.urlopen(base_url + path, timeout=30).read()
+                error = False
+            except OSError:
+                error = True
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with lock:
+                counts['requests'] += 1
+                counts['errors'] += error
+                if not slow and not error:
+                    fast_latencies.append(elapsed_ms)
+
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return counts['requests'], counts['errors'], fast_latencies
+
+
+def run(label, gunicorn_args, args):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, FLASK_ENV='testing', LOAD_TEST_GOOGLE_LATENCY=str(args.google_latency),
+               GUNICORN_ACCESS_LOG='')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', *gunicorn_args, '--bind', f'127.0.0.1:{port}', APP_FACTORY],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_ready(base_url)
+        requests, errors, fast = generate_load(base_url, args.duration, args.concurrency, args.slow_ratio)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    p50 = statistics.median(fast) if fast else float('nan')
+    p95 = statistics.quantiles(fast, n=20)[-1] if len(fast) > 1 else float('nan')
+    print(f"{label:<24} | {requests / args.duration:>8.1f} req/s | /health p50 {p50:>7.1f} ms"
+          f" | p95 {p95:>7.1f} ms | 錯誤 {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gunicorn 配置負載測試')
+    parser.add_argument('--duration', type=float, default=10, help='每種配置的測試秒數')
+    parser.add_argument('--concurrency', type=int, default=32, help='並行用戶端數')
+    parser.add_argument('--slow-ratio', type=float, default=0.1, help='打到緩慢 Google 端點的請求比例')
+    parser.add_argument('--google-latency', type=float, default=0.5, help='模擬 Google API 延遲（秒）')
+    args = parser.parse_args()
+
+    print(f"🚀 Gunicorn 負載測試（{args.concurrency} 並行，{args.slow_ratio:.0%} 請求模擬"
+          f" {args.google_latency * 1000:.0f} ms Google 呼叫，每組 {args.duration:.0f} 秒）\n")
+    # 專案根目錄的 gunicorn.conf.py 會被自動載入，原配置需明確略過
+    run('原配置 (1 sync worker)', ['-c', os.devnull], args)
+    run('gunicorn.conf.py', ['-c', 'gunicorn.conf.py'], args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+應用啟動時間測試
+以 python -X importtime 列出匯入最慢的模組，並在全新行程中量測
+create_app() 到第一個請求完成的耗時；超過門檻或啟動時載入了 Google
+相關套件時以非零狀態結束，可放在 CI 作為回歸檢查。
+
+用法: python benchmarks/startup_time.py [--runs N] [--max-ms 毫秒] [--top N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# 啟動時不應載入的套件（應延遲到第一次使用 Google 服務時）
+LAZY_MODULES = ('googleapiclient', 'google.oauth2', 'google_auth_httplib2', 'httplib2')
+
+# 在全新行程中執行：量測匯入、create_app 與第一個請求
+STARTUP_SCRIPT = """
+import json, os, sys, time
+os.environ['FLASK_ENV'] = 'testing'
+started = time.perf_counter()
+from app import create_app
+from app.config import TestingConfig
+imported = time.perf_counter()
+app = create_app(TestingConfig)
+app.logger.disabled = True
+created = time.perf_counter()
+app.test_client().get('/health')
+finished = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (finished - created) * 1000,
+    'lazy_modules_loaded': sorted(name for name in sys.modules if name.startswith(%r))
+}))
+""" % (LAZY_MODULES,)
+
+
+def run_child(*python_args):
+    """在專案根目錄以全新直譯器執行啟動腳本"""
+    return subprocess.run(
+        [sys.executable, *python_args, '-c', STARTUP_SCRIPT],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+
+def slowest_imports(stderr, top):
+    """解析 -X importtime 輸出，回傳累計耗時最高的模組 [(微秒, 模組)]"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((int(cumulative), name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='應用啟動時間測試')
+    parser.add_argument('--runs', type=int, default=5, help='量測次數（取中位數）')
+    parser.add_argument('--max-ms', type=float, default=float(os.environ.get('STARTUP_BUDGET_MS', 150)),
+                        help='create_app() 到第一個請求完成的上限（毫秒）')
+    parser.add_argument('--top', type=int, default=10, help='列出匯入最慢的模組數')
+    args = parser.parse_args()
+
+    print("🚀 應用啟動時間測試\n")
+    traced = run_child('-X', 'importtime')
+    print(f"🐢 匯入最慢的 {args.top} 個模組（累計）:")
+    for cumulative, name in slowest_imports(traced.stderr, args.top):
+        print(f"   {cumulative / 1000:>8.1f} ms  {name}")
+
+    results = [json.loads(run_child().stdout.strip().splitlines()[-1]) for _ in range(args.runs)]
+    import_ms = statistics.median(result['import_ms'] for result in results)
+    create_ms = statistics.median(result['create_app_ms'] for result in results)
+    request_ms = statistics.median(result['first_request_ms'] for result in results)
+    startup_ms = create_ms + request_ms
+    loaded = sorted({name for result in results for name in result['lazy_modules_loaded']})
+
+    print(f"\n⏱️  中位數（{args.runs} 次）: 匯入 {import_ms:.1f} ms | create_app {create_ms:.1f} ms"
+          f" | 第一個請求 {request_ms:.1f} ms")
+
+    failed = False
+    if loaded:
+        print(f"❌ 啟動時載入了應延遲匯入的模組: {', '.join(loaded[:5])}")
+        failed = True
+    if startup_ms > args.max_ms:
+        print(f"❌ create_app 到第一個請求 {startup_ms:.1f} ms，超過上限 {args.max_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print(f"✅ create_app 到第一個請求 {startup_ms:.1f} ms（上限 {args.max_ms:.0f} ms），未載入 Google 套件")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Gunicorn 生產環境配置
+
+用法: gunicorn -c gunicorn.conf.py run:app
+
+- gthread worker：每個 worker 以多執行緒處理請求，單一緩慢的 Google API
+  呼叫只佔用一個執行緒，不會阻塞整個 worker
+- preload_app：主行程載入應用一次後 fork，worker 共用已匯入的模組
+- post_fork：丟棄繼承自主行程的資料庫連線與 Google 服務實例
+- max_requests + jitter：worker 處理一定數量請求後輪流重啟，避免記憶體累積
+
+各項設定皆可由環境變數覆寫，詳見 REFACTOR_README.md。
+"""
+import os
+import shutil
+import tempfile
+
+
+def _cpu_count():
+    """可用 CPU 數（容器內依 cpuset 限制計算）"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 8000)}")
+
+# 每個 worker 的執行緒數需不超過資料庫連線池上限（DB_POOL_SIZE + DB_MAX_OVERFLOW）
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', max(2, _cpu_count())))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Google API 逾時為 GOOGLE_API_TIMEOUT（預設 30 秒），worker 逾時需大於它
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None  # 設為空字串可關閉
+errorlog = '-'
+
+# 多 worker 的 Prometheus 指標需在應用（prometheus_client）載入前指定共用目錄
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'leave-prometheus')
+)
+
+
+def on_starting(server):
+    """清除上次執行留下的指標檔"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    """
+    丟棄繼承自主行程的連線與單例
+
+    資料庫 socket 若由父子行程共用會互相干擾，close=False 只讓子行程改用新連線池，
+    不關閉仍屬於主行程的連線；Google 服務於首次使用時在 worker 內重新建立。
+    """
+    from app.models import db
+    from app.services.google_integration import reset_google_service
+
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
+    reset_google_service()
+
+
+def child_exit(server, worker):
+    """worker 結束時清除其即時量測檔"""
+    from app.utils.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
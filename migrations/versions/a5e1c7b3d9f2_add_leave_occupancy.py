@@ -0,0 +1,39 @@
+"""add leave occupancy bitmap and half day period
+
+Revision ID: a5e1c7b3d9f2
+Revises: f3c9d1e7a5b4
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5e1c7b3d9f2'
+down_revision = 'f3c9d1e7a5b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('leave_record', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('half_day_period', sa.String(length=2), nullable=True))
+
+    # 位元圖在首次使用時由 leave_record 建立
+    op.create_table('leave_occupancy',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('bitmap', sa.LargeBinary(length=92), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'year'),
+    mysql_charset='utf8mb4',
+    mysql_collate='utf8mb4_unicode_ci'
+    )
+
+
+def downgrade():
+    op.drop_table('leave_occupancy')
+
+    with op.batch_alter_table('leave_record', schema=None) as batch_op:
+        batch_op.drop_column('half_day_period')
@@ -0,0 +1,41 @@
+"""add leave usage summary
+
+Revision ID: b1e7c3d2a9f4
+Revises: af3154f625c0
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1e7c3d2a9f4'
+down_revision = 'af3154f625c0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('leave_usage_summary',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('leave_type', sa.String(length=50), nullable=False),
+    sa.Column('days', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'year', 'leave_type'),
+    mysql_charset='utf8mb4',
+    mysql_collate='utf8mb4_unicode_ci'
+    )
+
+    # 由既有請假記錄回填彙總資料
+    op.execute(
+        "INSERT INTO leave_usage_summary (user_id, year, leave_type, days) "
+        "SELECT user_id, EXTRACT(YEAR FROM start_date), leave_type, SUM(days) "
+        "FROM leave_record "
+        "GROUP BY user_id, EXTRACT(YEAR FROM start_date), leave_type"
+    )
+
+
+def downgrade():
+    op.drop_table('leave_usage_summary')
@@ -0,0 +1,26 @@
+"""seed leave record version counter
+
+Revision ID: b8d2f4a6c1e3
+Revises: a5e1c7b3d9f2
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d2f4a6c1e3'
+down_revision = 'a5e1c7b3d9f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 團隊請假狀況索引以此版本計數判斷是否需要重建
+    row_counter = sa.table('row_counter', sa.column('name', sa.String), sa.column('value', sa.BigInteger))
+    op.bulk_insert(row_counter, [{'name': 'leave_record_version', 'value': 0}])
+
+
+def downgrade():
+    op.execute("DELETE FROM row_counter WHERE name = 'leave_record_version'")
@@ -0,0 +1,47 @@
+"""add calendar outbox
+
+Revision ID: c4d8e2f1a7b3
+Revises: b1e7c3d2a9f4
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8e2f1a7b3'
+down_revision = 'b1e7c3d2a9f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('calendar_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('leave_record_id', sa.Integer(), nullable=False),
+    sa.Column('calendar_id', sa.String(length=255), nullable=True),
+    sa.Column('summary', sa.String(length=255), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('event_link', sa.String(length=500), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['leave_record_id'], ['leave_record.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    mysql_charset='utf8mb4',
+    mysql_collate='utf8mb4_unicode_ci'
+    )
+    with op.batch_alter_table('calendar_outbox', schema=None) as batch_op:
+        batch_op.create_index('idx_calendar_outbox_status_next', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('calendar_outbox', schema=None) as batch_op:
+        batch_op.drop_index('idx_calendar_outbox_status_next')
+
+    op.drop_table('calendar_outbox')
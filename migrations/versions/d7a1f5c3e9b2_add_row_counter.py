@@ -0,0 +1,35 @@
+"""add row counter
+
+Revision ID: d7a1f5c3e9b2
+Revises: c4d8e2f1a7b3
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a1f5c3e9b2'
+down_revision = 'c4d8e2f1a7b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('row_counter',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name'),
+    mysql_charset='utf8mb4',
+    mysql_collate='utf8mb4_unicode_ci'
+    )
+
+    # 以現有資料初始化計數器
+    op.execute("INSERT INTO row_counter (name, value) SELECT 'user', COUNT(*) FROM user")
+    op.execute("INSERT INTO row_counter (name, value) SELECT 'leave_record', COUNT(*) FROM leave_record")
+
+
+def downgrade():
+    op.drop_table('row_counter')
@@ -0,0 +1,26 @@
+"""add user version
+
+Revision ID: e2b8c4d6f1a3
+Revises: d7a1f5c3e9b2
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b8c4d6f1a3'
+down_revision = 'd7a1f5c3e9b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,48 @@
+"""shard row counters
+
+Revision ID: e5f7a9c2b4d6
+Revises: b8d2f4a6c1e3
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f7a9c2b4d6'
+down_revision = 'b8d2f4a6c1e3'
+branch_labels = None
+depends_on = None
+
+# 與 RowCounter.SHARDS 相同；第 0 片沿用原本的計數器列
+SHARDS = 8
+
+
+def upgrade():
+    # 為既有計數器建立其餘分片（值為 0，加總不變）
+    row_counter = sa.table('row_counter', sa.column('name', sa.String), sa.column('value', sa.BigInteger))
+    names = op.get_bind().execute(sa.text("SELECT name FROM row_counter")).scalars().all()
+    rows = [
+        {'name': f'{name}#{shard}', 'value': 0}
+        for name in names if '#' not in name
+        for shard in range(1, SHARDS)
+    ]
+    if rows:
+        op.bulk_insert(row_counter, rows)
+
+
+def downgrade():
+    # 將分片的值併回第 0 片後刪除分片
+    row_counter = sa.table('row_counter', sa.column('name', sa.String), sa.column('value', sa.BigInteger))
+    connection = op.get_bind()
+    shards = connection.execute(sa.text("SELECT name, value FROM row_counter WHERE name LIKE '%#%'")).all()
+    totals = {}
+    for name, value in shards:
+        base = name.rsplit('#', 1)[0]
+        totals[base] = totals.get(base, 0) + value
+    for base, total in totals.items():
+        connection.execute(
+            row_counter.update().where(row_counter.c.name == base).values(value=row_counter.c.value + total)
+        )
+    op.execute("DELETE FROM row_counter WHERE name LIKE '%#%'")
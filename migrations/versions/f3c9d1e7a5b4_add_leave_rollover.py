@@ -0,0 +1,32 @@
+"""add leave rollover
+
+Revision ID: f3c9d1e7a5b4
+Revises: e2b8c4d6f1a3
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c9d1e7a5b4'
+down_revision = 'e2b8c4d6f1a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('leave_rollover',
+    sa.Column('year', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('users_updated', sa.Integer(), nullable=False),
+    sa.Column('settings', sa.JSON(), nullable=True),
+    sa.Column('executed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('year'),
+    mysql_charset='utf8mb4',
+    mysql_collate='utf8mb4_unicode_ci'
+    )
+
+
+def downgrade():
+    op.drop_table('leave_rollover')
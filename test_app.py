@@ -3,6 +3,7 @@
 應用功能測試腳本
 """
 import os
+import sys
 import tempfile
 from datetime import datetime, date, timedelta
 
@@ -11,11 +12,20 @@ os.environ['FLASK_ENV'] = 'testing'
 
 from app import create_app
 from app.config import TestingConfig
-from app.models import db, User, LeaveRecord
+from app.models import db, User, LeaveRecord, LeaveUsageSummary
 from app.services.auth_service import AuthService
 from app.services.user_service import UserService
 from app.services.leave_service import LeaveService
 
+def next_workday(offset=1, after=None):
+    """after（預設今天）之後第 offset 個週一至週五（測試設定不載入假日檔）"""
+    day = after or date.today()
+    while offset > 0:
+        day += timedelta(days=1)
+        if day.weekday() < 5:
+            offset -= 1
+    return day
+
 def test_app_basic_functionality():
     """測試應用基本功能"""
     print("🧪 開始測試應用基本功能...")
@@ -57,8 +67,8 @@ def test_app_basic_functionality():
             print("📝 測試請假服務...")
             leave_data = {
                 'leave_type': '特休',
-                'start_date': (date.today() + timedelta(days=1)).strftime('%Y-%m-%d'),
-                'end_date': (date.today() + timedelta(days=1)).strftime('%Y-%m-%d'),
+                'start_date': next_workday().strftime('%Y-%m-%d'),
+                'end_date': next_workday().strftime('%Y-%m-%d'),
                 'half_day': False,
                 'reason': '測試請假'
             }
@@ -140,36 +150,1886 @@ def test_route_endpoints():
     
     return True
 
-def test_template_paths():
-    """測試模板路徑"""
-    print("\n📄 檢查模板文件...")
+def test_recent_records_batch_loader():
+    """測試批次載入多位用戶的最近請假記錄"""
+    print("\n📚 測試批次最近請假記錄...")
     
-    templates = [
-        'templates/login.html',
-        'templates/base.html',
-        'templates/leave.html',
-        'templates/admin.html',
-        'templates/user_records.html'
-    ]
+    app = create_app(TestingConfig)
     
-    all_found = True
-    for template in templates:
-        if os.path.exists(template):
-            print(f"✅ 模板存在: {template}")
-        else:
-            print(f"❌ 模板缺失: {template}")
-            all_found = False
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            users = [UserService.create_user(f"batch{i}", "pass") for i in range(3)]
+            base_date = date(date.today().year, 1, 1)
+            for index, user in enumerate(users[:2]):
+                for offset in range(4 + index * 3):
+                    db.session.add(LeaveRecord(
+                        user_id=user.id,
+                        leave_type='特休',
+                        start_date=base_date + timedelta(days=offset % 3),
+                        end_date=base_date + timedelta(days=offset % 3),
+                        days=1.0
+                    ))
+            db.session.commit()
+            
+            user_ids = [user.id for user in users]
+            expected = {uid: LeaveRecord.get_recent_by_user(uid, 5) for uid in user_ids}
+            
+            for loader in (LeaveRecord._recent_by_users_window, LeaveRecord._recent_by_users_correlated):
+                records = {uid: [] for uid in user_ids}
+                for record in loader(user_ids, 5):
+                    records[record.user_id].append(record)
+                if records != expected:
+                    print(f"❌ {loader.__name__} 結果與逐一查詢不一致")
+                    return False
+            
+            batched = LeaveService.get_recent_leave_records_by_users(user_ids, 5)
+            if batched != expected or batched[users[2].id] != []:
+                print("❌ 批次載入結果不正確")
+                return False
+            
+            print("✅ 批次最近請假記錄與逐一查詢一致")
+            
+        except Exception as e:
+            print(f"❌ 批次載入測試失敗: {e}")
+            return False
     
-    return all_found
+    return True
 
-if __name__ == "__main__":
-    print("🚀 開始全面功能測試...\n")
+def explain_query(query):
+    """取得查詢的執行計畫文字"""
+    engine = db.engine
+    sql = str(query.statement.compile(engine, compile_kwargs={'literal_binds': True}))
+    prefix = 'EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + sql).fetchall()
+    return ' '.join(str(value) for row in rows for value in row)
+
+def test_year_filter_uses_index():
+    """測試年度/月份篩選可使用複合索引"""
+    print("\n🔎 測試日期範圍篩選索引...")
     
-    # 測試基本功能
-    basic_test = test_app_basic_functionality()
+    app = create_app(TestingConfig)
     
-    # 測試路由
-    route_test = test_route_endpoints()
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            from app.utils.date_utils import year_filter, month_filter
+            
+            queries = {
+                '年度': LeaveRecord.query.filter(
+                    LeaveRecord.user_id == 1, year_filter(LeaveRecord.start_date, 2025)),
+                '月份': LeaveRecord.query.filter(
+                    LeaveRecord.user_id == 1, month_filter(LeaveRecord.start_date, 2025, 12)),
+            }
+            for name, query in queries.items():
+                plan = explain_query(query)
+                if 'idx_leave_user_date' not in plan:
+                    print(f"❌ {name}查詢未使用 idx_leave_user_date: {plan}")
+                    return False
+                if db.engine.dialect.name == 'sqlite' and 'start_date>' not in plan:
+                    print(f"❌ {name}查詢未對 start_date 做範圍掃描: {plan}")
+                    return False
+            
+            user = UserService.create_user("rangeuser", "pass")
+            for start in (date(2024, 12, 31), date(2025, 1, 1), date(2025, 12, 31), date(2026, 1, 1)):
+                db.session.add(LeaveRecord(user_id=user.id, leave_type='病假',
+                                           start_date=start, end_date=start, days=1.0))
+            db.session.commit()
+            
+            if len(LeaveRecord.get_by_user_and_year(user.id, 2025)) != 2:
+                print("❌ 年度篩選邊界錯誤")
+                return False
+            if len(LeaveRecord.get_by_user_and_month(user.id, 2025, 12)) != 1:
+                print("❌ 月份篩選邊界錯誤")
+                return False
+            
+            print("✅ 日期範圍篩選使用 idx_leave_user_date 範圍掃描")
+            
+        except Exception as e:
+            print(f"❌ 日期範圍篩選測試失敗: {e}")
+            return False
+    
+    return True
+
+def test_leave_usage_summary():
+    """測試請假使用量彙總表"""
+    print("\n🧮 測試請假使用量彙總...")
+    
+    app = create_app(TestingConfig)
+    
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            user = UserService.create_user("summaryuser", "pass")
+            # 同一年度內不重疊的日期
+            records = [
+                LeaveService.create_leave_request(user, {
+                    'leave_type': leave_type, 'start_date': leave_date, 'end_date': leave_date,
+                    'half_day': half_day, 'reason': '彙總測試'
+                })
+                for leave_type, half_day, leave_date in (
+                    ('特休', False, next_workday(1, date(date.today().year, 1, 1)).isoformat()),
+                    ('特休', True, next_workday(2, date(date.today().year, 1, 1)).isoformat()),
+                    ('病假', False, next_workday(3, date(date.today().year, 1, 1)).isoformat())
+                )
+            ]
+            year = records[0].start_date.year
+            
+            stats = LeaveService.get_annual_leave_stats(user.id, year)
+            expected = LeaveService.calculate_annual_leave_stats(
+                LeaveService.get_user_leave_records(user.id), year)
+            if stats != expected or stats['annual_leave_days'] != 1.5:
+                print(f"❌ 彙總統計不正確: {stats}")
+                return False
+            
+            LeaveService.delete_leave_record(records[2].id)
+            if LeaveService.get_annual_leave_stats(user.id, year)['sick_leave_days'] != 0:
+                print("❌ 刪除請假後彙總未扣回")
+                return False
+            
+            LeaveUsageSummary.query.delete()
+            db.session.commit()
+            result = app.test_cli_runner().invoke(args=['rebuild-usage-summary'])
+            stats = LeaveService.get_annual_leave_stats(user.id, year)
+            if result.exit_code != 0 or stats['annual_leave_days'] != 1.5:
+                print(f"❌ 重建彙總失敗: {result.output} {stats}")
+                return False
+            
+            print("✅ 請假使用量彙總於新增/刪除/重建時保持一致")
+            
+        except Exception as e:
+            print(f"❌ 請假彙總測試失敗: {e}")
+            return False
+    
+    return True
+
+def test_annual_stats_aggregation():
+    """測試資料庫端 GROUP BY 年度統計"""
+    print("\n📊 測試 GROUP BY 年度統計...")
+    
+    app = create_app(TestingConfig)
+    
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            users = [UserService.create_user(f"agg{i}", "pass") for i in range(3)]
+            year = date.today().year
+            samples = [
+                (users[0], '特休', date(year, 3, 2), 1.0),
+                (users[0], '特休', date(year, 5, 6), 0.5),
+                (users[0], '病假', date(year - 1, 12, 31), 2.0),
+                (users[1], '同情假', date(year, 12, 31), 3.0),
+                (users[1], '事假', date(year + 1, 1, 1), 1.0),
+            ]
+            for user, leave_type, start, days in samples:
+                db.session.add(LeaveRecord(user_id=user.id, leave_type=leave_type,
+                                           start_date=start, end_date=start, days=days))
+            db.session.commit()
+            
+            user_ids = [user.id for user in users]
+            batched = LeaveService.aggregate_annual_leave_stats_by_users(user_ids, year)
+            for user_id in user_ids:
+                expected = LeaveService.calculate_annual_leave_stats(
+                    LeaveService.get_user_leave_records(user_id), year)
+                if batched[user_id] != expected or \
+                        LeaveService.aggregate_annual_leave_stats(user_id, year) != expected:
+                    print(f"❌ 用戶 {user_id} 統計不一致: {batched[user_id]} != {expected}")
+                    return False
+            
+            admin = UserService.create_user("aggadmin", "pass")
+            admin.is_admin = True
+            db.session.commit()
+            client = app.test_client()
+            client.post('/auth/login', data={'username': 'aggadmin', 'password': 'pass'})
+            page = client.get('/admin/').get_data(as_text=True)
+            if f'<th>{year} 已請</th>' not in page or '<td>1.5</td>' not in page:
+                print("❌ 管理頁未顯示本年度已請天數")
+                return False
+            
+            print("✅ GROUP BY 年度統計與逐筆計算一致，管理頁以批次查詢顯示已請天數")
+            
+        except Exception as e:
+            print(f"❌ GROUP BY 統計測試失敗: {e}")
+            return False
+    
+    return True
+
+def test_leave_records_pagination():
+    """測試請假記錄鍵集分頁"""
+    print("\n📑 測試請假記錄分頁...")
+    
+    app = create_app(TestingConfig)
+    client = app.test_client()
+    
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            user = UserService.create_user("pageuser", "pass")
+            base_date = date(date.today().year, 1, 1)
+            for offset in range(25):
+                start = base_date + timedelta(days=offset // 2)
+                db.session.add(LeaveRecord(user_id=user.id, leave_type='事假',
+                                           start_date=start, end_date=start, days=1.0))
+            db.session.commit()
+            
+            expected = LeaveService.get_user_leave_records(user.id)
+            expected.sort(key=lambda record: (record.start_date, record.id), reverse=True)
+            
+            pages, cursor = [], None
+            while True:
+                records, cursor = LeaveService.get_user_leave_records_page(user.id, 10, cursor)
+                pages.append(records)
+                if cursor is None:
+                    break
+            
+            if [len(page) for page in pages] != [10, 10, 5] or sum(pages, []) != expected:
+                print("❌ 分頁結果與完整排序不一致")
+                return False
+            
+            client.post('/auth/login', data={'username': 'pageuser', 'password': 'pass'})
+            response = client.get('/leave/dashboard?per_page=10')
+            html = response.get_data(as_text=True)
+            if response.status_code != 200 or 'cursor=' not in html:
+                print(f"❌ 儀表板分頁連結缺失: {response.status_code}")
+                return False
+            response = client.get(f'/leave/user_records/{user.id}?per_page=10&cursor=invalid')
+            if response.status_code != 200:
+                print(f"❌ 無效游標未回到第一頁: {response.status_code}")
+                return False
+            
+            print("✅ 鍵集分頁結果正確")
+            
+        except Exception as e:
+            print(f"❌ 分頁測試失敗: {e}")
+            return False
+    
+    return True
+
+def start_fake_calendar_server(fail_times=0):
+    """啟動本機假 Google Calendar 端點，前 fail_times 次回傳 503"""
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    
+    state = {'fail_times': fail_times, 'events': []}
+    
+    class FakeCalendarHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if state['fail_times'] > 0:
+                state['fail_times'] -= 1
+                self.send_response(503)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(b'{"error": {"code": 503, "message": "unavailable"}}')
+                return
+            event = json.loads(body)
+            state['events'].append(event)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({
+                'id': str(len(state['events'])),
+                'htmlLink': f"http://fake-calendar/event/{len(state['events'])}"
+            }).encode())
+        
+        def log_message(self, *args):
+            pass
+    
+    server = HTTPServer(('127.0.0.1', 0), FakeCalendarHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+def test_calendar_outbox_sync():
+    """測試 Google Calendar outbox 背景同步"""
+    print("\n📅 測試日曆 outbox 同步...")
+    
+    from google.auth.credentials import AnonymousCredentials
+    from app.models import CalendarOutbox
+    from app.services.google_service import GoogleService
+    from app.services.calendar_sync_service import CalendarSyncService
+    
+    server, state = start_fake_calendar_server(fail_times=1)
+    app = create_app(TestingConfig)
+    app.config['GOOGLE_CALENDAR_API_ENDPOINT'] = f"http://127.0.0.1:{server.server_port}/"
+    app.config['CALENDAR_SYNC_BACKOFF_BASE'] = 0
+    
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            user = UserService.create_user("syncuser", "pass")
+            tomorrow = next_workday().strftime('%Y-%m-%d')
+            record = LeaveService.create_leave_request(user, {
+                'leave_type': '病假', 'start_date': tomorrow, 'end_date': tomorrow
+            })
+            outbox = CalendarOutbox.query.filter_by(leave_record_id=record.id).one()
+            if outbox.status != CalendarOutbox.STATUS_PENDING or state['events']:
+                print("❌ 請假申請未在同一交易寫入 outbox")
+                return False
+            
+            client = GoogleService(credentials=AnonymousCredentials())
+            first = CalendarSyncService.process_batch(calendar_client=client)
+            second = CalendarSyncService.process_batch(calendar_client=client)
+            db.session.refresh(outbox)
+            
+            if first['retried'] != 1 or second['synced'] != 1:
+                print(f"❌ 重試流程不正確: {first} {second}")
+                return False
+            if outbox.status != CalendarOutbox.STATUS_DONE or outbox.attempts != 2 or \
+                    state['events'][0]['summary'] != 'Syncuser - 病假':
+                print(f"❌ outbox 狀態不正確: {outbox.to_dict()}")
+                return False
+            if CalendarSyncService.process_batch(calendar_client=client) != \
+                    {'synced': 0, 'retried': 0, 'failed': 0, 'skipped': 0}:
+                print("❌ 已完成的事件被重複同步")
+                return False
+            
+            # 認領後 outbox 隨請假記錄刪除時略過，不影響其他項目
+            if CalendarSyncService._process_one(outbox.id + 1000, client) != 'skipped':
+                print("❌ 已刪除的 outbox 未被略過")
+                return False
+            
+            # 事件 ID 帶有各安裝的命名空間，不同資料庫的相同記錄 ID 不會衝突
+            import re
+            event_id = CalendarSyncService.event_id_for(record.id)
+            app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:////tmp/other-install.db'
+            other_event_id = CalendarSyncService.event_id_for(record.id)
+            app.config['CALENDAR_EVENT_ID_NAMESPACE'] = 'staging'
+            named_event_id = CalendarSyncService.event_id_for(record.id)
+            if state['events'][0]['id'] != event_id or len({event_id, other_event_id, named_event_id}) != 3 or \
+                    not all(re.fullmatch(r'[0-9a-v]{5,1024}', value)
+                            for value in (event_id, other_event_id, named_event_id)):
+                print(f"❌ 事件 ID 命名空間不正確: {event_id} {other_event_id} {named_event_id}")
+                return False
+            
+            print("✅ outbox 經由假 Calendar 端點重試後同步成功")
+            
+        except Exception as e:
+            print(f"❌ 日曆同步測試失敗: {e}")
+            return False
+        finally:
+            server.shutdown()
+    
+    return True
+
+def test_receipt_stream_upload():
+    """測試收據以分塊串流上傳 Google Drive"""
+    print("\n📎 測試收據串流上傳...")
+    
+    import io
+    from googleapiclient.http import HttpMockSequence
+    from werkzeug.datastructures import FileStorage
+    from app.services.google_service import GoogleService
+    
+    app = create_app(TestingConfig)
+    upload_folder = tempfile.mkdtemp()
+    app.config['UPLOAD_FOLDER'] = upload_folder
+    app.config['GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE'] = 256 * 1024
+    
+    with app.app_context():
+        try:
+            http = HttpMockSequence([
+                ({'status': '200', 'location': 'https://upload.example/session'}, ''),
+                ({'status': '308', 'range': 'bytes=0-262143'}, ''),
+                ({'status': '308', 'range': 'bytes=0-524287'}, ''),
+                ({'status': '200'}, '{"id": "receipt-id"}'),
+                ({'status': '200'}, '{}'),
+            ])
+            service = GoogleService(http_factory=lambda: http)
+            
+            receipt = FileStorage(io.BytesIO(b'x' * (600 * 1024)), filename='../收據 receipt.pdf',
+                                  content_type='application/pdf')
+            url = service.process_receipt_upload(receipt)
+            
+            if url != 'https://drive.google.com/uc?export=view&id=receipt-id':
+                print(f"❌ 分享連結不正確: {url}")
+                return False
+            if os.listdir(upload_folder):
+                print("❌ 上傳過程在 UPLOAD_FOLDER 留下暫存檔")
+                return False
+            
+            print("✅ 收據以 3 個分塊上傳，未寫入暫存檔")
+            
+        except Exception as e:
+            print(f"❌ 收據上傳測試失敗: {e}")
+            return False
+    
+    return True
+
+def test_google_client_pool():
+    """測試 Google API 客戶端連線池"""
+    print("\n🔌 測試 Google 客戶端連線池...")
+    
+    import threading
+    import time
+    from app.services.google_client_pool import GoogleClientPool
+    from app.exceptions import ExternalServiceError
+    
+    from prometheus_client import REGISTRY
+    
+    def sample(name):
+        return REGISTRY.get_sample_value(name) or 0
+    
+    try:
+        before = {name: sample(name) for name in (
+            'leave_google_client_pool_acquired_total', 'leave_google_client_pool_waits_total',
+            'leave_google_client_pool_timeouts_total')}
+        pool = GoogleClientPool(object, max_size=2, acquire_timeout=1)
+        seen = []
+        
+        def borrow():
+            with pool.acquire() as clients:
+                seen.append(clients)
+                time.sleep(0.05)
+        
+        threads = [threading.Thread(target=borrow) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        stats = pool.stats()
+        if stats['created'] != 2 or stats['acquired'] != 6 or len(set(map(id, seen))) != 2:
+            print(f"❌ 連線池借還不正確: {stats}")
+            return False
+        if stats['wait_count'] == 0 or stats['in_use'] != 0:
+            print(f"❌ 等待統計不正確: {stats}")
+            return False
+        
+        pool.acquire_timeout = 0.05
+        with pool.acquire(), pool.acquire():
+            in_use_gauge = sample('leave_google_client_pool_in_use')
+            try:
+                with pool.acquire():
+                    pass
+                print("❌ 連線池滿時未逾時")
+                return False
+            except ExternalServiceError:
+                pass
+        
+        deltas = {name: sample(name) - value for name, value in before.items()}
+        if in_use_gauge != 2 or sample('leave_google_client_pool_in_use') != 0 or \
+                sample('leave_google_client_pool_size') != 2 or \
+                deltas['leave_google_client_pool_acquired_total'] != 8 or \
+                deltas['leave_google_client_pool_waits_total'] != stats['wait_count'] or \
+                deltas['leave_google_client_pool_timeouts_total'] != 1:
+            print(f"❌ 連線池 Prometheus 指標不正確: {deltas}")
+            return False
+        
+        # 模擬 fork 後的子行程：繼承的連線應被丟棄
+        pool._pid = -1
+        with pool.acquire() as clients:
+            if any(clients is old for old in seen):
+                print("❌ fork 後仍重用父行程的客戶端")
+                return False
+        
+        print("✅ 連線池限制大小、記錄等待時間並於 fork 後重建")
+        
+    except Exception as e:
+        print(f"❌ 連線池測試失敗: {e}")
+        return False
+    
+    return True
+
+def fake_batch_response(parts):
+    """組成 Calendar batch HTTP 的 multipart 回應，parts 為 [(request_id, status, body)]"""
+    import json
+    lines = []
+    for request_id, status, body in parts:
+        lines += [
+            '--batch_boundary',
+            'Content-Type: application/http',
+            f'Content-ID: <response-fake + {request_id}>',
+            '',
+            f'HTTP/1.1 {status} FAKE',
+            'Content-Type: application/json',
+            '',
+            json.dumps(body),
+        ]
+    lines.append('--batch_boundary--')
+    return ({'status': '200', 'content-type': 'multipart/mixed; boundary=batch_boundary'}, '\r\n'.join(lines))
+
+def test_calendar_backfill():
+    """測試以 batch 請求回補 Google Calendar"""
+    print("\n🗓️  測試日曆回補...")
+    
+    from googleapiclient.http import HttpMockSequence
+    from app.models import CalendarOutbox
+    from app.services.google_service import GoogleService
+    from app.services.calendar_sync_service import CalendarSyncService
+    
+    app = create_app(TestingConfig)
+    
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            user = UserService.create_user("backfilluser", "pass")
+            records = []
+            for offset in range(4):
+                start = date(2025, 3, 1) + timedelta(days=offset)
+                record = LeaveRecord(user_id=user.id, leave_type='特休',
+                                     start_date=start, end_date=start, days=1.0)
+                db.session.add(record)
+                records.append(record)
+            db.session.flush()
+            for record, status in ((records[0], CalendarOutbox.STATUS_DONE), (records[3], CalendarOutbox.STATUS_FAILED)):
+                outbox = CalendarSyncService.enqueue(record, 'old')
+                outbox.status = status
+            db.session.commit()
+            
+            if CalendarSyncService.count_unsynced(date(2025, 3, 1), date(2025, 3, 31)) != 3:
+                print("❌ 回補候選數量不正確")
+                return False
+            from sqlalchemy import event
+            selects = []
+            
+            def count_selects(conn, cursor, statement, parameters, context, executemany):
+                if statement.lstrip().upper().startswith('SELECT'):
+                    selects.append(statement)
+            
+            event.listen(db.engine, 'before_cursor_execute', count_selects)
+            try:
+                enqueued = CalendarSyncService.enqueue_unsynced(date(2025, 3, 1), date(2025, 3, 31))
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', count_selects)
+            if enqueued != 3 or CalendarOutbox.query.count() != 4:
+                print("❌ 回補排入結果不正確")
+                return False
+            if len(selects) != 2:
+                print(f"❌ 回補排入的查詢次數隨記錄數增加: {len(selects)}")
+                return False
+            
+            # 不同日曆的項目分開送出
+            other_outbox = records[2].calendar_outbox.one()
+            other_outbox.calendar_id = 'other-calendar@group.calendar.google.com'
+            db.session.commit()
+            
+            ids = {record.id: record.calendar_outbox.one().id for record in records}
+            http = HttpMockSequence([
+                # 整批被速率限制：退避後重送，不計入失敗次數
+                ({'status': '429'}, '{"error": {"code": 429, "message": "rateLimitExceeded"}}'),
+                fake_batch_response([
+                    (ids[records[2].id], 409, {'error': {'code': 409, 'message': 'duplicate'}}),
+                ]),
+                fake_batch_response([
+                    (ids[records[3].id], 429, {'error': {'code': 429, 'message': 'rateLimitExceeded'}}),
+                    (ids[records[1].id], 200, {'htmlLink': 'http://fake/1'}),
+                ]),
+                fake_batch_response([
+                    (ids[records[3].id], 200, {'htmlLink': 'http://fake/3'}),
+                ]),
+            ])
+            batch_calendars = []
+            
+            class RecordingGoogleService(GoogleService):
+                def create_calendar_events_batch(self, events, calendar_id=None):
+                    batch_calendars.append((calendar_id, sorted(events)))
+                    return super().create_calendar_events_batch(events, calendar_id=calendar_id)
+            
+            client = RecordingGoogleService(http_factory=lambda: http)
+            progress = []
+            
+            import app.services.calendar_sync_service as sync_module
+            original_sleep = sync_module.time.sleep
+            sync_module.time.sleep = lambda seconds: None
+            try:
+                results = CalendarSyncService.drain_with_batches(
+                    50, 1000, calendar_client=client,
+                    progress=lambda processed, results: progress.append(processed))
+            finally:
+                sync_module.time.sleep = original_sleep
+            
+            statuses = CalendarOutbox.count_by_status()
+            attempts = [outbox.attempts for outbox in CalendarOutbox.query.order_by(CalendarOutbox.id)]
+            if results['synced'] != 3 or statuses != {CalendarOutbox.STATUS_DONE: 4} or progress != [3, 5, 6] \
+                    or max(attempts) != 1:
+                print(f"❌ 回補結果不正確: {results} {statuses} {progress}")
+                return False
+            default_calendar = app.config['GOOGLE_CALENDAR_ID']
+            default_ids = sorted([ids[records[1].id], ids[records[3].id]])
+            if batch_calendars != [
+                (default_calendar, default_ids),
+                (other_outbox.calendar_id, [ids[records[2].id]]),
+                (default_calendar, default_ids),
+                (default_calendar, [ids[records[3].id]]),
+            ]:
+                print(f"❌ 未依日曆分組送出: {batch_calendars}")
+                return False
+            
+            print("✅ batch 回補依日曆分組處理成功、重複事件與速率限制重送")
+            
+        except Exception as e:
+            print(f"❌ 日曆回補測試失敗: {e}")
+            return False
+    
+    return True
+
+def test_database_pool_and_retry():
+    """測試資料庫連線池統計與斷線重試"""
+    print("\n🗄️  測試資料庫連線池...")
+    
+    from sqlalchemy import create_engine, exc as sa_exc
+    from app.config import ProductionConfig
+    from app.utils.database import InstrumentedQueuePool, pool_stats, retry_on_disconnect
+    
+    app = create_app(TestingConfig)
+    
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            options = ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS
+            if not options['pool_pre_ping'] or options['pool_recycle'] >= 28800:
+                print(f"❌ 生產環境連線池設定不安全: {options}")
+                return False
+            
+            from prometheus_client import REGISTRY
+            
+            def sample(name):
+                return REGISTRY.get_sample_value(name) or 0
+            
+            before = {name: sample(name) for name in (
+                'leave_db_pool_checkouts_total', 'leave_db_pool_checkout_timeouts_total',
+                'leave_db_pool_disconnects_total')}
+            
+            db_file = os.path.join(tempfile.mkdtemp(), 'pool.db')
+            engine = create_engine(f'sqlite:///{db_file}', poolclass=InstrumentedQueuePool,
+                                   pool_size=1, max_overflow=0, pool_timeout=0.05)
+            with engine.connect():
+                try:
+                    engine.connect()
+                    print("❌ 連線池耗盡時未逾時")
+                    return False
+                except sa_exc.TimeoutError:
+                    pass
+                stats = pool_stats(engine)
+                checked_out_gauge = sample('leave_db_pool_checked_out')
+            if stats['checked_out'] != 1 or stats['checkouts'] != 1 or stats['checkout_timeouts'] != 1:
+                print(f"❌ 連線池統計不正確: {stats}")
+                return False
+            
+            # 模擬斷線：SQLAlchemy 判定為斷線時讓連線池失效並計數
+            engine.dialect.is_disconnect = lambda error, connection, cursor: True
+            with engine.connect() as connection:
+                try:
+                    connection.exec_driver_sql('SELECT * FROM missing_table')
+                except sa_exc.DBAPIError:
+                    pass
+            
+            deltas = {name: sample(name) - value for name, value in before.items()}
+            if pool_stats(engine)['disconnects'] != 1 or checked_out_gauge != 1 or \
+                    sample('leave_db_pool_checked_out') != 0 or deltas != {
+                        'leave_db_pool_checkouts_total': 2, 'leave_db_pool_checkout_timeouts_total': 1,
+                        'leave_db_pool_disconnects_total': 1}:
+                print(f"❌ 連線池 Prometheus 指標不正確: {deltas} {pool_stats(engine)}")
+                return False
+            
+            calls = []
+            
+            @retry_on_disconnect()
+            def flaky_read():
+                calls.append(1)
+                if len(calls) == 1:
+                    raise sa_exc.OperationalError('SELECT 1', {}, Exception('server has gone away'),
+                                                  connection_invalidated=True)
+                return 'ok'
+            
+            @retry_on_disconnect()
+            def broken_read():
+                calls.append(1)
+                raise sa_exc.OperationalError('SELECT 1', {}, Exception('syntax error'))
+            
+            if flaky_read() != 'ok' or len(calls) != 2:
+                print("❌ 斷線後未重試讀取")
+                return False
+            try:
+                broken_read()
+                print("❌ 非斷線錯誤不應被吞掉")
+                return False
+            except sa_exc.OperationalError:
+                if len(calls) != 3:
+                    print("❌ 非斷線錯誤不應重試")
+                    return False
+            
+            metrics = app.test_client().get('/metrics').get_json()
+            prometheus = app.test_client().get('/metrics?format=prometheus').get_data(as_text=True)
+            if 'database_pool' not in metrics or 'leave_db_pool_checkouts_total' not in prometheus or \
+                    'leave_db_pool_disconnects_total' not in prometheus:
+                print("❌ /metrics 缺少連線池統計")
+                return False
+            
+            print("✅ 連線池統計、逾時計數與斷線重試正常")
+            
+        except Exception as e:
+            print(f"❌ 連線池測試失敗: {e}")
+            return False
+    
+    return True
+
+def test_request_metrics():
+    """測試請求延遲直方圖與多 worker 彙總"""
+    print("\n📈 測試請求指標...")
+    
+    import subprocess
+    
+    app = create_app(TestingConfig)
+    
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            client = app.test_client()
+            client.get('/health')
+            client.get('/no-such-page')
+            
+            prometheus_accept = 'application/openmetrics-text;version=1.0.0;q=0.75,text/plain;version=0.0.4;q=0.5,*/*;q=0.1'
+            response = client.get('/metrics', headers={'Accept': prometheus_accept})
+            body = response.get_data(as_text=True)
+            if not response.content_type.startswith('text/plain'):
+                print(f"❌ Prometheus 抓取應回傳文字格式: {response.content_type}")
+                return False
+            expected = [
+                'leave_http_request_duration_seconds_bucket{endpoint="health.health_check",le="0.005",method="GET"}',
+                'leave_http_requests_total{endpoint="health.health_check",method="GET",status="200"}',
+                'leave_http_requests_total{endpoint="unmatched",method="GET",status="302"}',
+            ]
+            missing = [line for line in expected if line not in body]
+            if missing:
+                print(f"❌ 指標缺少: {missing}")
+                return False
+            
+            if client.get('/metrics').get_json() is None:
+                print("❌ 未指定格式時 /metrics 應維持 JSON")
+                return False
+            
+            # 兩個獨立行程寫入共用目錄，由第三個行程彙總
+            env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=tempfile.mkdtemp())
+            record = ("from app.utils.metrics import REQUEST_COUNT; "
+                      "REQUEST_COUNT.labels('leave.apply', 'POST', '302').inc()")
+            for _ in range(2):
+                subprocess.run([sys.executable, '-c', record], env=env, check=True)
+            output = subprocess.run(
+                [sys.executable, '-c', "from app.utils.metrics import render_latest; print(render_latest()[0].decode())"],
+                env=env, check=True, capture_output=True, text=True
+            ).stdout
+            if 'leave_http_requests_total{endpoint="leave.apply",method="POST",status="302"} 2.0' not in output:
+                print(f"❌ 多行程指標未彙總:\n{output}")
+                return False
+            
+            print("✅ 端點延遲直方圖、狀態碼計數與多行程彙總正常")
+            
+        except Exception as e:
+            print(f"❌ 請求指標測試失敗: {e}")
+            return False
+    
+    return True
+
+def test_query_monitor():
+    """測試每個請求的 SQL 統計與 N+1 偵測"""
+    print("\n🔎 測試 SQL 查詢監控...")
+    
+    from app.utils.query_monitor import statement_shape
+    
+    app = create_app(TestingConfig)
+    app.config.update(SQL_QUERY_STATS_HEADER=True, SQL_REPEATED_STATEMENT_THRESHOLD=3, SQL_SLOW_QUERY_MS=0)
+    
+    @app.route('/_test/n-plus-one')
+    def n_plus_one():
+        for user in User.query.all():
+            LeaveRecord.get_recent_by_user(user.id, 5)
+        return 'ok'
+    
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            for i in range(5):
+                db.session.add(User(username=f'monitor{i}', password='pass'))
+            db.session.commit()
+            
+            if statement_shape('SELECT * FROM t WHERE id IN (?, ?, ?)') != statement_shape('SELECT * FROM t WHERE id IN (?, ?)'):
+                print("❌ IN 參數個數不同應視為同一語句形狀")
+                return False
+            
+            client = app.test_client()
+            response = client.get('/_test/n-plus-one')
+            timing = response.headers.get('Server-Timing', '')
+            if not timing.startswith('db;desc="6 queries"'):
+                print(f"❌ Server-Timing 標頭不正確: {timing}")
+                return False
+            
+            body = client.get('/metrics?format=prometheus').get_data(as_text=True)
+            expected = [
+                'leave_db_queries_total{endpoint="n_plus_one"} 6.0',
+                'leave_db_slow_queries_total{endpoint="n_plus_one"} 6.0',
+                'leave_db_repeated_statement_requests_total{endpoint="n_plus_one"} 1.0',
+            ]
+            missing = [line for line in expected if line not in body]
+            if missing:
+                print(f"❌ 查詢指標缺少: {missing}")
+                return False
+            
+            connection = db.session.connection()
+            try:
+                connection.exec_driver_sql('SELECT * FROM missing_table')
+            except Exception:
+                db.session.rollback()
+            if db.session.connection().info.get('_query_start_times') or \
+                    db.session.execute(db.text('SELECT 1')).scalar() != 1:
+                print("❌ 失敗的語句留下了計時資料")
+                return False
+            
+            print("✅ 查詢次數、慢查詢與 N+1 偵測正常")
+            
+        except Exception as e:
+            print(f"❌ SQL 查詢監控測試失敗: {e}")
+            return False
+    
+    return True
+
+def test_health_snapshot():
+    """測試詳細健康檢查快照快取與存活/就緒檢查"""
+    print("\n🏥 測試健康檢查快照...")
+    
+    app = create_app(TestingConfig)
+    
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            client = app.test_client()
+            
+            if client.get('/health').status_code != 200 or client.get('/health/ready').status_code != 200:
+                print("❌ 存活或就緒檢查失敗")
+                return False
+            
+            first = client.get('/health/detailed').get_json()
+            second = client.get('/health/detailed').get_json()
+            if first['status'] != 'healthy' or 'snapshot_age_seconds' not in second:
+                print(f"❌ 詳細檢查回應不正確: {second}")
+                return False
+            if first['timestamp'] != second['timestamp']:
+                print("❌ TTL 內應回傳快取的快照")
+                return False
+            
+            app.config['HEALTH_CHECK_TTL'] = 0
+            third = client.get('/health/detailed').get_json()
+            if third['timestamp'] == first['timestamp']:
+                print("❌ 快照過期後未重新檢查")
+                return False
+            
+            print("✅ 詳細檢查快取、過期刷新與就緒檢查正常")
+            
+        except Exception as e:
+            print(f"❌ 健康檢查快照測試失敗: {e}")
+            return False
+    
+    return True
+
+def test_row_counters():
+    """測試寫入時增量維護的列數計數器"""
+    print("\n🔢 測試列數計數器...")
+    
+    from app.services.counter_service import CounterService
+    
+    app = create_app(TestingConfig)
+    
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            if CounterService.get_count('user') != (0, 'exact'):
+                print("❌ 計數器未建立時應退回 COUNT(*)")
+                return False
+            
+            result = app.test_cli_runner().invoke(args=['rebuild-row-counters'])
+            if result.exit_code != 0 or CounterService.get_count('user') != (0, 'counter'):
+                print(f"❌ 重建計數器失敗: {result.output}")
+                return False
+            
+            # 分片已由重建建立，每次增減只執行一個 UPDATE
+            from sqlalchemy import event
+            statements = []
+            
+            def on_execute(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+            
+            event.listen(db.engine, 'before_cursor_execute', on_execute)
+            try:
+                for _ in range(20):
+                    CounterService.increment('user', 1)
+                    CounterService.increment('user', -1)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', on_execute)
+            if len(statements) != 40 or not all(statement.startswith('UPDATE') for statement in statements):
+                print(f"❌ 計數器增減不應檢查分片: {len(statements)} 個語句")
+                return False
+            
+            users = [UserService.create_user(f"counter{i}", "pass") for i in range(3)]
+            tomorrow = next_workday().strftime('%Y-%m-%d')
+            for user in users[:2]:
+                for period in ('AM', 'PM'):
+                    LeaveService.create_leave_request(user, {
+                        'leave_type': '事假', 'start_date': tomorrow, 'end_date': tomorrow,
+                        'half_day': True, 'half_day_period': period, 'reason': '計數測試'
+                    })
+            first_record = users[0].leave_records.first()
+            LeaveService.delete_leave_record(first_record.id)
+            UserService.delete_user(users[1].id)
+            
+            counts = (CounterService.get_count('user')[0], CounterService.get_count('leave_record')[0])
+            exact = (CounterService.get_count('user', exact=True)[0],
+                     CounterService.get_count('leave_record', exact=True)[0])
+            if counts != exact or counts != (2, 1):
+                print(f"❌ 計數器與實際列數不符: {counts} != {exact}")
+                return False
+            
+            from app.models import RowCounter
+            shard_values = db.session.execute(
+                db.select(RowCounter.value).where(RowCounter.name.in_(RowCounter.shard_names('leave_record')))
+            ).scalars().all()
+            if len(shard_values) != RowCounter.SHARDS or sum(shard_values) != counts[1]:
+                print(f"❌ 計數器分片不完整: {shard_values}")
+                return False
+            
+            # 未建立的版本計數器首次遞增時一次建立所有分片
+            if RowCounter.bump('test_version') != 1 or RowCounter.bump('test_version') != 2 or \
+                    RowCounter.query.filter(RowCounter.name.like('test_version%')).count() != RowCounter.SHARDS:
+                print("❌ 首次遞增未建立所有分片")
+                return False
+            db.session.rollback()
+            
+            client = app.test_client()
+            database = client.get('/metrics').get_json()['database']
+            exact_database = client.get('/metrics?exact=1').get_json()['database']
+            if database['count_source']['user'] != 'counter' or exact_database['count_source']['user'] != 'exact':
+                print(f"❌ /metrics 計數來源不正確: {database}")
+                return False
+            
+            print("✅ 新增/刪除用戶與請假時計數器保持一致")
+            
+        except Exception as e:
+            print(f"❌ 列數計數器測試失敗: {e}")
+            return False
+    
+    return True
+
+def test_user_identity_cache():
+    """測試 user_loader 身分快取與失效"""
+    print("\n🪪 測試用戶身分快取...")
+    
+    from sqlalchemy import event
+    
+    app = create_app(TestingConfig)
+    cache = app.extensions['user_identity_cache']
+    
+    try:
+        with app.app_context():
+            db.create_all()
+            user_id = UserService.create_user("cacheuser", "pass").id
+            engine = db.engine
+        
+        # 請求需在測試的 app context 之外發出，否則 Flask-Login 會沿用 g 中的用戶
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'cacheuser', 'password': 'pass'})
+        
+        user_selects = []
+        
+        def on_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('SELECT') and 'FROM user' in statement:
+                user_selects.append(statement)
+        
+        event.listen(engine, 'before_cursor_execute', on_execute)
+        try:
+            client.get('/leave/dashboard')
+            user_selects.clear()
+            response = client.get('/leave/dashboard')
+            if response.status_code != 200 or user_selects:
+                print(f"❌ 快取命中時仍查詢用戶表: {len(user_selects)} 次")
+                return False
+            
+            # 使用快取建立的用戶實例申請請假，餘額需正確寫回
+            tomorrow = next_workday().strftime('%Y-%m-%d')
+            client.post('/leave/apply', data={
+                'leave_type': '特休', 'start_date': tomorrow, 'end_date': tomorrow, 'half_day': 'on'
+            })
+        finally:
+            event.remove(engine, 'before_cursor_execute', on_execute)
+        
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            if user.vacation_days != 9.5 or user.version != 2:
+                print(f"❌ 以快取用戶申請請假後資料不正確: {user.vacation_days} v{user.version}")
+                return False
+            if user_id in cache._entries:
+                print("❌ 申請請假後快取未失效")
+                return False
+            
+            UserService.update_password(user_id, 'newpass')
+        
+        client.get('/leave/dashboard')
+        if cache._entries[user_id]['password'] != 'newpass':
+            print("❌ 更新密碼後快取未重新載入")
+            return False
+        
+        cache.invalidate(999, version=5)
+        cache.put(999, {'version': 4})
+        if cache.get(999) is not None:
+            print("❌ 失效前讀到的舊版本不應寫回快取")
+            return False
+        
+        # 整份清除（例如年度結轉）前開始的載入不應寫回快取
+        generation = cache.generation
+        cache.clear()
+        cache.put(998, {'version': 1}, generation)
+        cache.put(997, {'version': 1}, cache.generation)
+        if cache.get(998) is not None or cache.get(997) is None:
+            print("❌ 清除前讀到的用戶不應寫回快取")
+            return False
+        
+        with app.app_context():
+            UserService.delete_user(user_id)
+        if client.get('/leave/dashboard').status_code != 302:
+            print("❌ 刪除用戶後仍可使用快取登入")
+            return False
+        
+        print("✅ 身分快取命中免查詢，寫入後立即失效")
+        
+    except Exception as e:
+        print(f"❌ 用戶身分快取測試失敗: {e}")
+        return False
+    
+    return True
+
+def test_bulk_user_import():
+    """測試 CSV 批次匯入用戶"""
+    print("\n📥 測試批次匯入用戶...")
+    
+    import io
+    import time
+    from app.services.counter_service import CounterService
+    
+    app = create_app(TestingConfig)
+    
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            UserService.create_user("existing", "pass")
+            CounterService.rebuild()
+            
+            lines = ['username,password,annual_leave',
+                     ' EXISTING ,pass,',   # 第 2 列：已存在
+                     'nopass,,',           # 第 3 列：缺密碼
+                     'Badnum,pass,abc',    # 第 4 列：天數錯誤
+                     'newbie,pass,12',
+                     'NEWBIE,pass,',       # 第 6 列：檔內重複
+                     f'{"l" * 151},pass,', # 第 7 列：用戶名過長
+                     f'longpass,{"p" * 151},']  # 第 8 列：密碼過長
+            lines += [f'bulk{i},pass,' for i in range(10000)]
+            csv_bytes = '\n'.join(lines).encode('utf-8-sig')
+            
+            dry_run = UserService.import_users_csv(io.BytesIO(csv_bytes), dry_run=True)
+            if dry_run['created'] != 10001 or User.query.count() != 1:
+                print(f"❌ 試算模式不應寫入: {dry_run['created']}")
+                return False
+            
+            start = time.perf_counter()
+            report = UserService.import_users_csv(io.BytesIO(csv_bytes))
+            elapsed = time.perf_counter() - start
+            
+            error_rows = [(error['row'], error['username']) for error in report['errors']]
+            if error_rows != [(2, 'Existing'), (3, 'Nopass'), (4, 'Badnum'), (6, 'Newbie'),
+                              (7, 'L' + 'l' * 149), (8, 'Longpass')]:
+                print(f"❌ 錯誤報告不正確: {report['errors']}")
+                return False
+            newbie = User.query.filter_by(username='Newbie').first()
+            if report['created'] != 10001 or newbie.vacation_days != 12 or newbie.sick_days != 5:
+                print(f"❌ 匯入結果不正確: {report['created']}")
+                return False
+            if CounterService.get_count('user')[0] != 10002:
+                print("❌ 匯入後用戶計數器未更新")
+                return False
+            
+            csv_path = os.path.join(tempfile.mkdtemp(), 'users.csv')
+            with open(csv_path, 'w', encoding='utf-8') as f:
+                f.write('username,password\nclinewuser,pass\nnewbie,pass\n')
+            result = app.test_cli_runner().invoke(args=['import-users', csv_path])
+            if result.exit_code != 0 or not User.query.filter_by(username='Clinewuser').first():
+                print(f"❌ CLI 匯入失敗: {result.output}")
+                return False
+            
+            print(f"✅ 匯入 10000 列耗時 {elapsed:.2f} 秒，錯誤逐列回報")
+            
+        except Exception as e:
+            print(f"❌ 批次匯入測試失敗: {e}")
+            return False
+    
+    return True
+
+def test_leave_rollover():
+    """測試年度請假天數結轉"""
+    print("\n🔄 測試年度結轉...")
+    
+    from app.exceptions import BusinessLogicError
+    from app.services.rollover_service import RolloverService
+    
+    app = create_app(TestingConfig)
+    app.config['LEAVE_CARRY_OVER_CAPS'] = dict(app.config['LEAVE_CARRY_OVER_CAPS'], annual_leave=5)
+    
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            db.session.add(User(username='Admin', password='admin', is_admin=True, vacation_days=99))
+            for name, vacation, sick in (('Roll1', 8, 1), ('Roll2', -1, 5), ('Roll3', 3, 0)):
+                db.session.add(User(username=name, password='pass', vacation_days=vacation, sick_days=sick))
+            db.session.commit()
+            
+            preview = RolloverService.rollover(2030, dry_run=True)
+            vacation = preview['diff']['fields']['vacation_days']
+            if preview['diff']['users'] != 3 or vacation['total_before'] != 10 or vacation['total_after'] != 38:
+                print(f"❌ 試算結果不正確: {preview['diff']}")
+                return False
+            if User.query.filter_by(username='Roll1').first().vacation_days != 8:
+                print("❌ 試算不應寫入")
+                return False
+            
+            report = RolloverService.rollover(2030)
+            db.session.expire_all()
+            balances = {user.username: (user.vacation_days, user.sick_days, user.version)
+                        for user in User.query.all()}
+            expected = {'Admin': (99, 0, 1), 'Roll1': (15, 5, 2), 'Roll2': (10, 5, 2), 'Roll3': (13, 5, 2)}
+            if report['users_updated'] != 3 or balances != expected:
+                print(f"❌ 結轉後餘額不正確: {balances}")
+                return False
+            
+            try:
+                RolloverService.rollover(2030)
+                print("❌ 同一年度不應重複結轉")
+                return False
+            except BusinessLogicError:
+                pass
+            
+            result = app.test_cli_runner().invoke(args=['leave-rollover', '--year', '2031', '--dry-run'])
+            if result.exit_code != 0 or '3 位用戶' not in result.output:
+                print(f"❌ CLI 試算失敗: {result.output}")
+                return False
+            
+            print("✅ 結轉上限、試算差異與年度冪等標記正常")
+            
+        except Exception as e:
+            print(f"❌ 年度結轉測試失敗: {e}")
+            return False
+    
+    return True
+
+def test_concurrent_leave_deduction():
+    """測試並行請假申請不會超扣餘額"""
+    print("\n🏁 測試並行扣除請假天數...")
+    
+    import threading
+    from app.exceptions import ValidationError as LeaveValidationError
+    
+    class ConcurrentConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'concurrent.db')}"
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+    
+    app = create_app(ConcurrentConfig)
+    thread_count = 12
+    
+    with app.app_context():
+        db.create_all()
+        user_id = UserService.create_user("raceuser", "pass").id
+        UserService.update_user_leave_days(user_id, {'personal_leave': 3})
+    
+    barrier = threading.Barrier(thread_count)
+    results = []
+    results_lock = threading.Lock()
+    
+    def submit(offset):
+        # 每個執行緒申請不同日期，只由餘額決定成敗
+        leave_date = next_workday(offset).strftime('%Y-%m-%d')
+        with app.app_context():
+            # 每個執行緒都先讀到餘額 3 天並通過驗證，再同時送出
+            user = db.session.get(User, user_id)
+            user.get_remaining_days('personal_days')
+            barrier.wait()
+            try:
+                LeaveService.create_leave_request(user, {
+                    'leave_type': '事假', 'start_date': leave_date, 'end_date': leave_date, 'reason': '並行測試'
+                })
+                outcome = 'ok'
+            except LeaveValidationError:
+                outcome = 'insufficient'
+            except Exception as e:
+                outcome = f'error: {e}'
+            with results_lock:
+                results.append(outcome)
+    
+    try:
+        threads = [threading.Thread(target=submit, args=(offset,)) for offset in range(1, thread_count + 1)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            record_count = user.leave_records.count()
+        
+        if results.count('ok') != 3 or results.count('insufficient') != thread_count - 3:
+            print(f"❌ 並行申請結果不正確: {results}")
+            return False
+        if user.personal_days != 0 or record_count != 3:
+            print(f"❌ 餘額被超扣: 剩餘 {user.personal_days} 天，{record_count} 筆記錄")
+            return False
+        
+        print(f"✅ {thread_count} 筆並行申請只成功 3 筆，餘額未超扣")
+        
+    except Exception as e:
+        print(f"❌ 並行扣除測試失敗: {e}")
+        return False
+    
+    return True
+
+def test_leave_occupancy():
+    """測試請假佔用位元圖的重疊檢查與半天時段"""
+    print("\n🗓️ 測試請假佔用位元圖...")
+    
+    from collections import Counter
+    from sqlalchemy import event
+    from app.models import LeaveOccupancy
+    from app.utils.occupancy import BITMAP_BYTES, int_to_bitmap, leave_bit_ranges
+    from app.exceptions import ValidationError as LeaveValidationError
+    
+    app = create_app(TestingConfig)
+    
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            year = date.today().year
+            ranges = leave_bit_ranges(date(year, 12, 31), date(year + 1, 1, 2), True, 'PM')
+            if ranges != {year: ((date(year, 12, 31) - date(year, 1, 1)).days * 2 + 1,
+                                 (date(year, 12, 31) - date(year, 1, 1)).days * 2 + 1),
+                          year + 1: (0, 3)} or len(int_to_bitmap(1 << 731)) != BITMAP_BYTES:
+                print(f"❌ 跨年度位元區間不正確: {ranges}")
+                return False
+            
+            user = UserService.create_user("occupancyuser", "pass")
+            
+            # 以當年第一個週一為基準，offset 為相對天數
+            monday = date(year, 1, 1) + timedelta(days=-date(year, 1, 1).weekday() % 7)
+            
+            def apply(start, end, half_day=False, period=None):
+                return LeaveService.create_leave_request(user, {
+                    'leave_type': '事假',
+                    'start_date': (monday + timedelta(days=start)).isoformat(),
+                    'end_date': (monday + timedelta(days=end)).isoformat(),
+                    'half_day': half_day, 'half_day_period': period, 'reason': '佔用測試'
+                })
+            
+            def rejected(*args):
+                try:
+                    apply(*args)
+                except LeaveValidationError as e:
+                    return '重疊' in str(e)
+                return False
+            
+            # 申請只讀取一次佔用列與請假記錄，提交後不再查詢用戶
+            selects = Counter()
+            
+            def count_selects(conn, cursor, statement, parameters, context, executemany):
+                for table in ('user', 'leave_occupancy', 'leave_record'):
+                    if statement.startswith('SELECT') and f'FROM {table} ' in statement + ' ':
+                        selects[table] += 1
+            
+            user.personal_days  # 載入 create_user 提交後過期的欄位，與請求中的 current_user 相同
+            event.listen(db.engine, 'before_cursor_execute', count_selects)
+            try:
+                full_day = apply(0, 0)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', count_selects)
+            if selects['user'] or selects['leave_occupancy'] != 1 or selects['leave_record'] != 1:
+                print(f"❌ 申請請假的查詢次數過多: {dict(selects)}")
+                return False
+            
+            apply(1, 1, True, 'AM')
+            apply(1, 1, True, 'PM')
+            # 多日半天假選下午：第一天下午開始，第一天上午仍可申請
+            apply(3, 4, True, 'PM')
+            apply(3, 3, True, 'AM')
+            remaining = db.session.get(User, user.id).personal_days
+            
+            if not (rejected(0, 0, True, 'PM') and rejected(-1, 1)
+                    and rejected(4, 4, True, 'AM')):
+                print("❌ 重疊的請假未被拒絕")
+                return False
+            if db.session.get(User, user.id).personal_days != remaining:
+                print("❌ 拒絕重疊申請後餘額被扣除")
+                return False
+            
+            # 位元圖不存在時由請假記錄重新建立
+            LeaveOccupancy.query.delete()
+            db.session.commit()
+            if not rejected(1, 1, True, 'AM'):
+                print("❌ 重新建立的位元圖未包含既有請假")
+                return False
+            
+            LeaveService.delete_leave_record(full_day.id)
+            record = apply(0, 0, True, 'PM')
+            if record.to_dict()['half_day_period'] != 'PM' or \
+                    db.session.get(LeaveOccupancy, (user.id, year)).bits != LeaveOccupancy.build_bits(user.id, year):
+                print("❌ 刪除請假後位元圖未釋放或與請假記錄不一致")
+                return False
+            
+            print("✅ 重疊請假被拒絕，半天假可分上午/下午申請")
+            
+        except Exception as e:
+            print(f"❌ 請假佔用測試失敗: {e}")
+            return False
+    
+    return True
+
+def test_team_availability():
+    """測試團隊請假狀況區間索引"""
+    print("\n👥 測試團隊請假狀況索引...")
+    
+    import time
+    from app.models import RowCounter
+    from app.services.availability_index import VERSION_COUNTER
+    
+    app = create_app(TestingConfig)
+    index = app.extensions['availability_index']
+    index.check_interval = 0
+    
+    try:
+        with app.app_context():
+            db.create_all()
+            year = date.today().year
+            base = date.today() - timedelta(days=30)
+            user_count, leaves_per_user = 3000, 4
+            db.session.execute(db.insert(User), [
+                {'username': f'Team{i:04d}', 'password': 'x'} for i in range(user_count)
+            ])
+            user_ids = db.session.execute(db.select(User.id).order_by(User.id)).scalars().all()
+            rows = []
+            for position, user_id in enumerate(user_ids):
+                for n in range(leaves_per_user):
+                    start = base + timedelta(days=(position * 7 + n * 83) % 360)
+                    rows.append({'user_id': user_id, 'leave_type': '事假', 'start_date': start,
+                                 'end_date': start + timedelta(days=n % 3), 'days': n % 3 + 1})
+            db.session.execute(db.insert(LeaveRecord), rows)
+            db.session.commit()
+            
+            def expected(start, end):
+                return sorted(db.session.execute(
+                    db.select(LeaveRecord.id).where(LeaveRecord.start_date <= end, LeaveRecord.end_date >= start)
+                ).scalars())
+            
+            # 超出保留範圍的舊請假不進索引，查詢舊期間時改查資料庫
+            old_start = base - timedelta(days=400)
+            db.session.add(LeaveRecord(user_id=user_ids[0], leave_type='事假', start_date=old_start,
+                                       end_date=old_start, days=1))
+            db.session.commit()
+            for start, end in ((base + timedelta(days=40), base + timedelta(days=46)),
+                               (date(year, 12, 30), date(year + 1, 1, 5)),
+                               (old_start - timedelta(days=3), old_start + timedelta(days=3))):
+                found = sorted(entry['id'] for entry in index.query(start, end))
+                if not found or found != expected(start, end):
+                    print(f"❌ {start} ~ {end} 查詢結果與資料庫不一致")
+                    return False
+            if index.stats()['records'] != user_count * leaves_per_user:
+                print(f"❌ 索引包含超出保留範圍的請假: {index.stats()}")
+                return False
+            
+            # 範圍查詢需在 1 毫秒內完成（不含版本檢查）
+            index.check_interval = 60
+            timings = []
+            for offset in range(0, 350, 7):
+                began = time.perf_counter()
+                index.query(base + timedelta(days=offset), base + timedelta(days=offset + 6))
+                timings.append(time.perf_counter() - began)
+            median_ms = sorted(timings)[len(timings) // 2] * 1000
+            if median_ms >= 1:
+                print(f"❌ 範圍查詢過慢: {median_ms:.3f} ms")
+                return False
+            index.check_interval = 0
+            
+            # 本 worker 的新增/刪除增量更新，不重建
+            user = UserService.create_user("teamuser", "pass")
+            rebuilds = index.stats()['rebuilds']
+            day = next_workday()
+            record = LeaveService.create_leave_request(user, {
+                'leave_type': '事假', 'start_date': day.isoformat(), 'end_date': day.isoformat(), 'reason': '團隊測試'
+            })
+            record_id = record.id
+            if record_id not in [entry['id'] for entry in index.query(day, day)]:
+                print("❌ 新增請假後索引未更新")
+                return False
+            LeaveService.delete_leave_record(record_id)
+            if record_id in [entry['id'] for entry in index.query(day, day)] or index.stats()['rebuilds'] != rebuilds:
+                print(f"❌ 刪除請假未增量更新索引: {index.stats()}")
+                return False
+            
+            # 移除最長的請假後候選範圍隨之縮小
+            index._insert(-1, {'start_date': day, 'end_date': day + timedelta(days=30)})
+            index._remove(-1)
+            if index.stats()['max_span_days'] != 3:
+                print(f"❌ 刪除後最長跨度未重新計算: {index.stats()}")
+                return False
+            
+            # 其他 worker 的寫入使版本前進，下次查詢時重建
+            other = LeaveRecord(user_id=user.id, leave_type='病假', start_date=day, end_date=day, days=1)
+            db.session.add(other)
+            RowCounter.bump(VERSION_COUNTER)
+            db.session.commit()
+            if other.id not in [entry['id'] for entry in index.query(day, day)] or \
+                    index.stats()['rebuilds'] != rebuilds + 1:
+                print("❌ 版本變更後索引未重建")
+                return False
+            
+            admin = UserService.create_user("teamadmin", "pass")
+            admin.is_admin = True
+            db.session.commit()
+        
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'teamadmin', 'password': 'pass'})
+        data = client.get(f'/admin/api/availability?start={day}&end={day}').get_json()
+        page = client.get(f'/admin/availability?start={day}&end={day}')
+        invalid = client.get('/admin/api/availability?start=bad')
+        if 'Teamuser' not in [user['username'] for user in data['users']] or \
+                page.status_code != 200 or 'Teamuser' not in page.get_data(as_text=True) or \
+                invalid.status_code != 400:
+            print(f"❌ 團隊請假狀況 API/頁面不正確: {invalid.status_code}")
+            return False
+        
+        print(f"✅ {user_count * leaves_per_user} 筆請假的範圍查詢中位數 {median_ms:.3f} ms，寫入時增量更新")
+        
+    except Exception as e:
+        print(f"❌ 團隊請假狀況測試失敗: {e}")
+        return False
+    
+    return True
+
+def test_business_days():
+    """測試工作日前綴和計算與請假天數"""
+    print("\n📅 測試工作日計算...")
+    
+    import random
+    from app.config import Config
+    from app.utils.business_days import BusinessCalendar
+    from app.exceptions import ValidationError as LeaveValidationError
+    
+    app = create_app(TestingConfig)
+    
+    with app.app_context():
+        db.create_all()
+        
+        try:
+            bundled = BusinessCalendar.from_file(Config.HOLIDAY_FILE)
+            if bundled.is_workday(date(2026, 1, 1)) or not bundled.is_workday(date(2025, 2, 8)) or \
+                    bundled.count(date(2027, 2, 1), date(2027, 2, 12)) != 5:
+                print("❌ 假日檔載入不正確")
+                return False
+            bundled.count(date(2099, 1, 1), date(2099, 1, 31))
+            if bundled.missing_years != {2099}:
+                print(f"❌ 無假日資料的年度未被標記: {bundled.missing_years}")
+                return False
+            
+            year = date.today().year
+            holiday = date(year, 3, 1) + timedelta(days=(2 - date(year, 3, 1).weekday()) % 7)  # 三月第一個週三
+            makeup = date(year, 3, 1) + timedelta(days=(5 - date(year, 3, 1).weekday()) % 7)  # 三月第一個週六
+            calendar = BusinessCalendar({holiday: '測試假日'}, {makeup: '補行上班'})
+            rng = random.Random(7)
+            for _ in range(300):
+                start = date(year - 1, 1, 1) + timedelta(days=rng.randrange(1000))
+                end = start + timedelta(days=rng.randrange(400))
+                brute = sum(calendar.is_workday(start + timedelta(days=n)) for n in range((end - start).days + 1))
+                if calendar.count(start, end) != brute:
+                    print(f"❌ {start} ~ {end} 工作日數不正確")
+                    return False
+            
+            app.extensions['business_calendar'] = calendar
+            friday = date(year, 1, 1) + timedelta(days=(4 - date(year, 1, 1).weekday()) % 7)
+            monday = friday + timedelta(days=3)
+            if LeaveService.calculate_leave_days(friday, monday) != 2 or \
+                    LeaveService.calculate_leave_days(friday, monday, True, 'PM') != 1.5 or \
+                    LeaveService.calculate_leave_days(holiday - timedelta(days=1), holiday) != 1:
+                print("❌ 請假天數未排除週末或假日")
+                return False
+            
+            user = UserService.create_user("workdayuser", "pass")
+            
+            def error(start, end, half_day=False, period=None):
+                try:
+                    LeaveService.create_leave_request(user, {
+                        'leave_type': '特休', 'start_date': start.isoformat(), 'end_date': end.isoformat(),
+                        'half_day': half_day, 'half_day_period': period
+                    })
+                except LeaveValidationError as e:
+                    return str(e)
+                return None
+            
+            saturday = friday + timedelta(days=1)
+            # 週一至週日 5 個工作日可申請，跨到下週二（7 個工作日）超過上限
+            if error(saturday, saturday) is None or error(friday, saturday, True, 'AM') is None or \
+                    error(monday + timedelta(days=7), monday + timedelta(days=15)) is None or \
+                    error(monday, monday + timedelta(days=6)) is not None:
+                print("❌ 非工作日或單次上限檢查不正確")
+                return False
+            if db.session.get(User, user.id).vacation_days != 5:
+                print("❌ 跨週末請假未只扣工作日")
+                return False
+            
+            print("✅ 請假天數以工作日計算，週末與國定假日不扣假")
+            
+        except Exception as e:
+            print(f"❌ 工作日計算測試失敗: {e}")
+            return False
+    
+    return True
+
+def test_json_api_etag():
+    """測試 JSON API 與 ETag 條件式 GET"""
+    print("\n🔖 測試 JSON API 與 ETag...")
+    
+    from sqlalchemy import event
+    
+    app = create_app(TestingConfig)
+    
+    try:
+        with app.app_context():
+            db.create_all()
+            user_id = UserService.create_user("apiuser", "pass").id
+            other_id = UserService.create_user("apiother", "pass").id
+            engine = db.engine
+        
+        client = app.test_client()
+        if client.get(f'/api/v1/users/{user_id}/balances').status_code != 401:
+            print("❌ 未登入時應回應 401")
+            return False
+        client.post('/auth/login', data={'username': 'apiuser', 'password': 'pass'})
+        
+        first = client.get(f'/api/v1/users/{user_id}/balances')
+        etag = first.headers.get('ETag')
+        if first.status_code != 200 or not etag or etag.startswith('W/') or \
+                first.get_json()['user']['vacation_days'] != 10:
+            print(f"❌ 餘額回應不正確: {first.status_code} {etag}")
+            return False
+        
+        statements = []
+        
+        def on_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        event.listen(engine, 'before_cursor_execute', on_execute)
+        try:
+            cached = client.get(f'/api/v1/users/{user_id}/balances', headers={'If-None-Match': etag})
+        finally:
+            event.remove(engine, 'before_cursor_execute', on_execute)
+        if cached.status_code != 304 or cached.get_data() or \
+                [statement for statement in statements if 'leave' in statement] or len(statements) > 1:
+            print(f"❌ ETag 相符時應只讀取版本並回應 304: {cached.status_code} {statements}")
+            return False
+        
+        leaves_etag = client.get(f'/api/v1/users/{user_id}/leaves').headers['ETag']
+        leave_date = next_workday().isoformat()
+        created = client.post(f'/api/v1/users/{user_id}/leaves', json={
+            'leave_type': '特休', 'start_date': leave_date, 'end_date': leave_date, 'reason': 'API 測試'
+        })
+        if created.status_code != 201 or created.get_json()['days'] != 1:
+            print(f"❌ API 申請請假失敗: {created.status_code} {created.get_data(as_text=True)}")
+            return False
+        
+        refreshed = client.get(f'/api/v1/users/{user_id}/leaves', headers={'If-None-Match': leaves_etag})
+        balances = client.get(f'/api/v1/users/{user_id}/balances', headers={'If-None-Match': etag})
+        if refreshed.status_code != 200 or len(refreshed.get_json()['records']) != 1 or \
+                balances.status_code != 200 or balances.get_json()['user']['vacation_days'] != 9:
+            print("❌ 寫入後舊 ETag 仍回應 304")
+            return False
+        
+        bad_date = client.post(f'/api/v1/users/{user_id}/leaves', json={
+            'leave_type': '特休', 'start_date': 'tomorrow', 'end_date': leave_date
+        })
+        numeric_date = client.post(f'/api/v1/users/{user_id}/leaves', json={
+            'leave_type': '特休', 'start_date': 20260101, 'end_date': leave_date
+        })
+        string_half_day = client.post(f'/api/v1/users/{user_id}/leaves', json={
+            'leave_type': '特休', 'start_date': leave_date, 'end_date': leave_date, 'half_day': 'false'
+        })
+        not_object = client.post(f'/api/v1/users/{user_id}/leaves', json=['特休'])
+        forbidden = client.get(f'/api/v1/users/{other_id}/leaves')
+        if bad_date.status_code != 400 or bad_date.get_json()['code'] != 'VALIDATION_ERROR' or \
+                numeric_date.status_code != 400 or numeric_date.get_json()['code'] != 'VALIDATION_ERROR' or \
+                string_half_day.status_code != 400 or not_object.status_code != 400 or \
+                forbidden.status_code != 403:
+            print(f"❌ API 錯誤回應不正確: {bad_date.status_code} {numeric_date.status_code} "
+                  f"{string_half_day.status_code} {not_object.status_code} {forbidden.status_code}")
+            return False
+        
+        record_id = created.get_json()['id']
+        if client.delete(f'/api/v1/leaves/{record_id}').status_code != 204 or \
+                client.delete(f'/api/v1/leaves/{record_id}').status_code != 404:
+            print("❌ API 刪除請假不正確")
+            return False
+        
+        print("✅ JSON API 以用戶版本戳記產生 ETag，未變更時回應 304")
+        
+    except Exception as e:
+        print(f"❌ JSON API 測試失敗: {e}")
+        return False
+    
+    return True
+
+def test_admin_fragment_cache():
+    """測試管理頁用戶列片段快取"""
+    print("\n🧩 測試管理頁片段快取...")
+    
+    class UncachedConfig(TestingConfig):
+        FRAGMENT_CACHE_MAXSIZE = 0
+    
+    def admin_page(config):
+        app = create_app(config)
+        with app.app_context():
+            db.create_all()
+            admin = UserService.create_user("fragadmin", "pass")
+            admin.is_admin = True
+            users = [UserService.create_user(f"frag{i}", "pass") for i in range(3)]
+            db.session.commit()
+            user_id = users[0].id
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'fragadmin', 'password': 'pass'})
+        return app, client, user_id
+    
+    try:
+        app, client, user_id = admin_page(TestingConfig)
+        cache = app.extensions['fragment_cache']
+        first = client.get('/admin/').get_data(as_text=True)
+        second = client.get('/admin/').get_data(as_text=True)
+        if first != second or cache.stats()['misses'] != 3 or cache.stats()['hits'] != 3:
+            print(f"❌ 未變更的用戶列未命中快取: {cache.stats()}")
+            return False
+        
+        with app.app_context():
+            UserService.update_user_leave_days(user_id, {'annual_leave': 7.5})
+        updated = client.get('/admin/').get_data(as_text=True)
+        if 'value="7.5"' not in updated or cache.stats()['misses'] != 4:
+            print(f"❌ 用戶變更後片段未重新渲染: {cache.stats()}")
+            return False
+        
+        uncached_app, uncached_client, _ = admin_page(UncachedConfig)
+        if uncached_app.extensions['fragment_cache'] is not None or \
+                uncached_client.get('/admin/').get_data(as_text=True) != first:
+            print("❌ 停用快取時渲染結果不一致")
+            return False
+        
+        print("✅ 未變更的用戶列由快取提供，寫入後只重新渲染該列")
+        
+    except Exception as e:
+        print(f"❌ 片段快取測試失敗: {e}")
+        return False
+    
+    return True
+
+def test_lazy_google_import():
+    """測試啟動時不載入 Google 相關套件"""
+    print("\n💤 測試 Google 套件延遲載入...")
+    
+    script = (
+        "import os, sys\n"
+        "os.environ['FLASK_ENV'] = 'testing'\n"
+        "from app import create_app\n"
+        "from app.config import TestingConfig\n"
+        "app = create_app(TestingConfig)\n"
+        "app.logger.disabled = True\n"
+        "client = app.test_client()\n"
+        "client.get('/health')\n"
+        "client.get('/auth/login')\n"
+        "print(','.join(sorted(name for name in sys.modules\n"
+        "    if name.startswith(('googleapiclient', 'google.oauth2', 'httplib2', 'app.services.google_service')))))\n"
+    )
+    
+    try:
+        import subprocess
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=60)
+        if result.returncode != 0:
+            print(f"❌ 啟動子行程失敗: {result.stderr.strip().splitlines()[-1:]}")
+            return False
+        loaded = result.stdout.strip().splitlines()[-1] if result.stdout.strip() else ''
+        if loaded:
+            print(f"❌ 啟動時載入了 Google 相關模組: {loaded}")
+            return False
+        
+        print("✅ create_app 與第一個請求皆未載入 Google 相關套件")
+        
+    except Exception as e:
+        print(f"❌ 延遲載入測試失敗: {e}")
+        return False
+    
+    return True
+
+def test_gunicorn_config():
+    """測試 gunicorn 配置與 fork 後的重置鉤子"""
+    print("\n🦄 測試 gunicorn 配置...")
+    
+    import runpy
+    from types import SimpleNamespace
+    import app.services.google_service as google_service_module
+    
+    saved_metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    try:
+        conf = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py'))
+        if not conf['preload_app'] or conf['worker_class'] != 'gthread' or conf['workers'] < 2 \
+                or conf['threads'] < 2 or conf['max_requests'] <= 0 or conf['max_requests_jitter'] <= 0:
+            print("❌ gunicorn 配置值不符預期")
+            return False
+        
+        app = create_app(TestingConfig)
+        with app.app_context():
+            pool_before = db.engine.pool
+        google_service_module.google_service = object()
+        
+        server = SimpleNamespace(app=SimpleNamespace(wsgi=lambda: app))
+        conf['post_fork'](server, SimpleNamespace(pid=os.getpid()))
+        with app.app_context():
+            pool_after = db.engine.pool
+        if pool_after is pool_before:
+            print("❌ fork 後未重建資料庫連線池")
+            return False
+        if google_service_module.google_service is not None:
+            print("❌ fork 後未重置 Google 服務實例")
+            return False
+        
+        print(f"✅ {conf['workers']} 個 gthread worker × {conf['threads']} 執行緒，fork 後重建連線池並重置 Google 服務")
+        
+    except Exception as e:
+        print(f"❌ gunicorn 配置測試失敗: {e}")
+        return False
+    finally:
+        if saved_metrics_dir is None:
+            os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+        else:
+            os.environ['PROMETHEUS_MULTIPROC_DIR'] = saved_metrics_dir
+    
+    return True
+
+def test_template_paths():
+    """測試模板路徑"""
+    print("\n📄 檢查模板文件...")
+    
+    templates = [
+        'templates/login.html',
+        'templates/base.html',
+        'templates/leave.html',
+        'templates/admin.html',
+        'templates/availability.html',
+        'templates/user_records.html'
+    ]
+    
+    all_found = True
+    for template in templates:
+        if os.path.exists(template):
+            print(f"✅ 模板存在: {template}")
+        else:
+            print(f"❌ 模板缺失: {template}")
+            all_found = False
+    
+    return all_found
+
+if __name__ == "__main__":
+    print("🚀 開始全面功能測試...\n")
+    
+    # 測試基本功能
+    basic_test = test_app_basic_functionality()
+    
+    # 測試路由
+    route_test = test_route_endpoints()
+    
+    # 測試批次查詢
+    batch_test = test_recent_records_batch_loader()
+    
+    # 測試日期範圍索引
+    index_test = test_year_filter_uses_index()
+    
+    # 測試請假彙總
+    summary_test = test_leave_usage_summary()
+    
+    # 測試 GROUP BY 統計
+    aggregate_test = test_annual_stats_aggregation()
+    
+    # 測試分頁
+    pagination_test = test_leave_records_pagination()
+    
+    # 測試日曆同步
+    calendar_test = test_calendar_outbox_sync()
+    
+    # 測試收據上傳
+    upload_test = test_receipt_stream_upload()
+    
+    # 測試連線池
+    pool_test = test_google_client_pool()
+    
+    # 測試日曆回補
+    backfill_test = test_calendar_backfill()
+    
+    # 測試資料庫連線池
+    db_pool_test = test_database_pool_and_retry()
+    
+    # 測試請求指標
+    metrics_test = test_request_metrics()
+    
+    # 測試 SQL 查詢監控
+    query_monitor_test = test_query_monitor()
+    
+    # 測試健康檢查快照
+    health_test = test_health_snapshot()
+    
+    # 測試列數計數器
+    counter_test = test_row_counters()
+    
+    # 測試用戶身分快取
+    user_cache_test = test_user_identity_cache()
+    
+    # 測試批次匯入用戶
+    import_test = test_bulk_user_import()
+    
+    # 測試年度結轉
+    rollover_test = test_leave_rollover()
+    
+    # 測試並行扣除
+    concurrency_test = test_concurrent_leave_deduction()
+    
+    # 測試請假佔用位元圖
+    occupancy_test = test_leave_occupancy()
+    
+    # 測試團隊請假狀況索引
+    availability_test = test_team_availability()
+    
+    # 測試工作日計算
+    business_days_test = test_business_days()
+    
+    # 測試 JSON API 與 ETag
+    api_test = test_json_api_etag()
+    
+    # 測試管理頁片段快取
+    fragment_test = test_admin_fragment_cache()
+    
+    # 測試 Google 套件延遲載入
+    lazy_import_test = test_lazy_google_import()
+    
+    # 測試 gunicorn 配置
+    gunicorn_test = test_gunicorn_config()
     
     # 測試模板
     template_test = test_template_paths()
@@ -177,9 +2037,39 @@ if __name__ == "__main__":
     print(f"\n📊 測試結果總結:")
     print(f"✅ 基本功能: {'通過' if basic_test else '失敗'}")
     print(f"✅ 路由端點: {'通過' if route_test else '失敗'}")
+    print(f"✅ 批次查詢: {'通過' if batch_test else '失敗'}")
+    print(f"✅ 日期索引: {'通過' if index_test else '失敗'}")
+    print(f"✅ 請假彙總: {'通過' if summary_test else '失敗'}")
+    print(f"✅ 年度統計: {'通過' if aggregate_test else '失敗'}")
+    print(f"✅ 記錄分頁: {'通過' if pagination_test else '失敗'}")
+    print(f"✅ 日曆同步: {'通過' if calendar_test else '失敗'}")
+    print(f"✅ 收據上傳: {'通過' if upload_test else '失敗'}")
+    print(f"✅ 連線池: {'通過' if pool_test else '失敗'}")
+    print(f"✅ 日曆回補: {'通過' if backfill_test else '失敗'}")
+    print(f"✅ 資料庫連線池: {'通過' if db_pool_test else '失敗'}")
+    print(f"✅ 請求指標: {'通過' if metrics_test else '失敗'}")
+    print(f"✅ SQL 查詢監控: {'通過' if query_monitor_test else '失敗'}")
+    print(f"✅ 健康檢查快照: {'通過' if health_test else '失敗'}")
+    print(f"✅ 列數計數器: {'通過' if counter_test else '失敗'}")
+    print(f"✅ 用戶身分快取: {'通過' if user_cache_test else '失敗'}")
+    print(f"✅ 批次匯入: {'通過' if import_test else '失敗'}")
+    print(f"✅ 年度結轉: {'通過' if rollover_test else '失敗'}")
+    print(f"✅ 並行扣除: {'通過' if concurrency_test else '失敗'}")
+    print(f"✅ 請假佔用: {'通過' if occupancy_test else '失敗'}")
+    print(f"✅ 團隊請假狀況: {'通過' if availability_test else '失敗'}")
+    print(f"✅ 工作日計算: {'通過' if business_days_test else '失敗'}")
+    print(f"✅ JSON API: {'通過' if api_test else '失敗'}")
+    print(f"✅ 片段快取: {'通過' if fragment_test else '失敗'}")
+    print(f"✅ 延遲載入: {'通過' if lazy_import_test else '失敗'}")
+    print(f"✅ gunicorn 配置: {'通過' if gunicorn_test else '失敗'}")
     print(f"✅ 模板文件: {'通過' if template_test else '失敗'}")
     
-    if all([basic_test, route_test, template_test]):
+    if all([basic_test, route_test, batch_test, index_test, summary_test, aggregate_test,
+            pagination_test, calendar_test, upload_test, pool_test, backfill_test, db_pool_test,
+            metrics_test, query_monitor_test, health_test,
+            counter_test, user_cache_test, import_test, rollover_test, concurrency_test,
+            occupancy_test, availability_test, business_days_test,
+            api_test, fragment_test, lazy_import_test, gunicorn_test, template_test]):
         print("\n🎉 所有測試通過！重構後的應用功能正常！")
     else:
         print("\n⚠️  部分測試失敗，需要檢查相關問題")
\ No newline at end of file